@@ -50,8 +50,8 @@ register(Data)
 from .utility import convert, unconvert, charges_to_elements, OptimizerLGS
 register(OptimizerLGS)
 
-from .dataset import Dataset, Subset, load_dataset
-register(Dataset, Subset)
+from .dataset import Dataset, Subset, ShardedDataset, load_dataset
+register(Dataset, Subset, ShardedDataset)
 
 from .tune import components as components_tune
 register(*components_tune)
@@ -0,0 +1,152 @@
+"""Command line interface.
+
+Usage:
+    cmlkit cache usage [--location LOCATION]
+    cmlkit cache gc [--location LOCATION] [--max-bytes 100G] [--max-entries N]
+                    [--budget KIND=SIZE ...] [--policy lru|lfu|cost] [--dry-run]
+    cmlkit dataset convert INPUT OUTPUT [--format FORMAT] [--index INDEX]
+                    [--property NAME ...] [--name NAME] [--desc DESC]
+                    [--batch-size N] [--append]
+
+The cache location defaults to `CML_CACHE` (see `env.py`).
+Garbage collection can safely be run while other processes use the cache.
+
+`dataset convert` streams structures from any file `ase` can read into a
+columnar dataset (see `cmlkit.dataset.builder`), without loading all of them
+into memory at once.
+
+"""
+
+import argparse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cmlkit")
+    commands = parser.add_subparsers(dest="command")
+
+    cache = commands.add_parser("cache", help="manage the disk cache")
+    cache_commands = cache.add_subparsers(dest="cache_command")
+
+    usage = cache_commands.add_parser("usage", help="report disk usage by kind")
+    usage.add_argument("--location", default=None)
+    usage.set_defaults(f=cache_usage)
+
+    gc = cache_commands.add_parser("gc", help="evict entries until within budget")
+    gc.add_argument("--location", default=None)
+    gc.add_argument("--max-bytes", default=None, help="budget per kind, e.g. 100G")
+    gc.add_argument("--max-entries", default=None, type=int, help="budget per kind")
+    gc.add_argument(
+        "--budget",
+        default=[],
+        action="append",
+        help="budget for a specific kind, e.g. kernel_atomic=50G",
+    )
+    gc.add_argument("--policy", default="lru", choices=["lru", "lfu", "cost"])
+    gc.add_argument("--dry-run", action="store_true")
+    gc.set_defaults(f=cache_gc)
+
+    dataset = commands.add_parser("dataset", help="work with datasets")
+    dataset_commands = dataset.add_subparsers(dest="dataset_command")
+
+    convert = dataset_commands.add_parser(
+        "convert", help="convert structures readable by ase into a columnar dataset"
+    )
+    convert.add_argument("input")
+    convert.add_argument("output")
+    convert.add_argument("--format", default=None, help="passed to ase.io.iread")
+    convert.add_argument("--index", default=":", help="passed to ase.io.iread")
+    convert.add_argument(
+        "--property",
+        default=[],
+        action="append",
+        help="property to read from atoms.info or calculator results",
+    )
+    convert.add_argument("--name", default=None)
+    convert.add_argument("--desc", default="")
+    convert.add_argument("--batch-size", default=1000, type=int)
+    convert.add_argument("--append", action="store_true")
+    convert.set_defaults(f=dataset_convert)
+
+    args = parser.parse_args(argv)
+
+    if not hasattr(args, "f"):
+        parser.print_help()
+        return 1
+
+    return args.f(args)
+
+
+def get_location(args):
+    if args.location is None:
+        from cmlkit.env import cache_location
+
+        return cache_location
+    else:
+        return args.location
+
+
+def cache_usage(args):
+    from cmlkit.engine.cache import Janitor
+    from cmlkit.engine.cache.janitor import format_bytes
+
+    usage = Janitor(get_location(args)).usage()
+
+    for kind, u in usage.items():
+        print(f"{kind}: {format_bytes(u['bytes'])} in {u['entries']} entries")
+
+    total = sum(u["bytes"] for u in usage.values())
+    print(f"total: {format_bytes(total)}")
+
+    return 0
+
+
+def cache_gc(args):
+    from cmlkit.engine.cache import Janitor
+    from cmlkit.engine.cache.janitor import format_bytes
+
+    budgets = {}
+    for budget in args.budget:
+        kind, size = budget.split("=")
+        budgets[kind] = {"max_bytes": size}
+
+    janitor = Janitor(
+        get_location(args),
+        max_bytes=args.max_bytes,
+        max_entries=args.max_entries,
+        budgets=budgets,
+        policy=args.policy,
+    )
+
+    evicted = janitor.collect(dry_run=args.dry_run)
+
+    verb = "Would evict" if args.dry_run else "Evicted"
+    print(f"{verb} {len(evicted)} entries.")
+    for kind, u in janitor.usage().items():
+        print(f"{kind}: {format_bytes(u['bytes'])} in {u['entries']} entries")
+
+    return 0
+
+
+def dataset_convert(args):
+    from ase.io import iread
+    from cmlkit.dataset.builder import DatasetBuilder
+
+    builder = DatasetBuilder(
+        args.output,
+        name=args.name,
+        desc=args.desc,
+        properties=args.property,
+        batch_size=args.batch_size,
+        append=args.append,
+    )
+
+    try:
+        builder.extend(iread(args.input, index=args.index, format=args.format))
+        dataset = builder.finish()
+    except BaseException:
+        builder.abort()
+        raise
+
+    print(f"Wrote {dataset.n} structures to {builder.path} ({dataset.hash}).")
+
+    return 0
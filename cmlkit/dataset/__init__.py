@@ -1,4 +1,5 @@
 """Dataset infrastructure."""
 
-from .dataset import Dataset, Subset
+from .dataset import Dataset, Subset, SubsetView
+from .sharded import ShardedDataset
 from .dataset_loader import load_dataset
@@ -0,0 +1,326 @@
+"""Build datasets from streams of structures.
+
+`Dataset.from_Atoms` needs all structures in memory at once. For very large
+trajectories, `DatasetBuilder` instead consumes structures one batch at a time,
+and writes them straight to disk in the columnar format (see `columnar.py`).
+Per-structure hashes are computed batch by batch; once all structures are added,
+the remaining `info` (except for the expensive distances) and the dataset hashes
+are computed on the memory-mapped result.
+
+Usage:
+    builder = DatasetBuilder("qm9.npd", name="qm9", properties=["energy"])
+    builder.extend(ase.io.iread("qm9.xyz"))
+    dataset = builder.finish()
+
+Or, equivalently, as a context manager, which calls `finish` on success and `abort`
+on errors:
+    with DatasetBuilder("qm9.npd", name="qm9", properties=["energy"]) as builder:
+        builder.extend(ase.io.iread("qm9.xyz"))
+
+Temporary files are only created once the first structures are written.
+Existing columnar datasets can be extended by passing `append=True`.
+
+"""
+
+import os
+import shutil
+import numpy as np
+from pathlib import Path
+
+from cmlkit.engine import hashing, normalize_extension
+from cmlkit.engine.inout import temporary_path
+from cmlkit.engine.data.data import write_npd_header
+
+from .dataset import Dataset, get_offsets
+from .columnar import load_columnar, is_columnar
+
+
+class DatasetBuilder:
+    """Incrementally write a columnar dataset to disk.
+
+    Args:
+        path: Path of the resulting .npd directory.
+        name: Name of the dataset, defaults to the filename.
+        desc: Description.
+        properties: Names of the properties to read from each structure.
+        batch_size: Number of structures to process at once.
+        append: If True and path exists, add structures to the existing dataset.
+    """
+
+    def __init__(
+        self, path, name=None, desc="", properties=[], batch_size=1000, append=False
+    ):
+        self.path = normalize_extension(path, ".npd")
+        self.properties = list(properties)
+        self.batch_size = batch_size
+
+        if name is None:
+            name = self.path.stem
+        self.name = name
+        self.desc = desc
+
+        self.tmp = None
+
+        self.n = 0
+        self.periodic = None
+        self.batch = []
+
+        if append and is_columnar(self.path):
+            self.append_existing(load_columnar(self.path))
+
+    def part(self, name):
+        if self.tmp is None:
+            # created lazily, so builders that never write anything leave no trace
+            self.tmp = temporary_path(self.path)
+            (self.tmp / "parts").mkdir(parents=True)
+
+        return self.tmp / "parts" / f"{name}.bin"
+
+    def append_existing(self, dataset):
+        existing = list(dataset.p.keys())
+        assert (
+            existing == self.properties
+        ), f"Can only append to datasets with the same properties, not {existing}."
+        self.periodic = dataset.b is not None
+
+        counts = np.diff(dataset.offsets)
+        for start in range(0, dataset.n, self.batch_size):
+            stop = min(start + self.batch_size, dataset.n)
+            atoms = slice(dataset.offsets[start], dataset.offsets[stop])
+
+            arrays = {
+                "z": dataset.z_flat[atoms],
+                "r": dataset.r_flat[atoms],
+                "counts": counts[start:stop],
+            }
+            if self.periodic:
+                arrays["b"] = dataset.b[start:stop]
+
+            if dataset.structure_hashes is not None:
+                arrays["structure_hashes"] = dataset.structure_hashes[start:stop]
+            else:
+                # datasets written with hash scheme 1 don't store them
+                split = np.cumsum(counts[start:stop])[:-1]
+                arrays["structure_hashes"] = hashing.structure_hashes(
+                    np.split(np.asarray(arrays["z"]), split),
+                    np.split(np.asarray(arrays["r"]), split),
+                    arrays.get("b", None),
+                )
+            for i, name in enumerate(self.properties):
+                arrays[f"p{i}"] = dataset.p[name][start:stop]
+
+            self.write(arrays)
+
+    def add(self, z, r, b=None, p={}):
+        """Add a single structure."""
+        periodic = b is not None
+        if self.periodic is None:
+            self.periodic = periodic
+
+        assert (
+            periodic == self.periodic
+        ), "In a Dataset, either all or no structures must have periodic boundary conditions in all directions."
+
+        self.batch.append((z, r, b, p))
+
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def add_atoms(self, atoms):
+        """Add a single ase.Atoms object."""
+        self.add(*from_atoms(atoms, self.properties))
+
+    def extend(self, atoms):
+        """Add structures from an iterable of ase.Atoms objects."""
+        for a in atoms:
+            self.add_atoms(a)
+
+    def flush(self):
+        if len(self.batch) > 0:
+            self.write(process(self.batch, self.properties))
+            self.batch = []
+
+    def write(self, arrays):
+        periodic = "b" in arrays
+        if self.periodic is None:
+            self.periodic = periodic
+
+        assert (
+            periodic == self.periodic
+        ), "In a Dataset, either all or no structures must have periodic boundary conditions in all directions."
+
+        for name, array in arrays.items():
+            with open(self.part(name), "ab") as f:
+                array = np.ascontiguousarray(array, dtype=property_dtype(name))
+                f.write(array.tobytes())
+
+        self.n += len(arrays["counts"])
+
+    def finish(self):
+        """Write the dataset and return it (memory-mapped)."""
+        self.flush()
+        assert self.n > 0, "Attempted to create dataset without any structures!"
+
+        data = self.tmp / "data"
+        data.mkdir()
+
+        counts = np.fromfile(self.part("counts"), dtype=dtypes["counts"])
+        np.save(data / "offsets.npy", get_offsets(counts))
+
+        shapes = {
+            "z": (counts.sum(),),
+            "r": (counts.sum(), 3),
+            "structure_hashes": (self.n, 16),
+            "b": (self.n, 3, 3),
+        }
+        names = ["z", "r", "offsets", "structure_hashes"]
+        if self.periodic:
+            names.append("b")
+        names += [f"p{i}" for i in range(len(self.properties))]
+
+        for name in names:
+            if name != "offsets":
+                raw_to_npy(
+                    self.part(name),
+                    data / f"{name}.npy",
+                    property_dtype(name),
+                    shapes.get(name, (self.n,)),
+                )
+
+        shutil.rmtree(self.tmp / "parts")
+
+        dataset = self.make_dataset(data)
+        info = {
+            "name": self.name,
+            "desc": self.desc,
+            "splits": [],
+            "_info": dataset.info.compute_all(skip_expensive=True),
+            "_hash": dataset.hash,
+            "_geom_hash": dataset.geom_hash,
+            "_hash_scheme": hashing.hash_scheme,
+            "properties": self.properties,
+        }
+        write_npd_header(self.tmp, "dataset", info, {"format": "columnar"}, names)
+
+        if self.path.exists():
+            old = temporary_path(self.path)
+            os.rename(self.path, old)
+            os.rename(self.tmp, self.path)
+            shutil.rmtree(old)
+        else:
+            os.rename(self.tmp, self.path)
+
+        return load_columnar(self.path)
+
+    def make_dataset(self, data):
+        def load(name):
+            return np.load(data / f"{name}.npy", mmap_mode="r")
+
+        return Dataset(
+            z=load("z"),
+            r=load("r"),
+            offsets=load("offsets"),
+            b=load("b") if self.periodic else None,
+            p={name: load(f"p{i}") for i, name in enumerate(self.properties)},
+            name=self.name,
+            desc=self.desc,
+            _hash_scheme=hashing.hash_scheme,
+            _structure_hashes=load("structure_hashes"),
+        )
+
+    def abort(self):
+        """Discard everything written so far."""
+        if self.tmp is not None:
+            shutil.rmtree(self.tmp, ignore_errors=True)
+            self.tmp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.abort()
+
+
+dtypes = {
+    "z": "<i8",
+    "r": "<f8",
+    "counts": "<i8",
+    "b": "<f8",
+    "structure_hashes": "u1",
+}
+
+
+def property_dtype(name):
+    return dtypes.get(name, "<f8")
+
+
+def from_atoms(atoms, properties):
+    """Convert ase.Atoms to (z, r, b, p)."""
+    z = np.array(atoms.get_atomic_numbers(), dtype=int)
+    r = np.array(atoms.get_positions(), dtype=float)
+
+    if any(atoms.get_pbc()):
+        assert all(
+            atoms.get_pbc()
+        ), "In a Dataset, either all or no structures must have periodic boundary conditions in all directions."
+        b = np.asarray(atoms.get_cell(), dtype=float)
+    else:
+        b = None
+
+    p = {name: get_property(atoms, name) for name in properties}
+
+    return z, r, b, p
+
+
+def get_property(atoms, name):
+    """Read property from ase.Atoms, either from info or calculator results."""
+    if name in atoms.info:
+        return atoms.info[name]
+    elif atoms.calc is not None and name in atoms.calc.results:
+        return atoms.calc.results[name]
+    else:
+        raise KeyError(f"Couldn't find property {name} in structure {atoms}.")
+
+
+def process(batch, properties):
+    """Convert batch of (z, r, b, p) into flat arrays and hashes."""
+    z = [item[0] for item in batch]
+    r = [item[1] for item in batch]
+
+    arrays = {
+        "z": np.concatenate(z),
+        "r": np.concatenate(r).reshape(-1, 3),
+        "counts": np.array([len(zz) for zz in z]),
+    }
+
+    if batch[0][2] is None:
+        b = None
+    else:
+        b = np.array([item[2] for item in batch])
+        arrays["b"] = b
+
+    arrays["structure_hashes"] = hashing.structure_hashes(z, r, b)
+
+    for i, name in enumerate(properties):
+        arrays[f"p{i}"] = np.array([item[3][name] for item in batch])
+
+    return arrays
+
+
+def raw_to_npy(raw, npy, dtype, shape):
+    """Turn raw binary file into .npy file, without reading it into memory."""
+    with open(npy, "wb") as f:
+        np.lib.format.write_array_header_1_0(
+            f,
+            {
+                "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                "fortran_order": False,
+                "shape": tuple(int(s) for s in shape),
+            },
+        )
+        if Path(raw).exists():
+            with open(raw, "rb") as r:
+                shutil.copyfileobj(r, f, 16 * 1024 * 1024)
@@ -0,0 +1,84 @@
+"""Columnar, memory-mappable file format for datasets.
+
+The default way of saving a `Dataset` pickles its whole config into one
+`.npy` file, which must be read (and unpickled) completely before it can
+be used. For large datasets, this is slow and needs a lot of memory.
+
+The columnar format instead stores a dataset as a directory (`.npd`, laid out
+like protocol 3 of `Data`, see `engine/data`) containing one raw `.npy` file
+for each of the following arrays:
+
+    z: Atomic numbers of all structures, concatenated, shape (total_atoms, ).
+    r: Positions of all structures, concatenated, shape (total_atoms, 3).
+    offsets: Start of each structure in z and r, shape (n + 1, ), i.e.
+        structure i is z[offsets[i]:offsets[i+1]]. (Like `AtomicRepresentation`.)
+    b: Basis vectors, if present, shape (n, 3, 3).
+    structure_hashes: Per-structure hashes, if present, see `engine/hashing.py`.
+    p0, p1, ...: Properties, one per file.
+
+Everything else (name, description, `info`, hashes, splits, ...) is stored in
+the header. Since `info` is saved, it doesn't need to be recomputed on loading.
+
+When loading, the arrays are memory-mapped (by default), and used directly
+as the linearised layout of the `Dataset`, so opening a dataset is essentially
+free, and the geometries of structures (and therefore of subsets) are views
+into the mapped files rather than copies.
+
+"""
+
+import numpy as np
+
+from cmlkit.engine.data.data import write_data_npd, read_npd
+from cmlkit.engine import _from_config
+
+from .dataset import Dataset, Subset
+
+classes = {Subset.kind: Subset, Dataset.kind: Dataset}
+
+# config entries that are stored as arrays, not in the header
+array_keys = ["z", "r", "b", "p", "_structure_hashes"]
+
+
+def save_columnar(dataset, path):
+    """Save dataset at path (a .npd directory) in the columnar format."""
+
+    data = {"z": dataset.z_flat, "r": dataset.r_flat, "offsets": dataset.offsets}
+
+    if dataset.b is not None:
+        data["b"] = np.asarray(dataset.b)
+
+    if dataset.structure_hashes is not None:
+        data["structure_hashes"] = dataset.structure_hashes
+
+    properties = list(dataset.p.keys())
+    for i, name in enumerate(properties):
+        data[f"p{i}"] = np.asarray(dataset.p[name])
+
+    config = dataset._get_config()
+    info = {k: v for k, v in config.items() if k not in array_keys}
+    info["properties"] = properties
+
+    write_data_npd(path, dataset.kind, data, info, meta={"format": "columnar"})
+
+
+def load_columnar(path, mmap_mode="r"):
+    """Load dataset from columnar .npd directory, memory-mapping the arrays by default."""
+
+    header, data = read_npd(path, mmap_mode=mmap_mode)
+    assert header["meta"].get("format", None) == "columnar", f"{path} is not a dataset."
+
+    config = dict(header["info"])
+    properties = config.pop("properties")
+
+    config["z"] = data["z"]
+    config["r"] = data["r"]
+    config["offsets"] = data["offsets"]
+    config["b"] = data.get("b", None)
+    config["p"] = {name: data[f"p{i}"] for i, name in enumerate(properties)}
+    config["_structure_hashes"] = data.get("structure_hashes", None)
+
+    return _from_config({header["kind"]: config}, classes=classes)
+
+
+def is_columnar(path):
+    return path.is_dir() and (path / "header.npy").is_file()
@@ -5,8 +5,11 @@ import numpy as np
 from ase import Atoms
 
 from cmlkit import logger
-from cmlkit.engine import compute_hash, Configurable, save_npy
-from cmlkit.utility import convert, import_qmmlpack, charges_to_elements
+from cmlkit.engine import compute_hash, Configurable, save_npy, normalize_extension
+from cmlkit.engine import hashing
+from cmlkit.utility import convert, charges_to_elements
+
+from .info import DatasetInfo
 
 # Yes, this is a bit of a nightmare -- it is really a very very overloaded class.
 # Note that we're using the Configurable infrastructure here, but it really is
@@ -38,9 +41,15 @@ class Dataset(Configurable):
     all systems can be expected to have the same number of atoms, these are ragged arrays.
 
     Currently, no type checking is performed. Also, it should be noted that storing
-    `r` or `z` as `object`-type arrays is not particularly efficient, but simple --
-    in the future, we will most likely transition to a linearised array model, which
-    allows us to store everything contiguous in memory.
+    `r` or `z` as `object`-type arrays is not particularly efficient, but simple.
+
+    Alternatively, a Dataset can be created from a linearised layout, by passing
+    the atomic numbers and positions of all structures concatenated as `z` and `r`,
+    along with `offsets`, so that structure `i` is `z[offsets[i]:offsets[i+1]]`.
+    Either way, both layouts are available: `z` and `r` are always the ragged arrays,
+    and `z_flat`, `r_flat` and `offsets` the linearised ones. They are created on
+    demand from each other (the ragged arrays are views into the flat ones), so
+    computations over all atoms can be vectorised.
 
     In addition to geometries, a Dataset can also contain *properties*, which are the
     quantities that we're trying to build models for. They are stored in the attribute `p`.
@@ -63,9 +72,16 @@ class Dataset(Configurable):
     These hashes are only computed ONCE -- Datasets are not supposed to be mutable.
     This is (in true Python fashion) not enforced, but things like caching will break.
 
+    The `geom_hash` is a combination of per-structure hashes (`structure_hashes`),
+    which are saved along with the dataset, and passed on to subsets. So the hashes
+    of a `Subset` (or a chunk) are obtained without looking at the geometries again.
+    (This is not the case for the legacy hash scheme 1, see `engine/hashing.py`.)
+
     ***
 
     Datasets are saved to disk as `.npy` files, the filename should be the name of the dataset.
+    For large datasets, the columnar format (`save(columnar=True)`, see `columnar.py`)
+    is recommended, which can be memory-mapped.
 
     They can be loaded using the `load_dataset` method supplied by `cmlkit`, which looks
     for `Datasets` in an environment variable called `CML_DATASET_PATH` and the `cwd`.
@@ -86,8 +102,10 @@ class Dataset(Configurable):
         splits: List of pre-rolled train/test splits of the form
             [[train_1, test_1], [train_2, test_2]]. Mainly to be used
             to ensure tighly controlled CV-losses. Ignored in hashing.
+        z_flat, r_flat, offsets: Linearised layout of z and r.
         hash: Hash, ignoring name and description.
         geom_hash: Like hash, but also ignoring properties.
+        structure_hashes: Hashes of each structure, (n, 16) array of digests.
         report: String with a report on this dataset and its statistics.
         info: Dict with various properties of this dataset.
 
@@ -109,43 +127,71 @@ class Dataset(Configurable):
         name=None,
         desc="",
         splits=[],
+        offsets=None,
         _info=None,
         _hash=None,
         _geom_hash=None,
+        _hash_scheme=1,
+        _structure_hashes=None,
     ):
         super().__init__()
 
+        if offsets is not None:
+            # flat layout, the ragged arrays are created on demand
+            self._z, self._r = None, None
+            self._z_flat, self._r_flat = np.asanyarray(z), np.asanyarray(r)
+            self._offsets = np.asarray(offsets, dtype=int)
+
+            assert (
+                len(self._z_flat) == len(self._r_flat) == self._offsets[-1]
+            ), "Attempted to create dataset, but flat z, r and offsets don't match ({} vs {} vs {})!".format(
+                len(self._z_flat), len(self._r_flat), self._offsets[-1]
+            )
+            n = len(self._offsets) - 1
+        else:
+            assert len(z) == len(
+                r
+            ), "Attempted to create dataset, but z and r are not of the same size ({} vs {})!".format(
+                len(z), len(r)
+            )
+            self._z, self._r = z, r
+            self._z_flat, self._r_flat, self._offsets = None, None, None
+            n = len(z)
+
         # Sanity checks
-        assert len(z) == len(
-            r
-        ), "Attempted to create dataset, but z and r are not of the same size ({} vs {})!".format(
-            len(z), len(r)
-        )
-        assert b is None or len(b) == len(
-            z
+        assert (
+            b is None or len(b) == n
         ), "Attempted to create dataset, but z and b are not of the same size ({} vs {})!".format(
-            len(z), len(b)
+            n, len(b)
         )
-        assert len(r) > 0, "Attempted to create dataset, r has 0 length!"
+        assert n > 0, "Attempted to create dataset, r has 0 length!"
 
         if p != {}:
             for pname, values in p.items():
-                assert len(values) == len(
-                    z
-                ), f"Attempted to create dataset, but z and property {pname} are not of the same size ({len(z)} vs {len(values)})!"
+                assert (
+                    len(values) == n
+                ), f"Attempted to create dataset, but z and property {pname} are not of the same size ({n} vs {len(values)})!"
 
         self.desc = desc
-        self.z = z
-        self.r = r
         self.b = b
         self.p = p
         self.splits = splits
 
-        if name is None:
-            name = compute_hash(self.z, self.r, self.b, self.p)
-        self.name = name
+        self.n = n
 
-        self.n = len(self.z)
+        # saved hashes can only be checked if they were computed with the
+        # same hash scheme, otherwise we silently recompute them
+        if _hash_scheme != hashing.hash_scheme:
+            _hash = None
+            _geom_hash = None
+            _structure_hashes = None
+
+        if hashing.hash_scheme == 1:
+            self.structure_hashes = None
+        elif _structure_hashes is not None:
+            self.structure_hashes = np.asarray(_structure_hashes, dtype=np.uint8)
+        else:
+            self.structure_hashes = hashing.structure_hashes(self.z, self.r, b)
 
         # perform some consistency checks;
         # if these ever fail there Is Trouble
@@ -168,24 +214,17 @@ class Dataset(Configurable):
         else:
             self.geom_hash = self.get_geom_hash()
 
+        if name is None:
+            name = self.hash
+        self.name = name
+
         if _info is not None:
-            self.info = _info
+            self.info = DatasetInfo(self, computed=_info)
         else:
             self.info = self.get_info()
 
         # compute auxiliary info that we need to convert properties
-        self.aux = {}
-        n_atoms = np.array([len(zz) for zz in self.z])  # count atoms in unit cell
-        n_non_O = np.array(
-            [len(zz[zz != 8]) for zz in self.z]
-        )  # count atoms that are not Oxygen
-        n_non_H = np.array(
-            [len(zz[zz != 1]) for zz in self.z]
-        )  # count atoms that are not Hydrogen
-
-        self.aux["n_atoms"] = n_atoms
-        self.aux["n_non_O"] = n_non_O
-        self.aux["n_non_H"] = n_non_H
+        self.aux = compute_aux(self)
 
         # compatibility with Data history tracking
         # to tide us over until this gets rewritten as
@@ -193,6 +232,41 @@ class Dataset(Configurable):
         self.history = [f"dataset@{self.geom_hash}"]
         self.id = self.geom_hash
 
+    @property
+    def z(self):
+        """Atomic numbers, one array per structure."""
+        if self._z is None:
+            self._z = to_ragged(self._z_flat, self._offsets)
+        return self._z
+
+    @property
+    def r(self):
+        """Positions, one array per structure."""
+        if self._r is None:
+            self._r = to_ragged(self._r_flat, self._offsets)
+        return self._r
+
+    @property
+    def z_flat(self):
+        """Atomic numbers of all structures, concatenated."""
+        if self._z_flat is None:
+            self._z_flat = np.concatenate(self._z)
+        return self._z_flat
+
+    @property
+    def r_flat(self):
+        """Positions of all structures, concatenated."""
+        if self._r_flat is None:
+            self._r_flat = np.concatenate(self._r).reshape(-1, 3)
+        return self._r_flat
+
+    @property
+    def offsets(self):
+        """Structure i is z_flat[offsets[i]:offsets[i+1]] (same for r_flat)."""
+        if self._offsets is None:
+            self._offsets = get_offsets([len(z) for z in self._z])
+        return self._offsets
+
     def _get_config(self):
 
         return {
@@ -203,32 +277,49 @@ class Dataset(Configurable):
             "b": self.b,
             "p": self.p,
             "splits": self.splits,
-            "_info": self.info,
+            "_info": dict(self.info),
             "_hash": self.hash,
             "_geom_hash": self.geom_hash,
+            "_hash_scheme": hashing.hash_scheme,
+            "_structure_hashes": self.structure_hashes,
         }
 
-    def save(self, directory="", filename=None):
-        """Save to disk, defaulting to the name as filename"""
+    def save(self, directory="", filename=None, columnar=False):
+        """Save to disk, defaulting to the name as filename.
+
+        If columnar is True, save in the memory-mappable columnar
+        format instead of a single .npy file (see `columnar.py`).
+        """
 
         directory = Path(directory)
 
         if filename is None:
             filename = self.name
 
-        save_npy(directory / filename, self.get_config())
+        if columnar:
+            from .columnar import save_columnar
+
+            save_columnar(self, normalize_extension(directory / filename, ".npd"))
+        else:
+            save_npy(directory / filename, self.get_config())
 
     def get_info(self):
-        """Compute information on dataset."""
-        return compute_dataset_info(self)
+        """Information on dataset, computed on demand (see `info.py`)."""
+        return DatasetInfo(self)
 
     def get_hash(self):
         """Hash of dataset, ignoring name and description."""
-        return compute_hash(self.z, self.r, self.b, self.p)
+        if self.structure_hashes is None:
+            return compute_hash(self.z, self.r, self.b, self.p)
+        else:
+            return compute_hash(self.get_geom_hash(), self.p)
 
     def get_geom_hash(self):
         """Hash of only the geometries, ignoring properties etc."""
-        return compute_hash(self.z, self.r, self.b)
+        if self.structure_hashes is None:
+            return compute_hash(self.z, self.r, self.b)
+        else:
+            return hashing.combine_hashes(self.structure_hashes)
 
     def pp(self, target, per="None"):
         return convert(self, self.p[target], per=per)
@@ -243,13 +334,13 @@ class Dataset(Configurable):
             size: chunksize (last chunk may be smaller)
 
         Returns:
-            Iterator over chunks, each item being a Subset.
+            Iterator over chunks, each item being a SubsetView.
         """
 
         all_idx = np.arange(self.n, dtype=int)
 
         for i in range(0, self.n, size):
-            yield Subset.from_dataset(self, idx=all_idx[i : i + size])
+            yield SubsetView(self, idx=all_idx[i : i + size])
 
     @classmethod
     def from_Atoms(cls, atoms, p={}, name=None, desc="", splits=[]):
@@ -269,23 +360,31 @@ class Dataset(Configurable):
 
         """
 
-        atoms = list(atoms)  # can't use an iterator since we iterate multiple times
+        # single pass, so atoms can be a generator
+        z, r, b, counts = [], [], [], []
+        for a in atoms:
+            z.append(np.array(a.get_atomic_numbers(), dtype=int))
+            r.append(np.array(a.get_positions(), dtype=float))
+            counts.append(len(z[-1]))
+            b.append(np.asarray(a.get_cell()) if any(a.get_pbc()) else None)
+
+            assert all(a.get_pbc()) or not any(a.get_pbc()), (
+                "In a Dataset, either all or no structures must have periodic "
+                "boundary conditions in all directions."
+            )
 
-        if any([any(a.get_pbc()) for a in atoms]):
+        if any(bb is not None for bb in b):
             assert all(
-                [all(a.get_pbc()) for a in atoms]
-            ), f"In a Dataset, either all or no structures must have periodic boundary conditions in all directions."
-            b = np.array([np.asarray(a.get_cell()) for a in atoms])
+                bb is not None for bb in b
+            ), "In a Dataset, either all or no structures must have periodic boundary conditions in all directions."
+            b = np.array(b)
         else:
             b = None
 
         return cls(
-            z=np.array(
-                [np.array(a.get_atomic_numbers(), dtype=int) for a in atoms], dtype=object
-            ),
-            r=np.array(
-                [np.array(a.get_positions(), dtype=float) for a in atoms], dtype=object
-            ),
+            z=np.concatenate(z),
+            r=np.concatenate(r).reshape(-1, 3),
+            offsets=get_offsets(np.array(counts, dtype=int)),
             b=b,
             p=p,
             name=name,
@@ -420,9 +519,12 @@ class Subset(Dataset):
         idx=None,
         parent_info={},
         splits=[],
+        offsets=None,
         _info=None,
         _hash=None,
         _geom_hash=None,
+        _hash_scheme=1,
+        _structure_hashes=None,
     ):
         # you probably want to use from_dataset in 99% of cases
         super().__init__(
@@ -433,9 +535,12 @@ class Subset(Dataset):
             name=name,
             desc=desc,
             splits=splits,
+            offsets=offsets,
             _info=_info,
             _hash=_hash,
             _geom_hash=_geom_hash,
+            _hash_scheme=_hash_scheme,
+            _structure_hashes=_structure_hashes,
         )
 
         self.idx = idx
@@ -457,6 +562,11 @@ class Subset(Dataset):
         for p, v in dataset.p.items():
             sub_properties[p] = v[idx]
 
+        if dataset.structure_hashes is not None:
+            structure_hashes = dataset.structure_hashes[idx]
+        else:
+            structure_hashes = None
+
         p = sub_properties
 
         if desc == "":
@@ -465,7 +575,9 @@ class Subset(Dataset):
         if name is None:
             name = dataset.name + "_subset" + str(len(idx))
 
-        parent_info = {"desc": dataset.desc, "name": dataset.name}
+        # the id of the parent lets representations of the subset
+        # be obtained from cached results for the parent
+        parent_info = {"desc": dataset.desc, "name": dataset.name, "id": dataset.id}
 
         return cls(
             z,
@@ -477,6 +589,8 @@ class Subset(Dataset):
             idx=idx,
             parent_info=parent_info,
             splits=splits,
+            _hash_scheme=hashing.hash_scheme,
+            _structure_hashes=structure_hashes,
         )
 
     def _get_config(self):
@@ -491,91 +605,195 @@ class Subset(Dataset):
             "idx": self.idx,
             "parent_info": self.parent_info,
             "splits": self.splits,
-            "_info": self.info,
+            "_info": dict(self.info),
             "_hash": self.hash,
             "_geom_hash": self.geom_hash,
+            "_hash_scheme": hashing.hash_scheme,
+            "_structure_hashes": self.structure_hashes,
         }
 
 
-def compute_dataset_info(dataset):
-    """Information about a dataset.
+class SubsetView(Subset):
+    """Lazy subset of a Dataset.
+
+    A view references its parent and the indices of the selected structures.
+    Nothing is copied or hashed up front: Geometries, properties, hashes and
+    `info` are obtained from the parent when they are first needed. The hashes
+    are combined from the parent's per-structure hashes, so a view has the same
+    `id` (and therefore the same cache keys) as the equivalent `Subset`.
 
-    Returns a dictionary containing information about a dataset.
+    Views are used by `Dataset.in_chunks`. When saved or pickled (for instance
+    to be sent to another process), a view is materialised as a real `Subset`.
 
     Args:
-      dataset: dataset
-
-    Returns:
-      i: Dict with the following keys:
-          elements: elements occurring in dataset
-          max_elements_per_system: largest number of different elements in a system
-          max_same_element_per_system: largest number of same-element atoms in a system
-          max_atoms_per_system: largest number of atoms in a system
-          min_distance: minimum distance between atoms in a system
-          max_distance: maximum distance between atoms in a system
-          geometry: additional detailed info about geometries (see below)
+        parent: Dataset (or view).
+        idx: Indices of the structures in the parent.
+        name, desc: See `Subset.from_dataset`.
     """
-    qmmlpack = import_qmmlpack("generate new datasets")
 
-    z = dataset.z
-    r = dataset.r
-    p = dataset.p
+    def __init__(self, parent, idx, name=None, desc=""):
+        self.parent = parent
+        self.idx = np.asarray(idx)
+        self.n = len(self.idx)
+        self.splits = []
 
-    i = {}
+        if desc == "":
+            desc = "Subset of dataset {} with n={} entries".format(parent.name, self.n)
 
-    i["number_systems"] = len(z)
+        if name is None:
+            name = parent.name + "_subset" + str(self.n)
 
-    # elements
-    i["elements"] = np.unique(
-        np.asarray([a for s in z for a in s], dtype=np.int)
-    )  # note that this is always sorted
-    i["total_elements"] = len(i["elements"])
+        self.name = name
+        self.desc = desc
+        self.parent_info = {"desc": parent.desc, "name": parent.name, "id": parent.id}
 
-    i["max_elements_per_system"] = max([np.nonzero(np.bincount(s))[0].size for s in z])
-    i["max_same_element_per_system"] = max([max(np.bincount(s)) for s in z])
-    i["min_same_element_per_system"] = min([min(np.bincount(s)) for s in z])
+        self.info = DatasetInfo(self)
+        self.lazy = {}
 
-    # systems
-    i["max_atoms_per_system"] = max([len(s) for s in z])
-    i["systems_per_element"] = np.asarray(
-        [np.sum([1 for m in z if el in m]) for el in range(118)], dtype=np.int
-    )
+    @classmethod
+    def from_dataset(cls, dataset, idx, name=None, desc=""):
+        return cls(dataset, idx, name=name, desc=desc)
 
-    # atoms
-    i["atoms_by_system"] = np.array([len(s) for s in z], dtype=int)
-    i["total_atoms"] = np.sum(i["atoms_by_system"])
+    def get_lazy(self, key, f):
+        if key not in self.lazy:
+            self.lazy[key] = f()
+        return self.lazy[key]
 
-    # distances
-    dists = [
-        qmmlpack.lower_triangular_part(qmmlpack.distance_euclidean(rr), -1) for rr in r
-    ]
-    i["min_distance"] = min([min(d) for d in dists if len(d) > 0])
-    i["max_distance"] = max([max(d) for d in dists if len(d) > 0])
+    @property
+    def z(self):
+        return self.get_lazy("z", lambda: self.parent.z[self.idx])
 
-    # geometry info
-    geom = {}
-    geom["max_dist"] = i["max_distance"]
-    geom["min_dist"] = i["min_distance"]
+    @property
+    def r(self):
+        return self.get_lazy("r", lambda: self.parent.r[self.idx])
 
-    geom["max_1/dist"] = 1 / geom["min_dist"]
-    geom["max_1/dist^2"] = 1 / geom["min_dist"] ** 2
+    @property
+    def b(self):
+        if self.parent.b is None:
+            return None
+        return self.get_lazy("b", lambda: self.parent.b[self.idx])
 
-    geom["min_1/dist"] = 1 / geom["max_dist"]
-    geom["min_1/dist^2"] = 1 / geom["max_dist"] ** 2
+    @property
+    def p(self):
+        return self.get_lazy(
+            "p", lambda: {k: v[self.idx] for k, v in self.parent.p.items()}
+        )
+
+    @property
+    def offsets(self):
+        return self.get_lazy(
+            "offsets", lambda: get_offsets(np.diff(self.parent.offsets)[self.idx])
+        )
+
+    @property
+    def rows(self):
+        """Index of the atoms of this view in the flat arrays of the parent."""
+
+        def f():
+            starts = self.parent.offsets[:-1][self.idx]
+            return np.arange(self.offsets[-1]) + np.repeat(
+                starts - self.offsets[:-1], np.diff(self.offsets)
+            )
+
+        return self.get_lazy("rows", f)
+
+    @property
+    def z_flat(self):
+        return self.get_lazy("z_flat", lambda: self.parent.z_flat[self.rows])
+
+    @property
+    def r_flat(self):
+        return self.get_lazy("r_flat", lambda: self.parent.r_flat[self.rows])
+
+    @property
+    def structure_hashes(self):
+        if self.parent.structure_hashes is None:
+            return None
+        return self.get_lazy(
+            "structure_hashes", lambda: self.parent.structure_hashes[self.idx]
+        )
+
+    @property
+    def geom_hash(self):
+        return self.get_lazy("geom_hash", self.get_geom_hash)
+
+    @property
+    def hash(self):
+        return self.get_lazy("hash", self.get_hash)
+
+    @property
+    def id(self):
+        return self.geom_hash
+
+    @property
+    def history(self):
+        return [f"dataset@{self.geom_hash}"]
+
+    @property
+    def aux(self):
+        return self.get_lazy("aux", lambda: compute_aux(self))
+
+    def materialize(self):
+        """Return a real Subset with the same content."""
+        subset = Subset.from_dataset(self.parent, self.idx, name=self.name, desc=self.desc)
+        subset.info.update(self.info)  # don't compute anything twice
+
+        return subset
+
+    def get_config(self):
+        return self.materialize().get_config()
+
+    def _get_config(self):
+        return self.materialize()._get_config()
+
+    def save(self, *args, **kwargs):
+        return self.materialize().save(*args, **kwargs)
 
-    geom["max_count"] = i["max_same_element_per_system"]
-    geom["min_count"] = i["min_same_element_per_system"]
+    def __reduce__(self):
+        return (unpickle_view, (self.materialize(),))
 
-    i["geometry"] = geom
 
-    # property info
-    prop = {}
-    for k, v in p.items():
-        prop[k] = (np.mean(v), np.std(v))
+def unpickle_view(subset):
+    # views are pickled as their materialised subset
+    return subset
 
-    i["properties"] = prop
 
-    return i
+def compute_aux(dataset):
+    """Auxiliary info that we need to convert properties."""
+    counts = np.diff(dataset.offsets)
+    structure = np.repeat(np.arange(dataset.n), counts)  # structure of each atom
+
+    aux = {}
+    aux["n_atoms"] = counts  # count atoms in unit cell
+    aux["n_non_O"] = np.bincount(
+        structure, weights=dataset.z_flat != 8, minlength=dataset.n
+    ).astype(int)  # count atoms that are not Oxygen
+    aux["n_non_H"] = np.bincount(
+        structure, weights=dataset.z_flat != 1, minlength=dataset.n
+    ).astype(int)  # count atoms that are not Hydrogen
+
+    return aux
+
+
+def get_offsets(counts):
+    offsets = np.zeros(len(counts) + 1, dtype=int)
+    offsets[1::] = np.cumsum(counts)
+
+    return offsets
+
+
+def to_ragged(flat, offsets):
+    """Object array of views into flat, one per structure."""
+    ragged = np.empty(len(offsets) - 1, dtype=object)
+    for i in range(len(ragged)):
+        ragged[i] = flat[offsets[i] : offsets[i + 1]]
+
+    return ragged
+
+
+def compute_dataset_info(dataset):
+    """Information about a dataset, with all fields computed (see `info.py`)."""
+    return DatasetInfo(dataset).compute_all()
 
 
 def compute_incidence(dataset):
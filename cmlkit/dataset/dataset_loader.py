@@ -1,32 +1,66 @@
 from pathlib import Path
 
 from cmlkit.dataset import Dataset, Subset
-from cmlkit.engine import _from_npy
+from cmlkit.engine import _from_npy, normalize_extension
 from cmlkit.env import dataset_path
 
-classes = {Subset.kind: Subset, Dataset.kind: Dataset}
+from .columnar import is_columnar
+from .sharded import ShardedDataset
+from .registry import registry
 
+classes = {
+    Subset.kind: Subset,
+    Dataset.kind: Dataset,
+    ShardedDataset.kind: ShardedDataset,
+}
 
-def load_dataset(name, other_paths=[]):
-    """Load a dataset with given (file) name."""
-    if isinstance(name, Dataset):
+
+def load_dataset(name, other_paths=[], mmap_mode="r"):
+    """Load a dataset with given (file) name.
+
+    Datasets saved in the columnar format (.npd directories) are
+    preferred over .npy files, and are memory-mapped with `mmap_mode`.
+
+    Loaded datasets are kept in memory, so loading the same dataset
+    again is free, see `registry.py`.
+    """
+    if isinstance(name, (Dataset, ShardedDataset)):
         return name
 
+    return registry.load(find_dataset(name, other_paths), mmap_mode=mmap_mode)
+
+
+def find_dataset(name, other_paths=[]):
+    """Find path of dataset with given (file) name."""
     path = Path(name)
 
     # First, try if you have passed a fully formed dataset path
-    if path.is_file():
-        return _from_npy(name, classes=classes)
+    if is_columnar(path) or path.is_file():
+        return path
 
     # Go through the dataset paths, return the first dataset found
     all_paths = dataset_path + other_paths
     for p in all_paths:
-        try:
-            file = p / path
-            return _from_npy(file, classes=classes)
-        except FileNotFoundError:
-            pass
+        file = Path(p) / path
+
+        columnar = normalize_extension(file, ".npd")
+        if is_columnar(columnar):
+            return columnar
+
+        npy = normalize_extension(file, ".npy")
+        if npy.is_file():
+            return npy
 
     raise FileNotFoundError(
         "Could not find dataset {} in paths {}".format(name, all_paths)
     )
+
+
+def load_npy(path):
+    dataset = _from_npy(path, classes=classes)
+
+    if isinstance(dataset, ShardedDataset):
+        # shards are stored relative to the manifest
+        dataset.root = Path(path).parent
+
+    return dataset
@@ -0,0 +1,247 @@
+"""Information about datasets, computed lazily.
+
+`DatasetInfo` behaves like a `dict`, but each field is only computed when
+it is first accessed. Everything is computed over the linearised layout of
+the `Dataset` (`z_flat`, `r_flat`, `offsets`), avoiding loops over structures.
+The interatomic distances (`min_distance`, `max_distance` and `geometry`)
+are by far the most expensive fields, since they require looking at all pairs
+of atoms within each structure, so they should only be accessed if needed.
+
+As before, distances are computed between the atoms in each structure as given,
+ignoring periodic images.
+
+Iterating over a `DatasetInfo` (or saving it) only yields the fields computed so
+far; use `compute_all` to obtain a dict with all fields.
+
+"""
+
+import numpy as np
+
+# number of elements in systems_per_element
+n_elements = 118
+
+# maximum number of pairwise distances computed at once
+max_pairs = 2 ** 22
+
+# fields that need all pairwise distances
+expensive = ["min_distance", "max_distance", "geometry"]
+
+
+class DatasetInfo(dict):
+    """Information about a dataset.
+
+    Fields:
+        number_systems: number of systems
+        elements: elements occurring in dataset (sorted)
+        total_elements: number of different elements
+        max_elements_per_system: largest number of different elements in a system
+        max_same_element_per_system: largest number of same-element atoms in a system
+        min_same_element_per_system: smallest entry of the element counts of any system
+            (elements up to the largest in the system, so usually 0)
+        max_atoms_per_system: largest number of atoms in a system
+        systems_per_element: number of systems containing each element
+        atoms_by_system: number of atoms in each system
+        total_atoms: total number of atoms
+        min_distance: minimum distance between atoms in a system
+        max_distance: maximum distance between atoms in a system
+        geometry: ranges for various geometry properties (derived from the above)
+        properties: (mean, std) for each property
+
+    Args:
+        dataset: Dataset.
+        computed: Dict with already computed fields.
+    """
+
+    def __init__(self, dataset, computed={}):
+        super().__init__(computed)
+        self.dataset = dataset
+        self.intermediate = {}  # shared between fields, not saved
+
+    def __missing__(self, key):
+        if key not in fields:
+            raise KeyError(key)
+
+        value = fields[key](self.dataset, self)
+        self[key] = value
+
+        return value
+
+    def compute_all(self, skip_expensive=False):
+        """Compute all fields (optionally except the distances), return as dict."""
+        return {
+            key: self[key]
+            for key in fields
+            if not (skip_expensive and key in expensive)
+        }
+
+
+def structure_index(dataset):
+    """Index of the structure each atom belongs to."""
+    return np.repeat(np.arange(dataset.n), np.diff(dataset.offsets))
+
+
+def element_counts(dataset, info):
+    """Count elements in each structure.
+
+    Returns:
+        structures, elements, counts: for each (structure, element) that occurs
+    """
+    if "element_counts" not in info.intermediate:
+        z = dataset.z_flat.astype(int)
+        base = max(z.max() + 1, n_elements)
+
+        pairs, counts = np.unique(
+            structure_index(dataset) * base + z, return_counts=True
+        )
+        info.intermediate["element_counts"] = (pairs // base, pairs % base, counts)
+
+    return info.intermediate["element_counts"]
+
+
+def get_elements(dataset, info):
+    return np.unique(dataset.z_flat.astype(int))  # note that this is always sorted
+
+
+def get_max_elements_per_system(dataset, info):
+    structures, _, _ = element_counts(dataset, info)
+    return np.bincount(structures).max()
+
+
+def get_max_same_element_per_system(dataset, info):
+    _, _, counts = element_counts(dataset, info)
+    return counts.max()
+
+
+def get_min_same_element_per_system(dataset, info):
+    # the element counts of a system include all elements up to the
+    # largest one in the system, so the minimum is only non-zero if
+    # all of these elements (including 0) are present
+    structures, elements, counts = element_counts(dataset, info)
+    n = dataset.n
+
+    distinct = np.bincount(structures, minlength=n)
+    largest = np.zeros(n, dtype=int)
+    np.maximum.at(largest, structures, elements)
+    smallest_count = np.full(n, np.iinfo(int).max)
+    np.minimum.at(smallest_count, structures, counts)
+
+    return np.where(distinct == largest + 1, smallest_count, 0).min()
+
+
+def get_systems_per_element(dataset, info):
+    _, elements, _ = element_counts(dataset, info)
+    return np.bincount(elements, minlength=n_elements)[:n_elements]
+
+
+def get_distance_range(dataset):
+    """Minimum and maximum distance between atoms within structures."""
+    counts = np.diff(dataset.offsets)
+    r = dataset.r_flat
+
+    min_distance = np.inf
+    max_distance = -np.inf
+
+    # structures with the same number of atoms are stacked and treated together
+    for n_atoms in np.unique(counts):
+        if n_atoms < 2:
+            continue
+
+        starts = dataset.offsets[:-1][counts == n_atoms]
+
+        if n_atoms * n_atoms > max_pairs:
+            # too large to compute all distances of one structure at once
+            for start in starts:
+                lower, upper = blocked_distance_range(r[start : start + n_atoms])
+                min_distance = min(min_distance, lower)
+                max_distance = max(max_distance, upper)
+            continue
+
+        atoms = starts[:, None] + np.arange(n_atoms)[None, :]
+        upper = np.triu_indices(n_atoms, k=1)
+
+        batch = max(1, max_pairs // (n_atoms * n_atoms))
+        for i in range(0, len(starts), batch):
+            positions = r[atoms[i : i + batch]]  # (m, n_atoms, 3)
+            differences = positions[:, :, None, :] - positions[:, None, :, :]
+            distances = np.sqrt(np.sum(differences ** 2, axis=-1))[:, upper[0], upper[1]]
+
+            min_distance = min(min_distance, distances.min())
+            max_distance = max(max_distance, distances.max())
+
+    if min_distance == np.inf:
+        # no structure with more than one atom
+        return np.nan, np.nan
+
+    return min_distance, max_distance
+
+
+def blocked_distance_range(positions):
+    """Minimum and maximum distance between positions, in blocks of rows."""
+    n = len(positions)
+    rows = max(1, max_pairs // n)
+
+    min_distance = np.inf
+    max_distance = -np.inf
+    for start in range(0, n - 1, rows):
+        stop = min(start + rows, n - 1)
+
+        # distances between atoms i in [start, stop) and j > i
+        differences = positions[start:stop, None, :] - positions[None, start + 1 :, :]
+        distances = np.sqrt(np.sum(differences ** 2, axis=-1))
+        upper = np.arange(start + 1, n)[None, :] > np.arange(start, stop)[:, None]
+
+        min_distance = min(min_distance, distances[upper].min())
+        max_distance = max(max_distance, distances[upper].max())
+
+    return min_distance, max_distance
+
+
+def get_min_distance(dataset, info):
+    min_distance, max_distance = get_distance_range(dataset)
+    info["max_distance"] = max_distance
+    return min_distance
+
+
+def get_max_distance(dataset, info):
+    min_distance, max_distance = get_distance_range(dataset)
+    info["min_distance"] = min_distance
+    return max_distance
+
+
+def get_geometry(dataset, info):
+    geom = {}
+    geom["max_dist"] = info["max_distance"]
+    geom["min_dist"] = info["min_distance"]
+
+    geom["max_1/dist"] = 1 / geom["min_dist"]
+    geom["max_1/dist^2"] = 1 / geom["min_dist"] ** 2
+
+    geom["min_1/dist"] = 1 / geom["max_dist"]
+    geom["min_1/dist^2"] = 1 / geom["max_dist"] ** 2
+
+    geom["max_count"] = info["max_same_element_per_system"]
+    geom["min_count"] = info["min_same_element_per_system"]
+
+    return geom
+
+
+def get_properties(dataset, info):
+    return {k: (np.mean(v), np.std(v)) for k, v in dataset.p.items()}
+
+
+fields = {
+    "number_systems": lambda dataset, info: dataset.n,
+    "elements": get_elements,
+    "total_elements": lambda dataset, info: len(info["elements"]),
+    "max_elements_per_system": get_max_elements_per_system,
+    "max_same_element_per_system": get_max_same_element_per_system,
+    "min_same_element_per_system": get_min_same_element_per_system,
+    "max_atoms_per_system": lambda dataset, info: info["atoms_by_system"].max(),
+    "systems_per_element": get_systems_per_element,
+    "atoms_by_system": lambda dataset, info: np.diff(dataset.offsets),
+    "total_atoms": lambda dataset, info: dataset.offsets[-1],
+    "min_distance": get_min_distance,
+    "max_distance": get_max_distance,
+    "geometry": get_geometry,
+    "properties": get_properties,
+}
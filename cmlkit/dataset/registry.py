@@ -0,0 +1,128 @@
+"""Registry of loaded datasets.
+
+Loading a dataset can be expensive, and many components (for instance evaluators,
+which are instantiated once per worker of an `EvaluationPool`) load the same datasets.
+`load_dataset` therefore goes through a `Registry`, which keeps each loaded dataset
+in memory, keyed by its path and the modification time and size of the file,
+so changed files are loaded again. Loaded datasets can also be looked up by hash.
+At most `max_datasets` datasets are kept, the least recently loaded ones are dropped
+from the registry first (they stay valid for anyone still holding them).
+
+Datasets in the columnar format (see `columnar.py`) are memory-mapped, so different
+processes loading the same one share its memory through the page cache. To extend
+this to other datasets, a `location` can be set: Datasets that aren't columnar
+are then converted once into the columnar format at `location` (by whichever process
+gets there first, while the others wait) and memory-mapped from there. The
+`EvaluationPool` sets this up for its workers if the `Run` enables `share_datasets`.
+
+Since datasets are shared, they must not be modified after loading. (Which is
+anyway discouraged.)
+
+"""
+
+from collections import OrderedDict
+from pathlib import Path
+
+from cmlkit.engine import compute_hash
+from cmlkit.engine.cache.lock import Lock
+
+from .columnar import load_columnar, is_columnar
+from .sharded import ShardedDataset
+
+
+class Registry:
+    """In-process cache of loaded datasets.
+
+    Parameters:
+        location: Optional, directory in which datasets that aren't in the
+            columnar format are converted for sharing between processes.
+        max_datasets: Optional, maximum number of datasets to keep loaded.
+
+    """
+
+    def __init__(self, location=None, max_datasets=16):
+        self.location = location
+        self.max_datasets = max_datasets
+        self.datasets = OrderedDict()  # key -> dataset, in order of last use
+        self.by_hash = {}  # hash -> dataset
+
+    def load(self, path, mmap_mode="r"):
+        """Load dataset from path, or return the already loaded instance."""
+        key = get_key(path)
+        index = (key, mmap_mode)
+
+        if index in self.datasets:
+            self.datasets.move_to_end(index)
+        else:
+            dataset = self.read(path, key, mmap_mode)
+            self.datasets[index] = dataset
+            self.by_hash[dataset.hash] = dataset
+
+            while len(self.datasets) > self.max_datasets:
+                _, evicted = self.datasets.popitem(last=False)
+                if self.by_hash.get(evicted.hash, None) is evicted:
+                    del self.by_hash[evicted.hash]
+
+        return self.datasets[index]
+
+    def get(self, hash):
+        """Return loaded dataset with given hash, or None."""
+        return self.by_hash.get(hash, None)
+
+    def clear(self):
+        self.datasets = OrderedDict()
+        self.by_hash = {}
+
+    def read(self, path, key, mmap_mode):
+        if self.location is None or mmap_mode is None or is_columnar(path):
+            return read_dataset(path, mmap_mode=mmap_mode)
+
+        location = Path(self.location)
+        location.mkdir(parents=True, exist_ok=True)
+        shared = location / f"{key}.npd"
+
+        if not is_columnar(shared):
+            lock = Lock(location / f"{key}.lock")
+            if lock.acquire():
+                try:
+                    if not is_columnar(shared):
+                        dataset = read_dataset(path)
+                        if isinstance(dataset, ShardedDataset):
+                            # only a manifest, shards are loaded separately
+                            return dataset
+
+                        dataset.save(directory=location, filename=key, columnar=True)
+                finally:
+                    lock.release()
+            else:
+                lock.wait()
+
+        if is_columnar(shared):
+            return load_columnar(shared, mmap_mode=mmap_mode)
+        else:
+            # conversion failed elsewhere, no point in waiting again
+            return read_dataset(path, mmap_mode=mmap_mode)
+
+
+def get_key(path):
+    """Key identifying a dataset file, changes if the file does."""
+    path = Path(path).resolve()
+
+    if path.is_dir():
+        stat = (path / "header.npy").stat()
+    else:
+        stat = path.stat()
+
+    return compute_hash(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def read_dataset(path, mmap_mode="r"):
+    from .dataset_loader import load_npy
+
+    if is_columnar(path):
+        return load_columnar(path, mmap_mode=mmap_mode)
+    else:
+        return load_npy(path)
+
+
+registry = Registry()
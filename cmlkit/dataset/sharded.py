@@ -0,0 +1,242 @@
+"""Datasets spanning multiple files.
+
+A `ShardedDataset` is a manifest that lists a number of shards, each of which
+is an ordinary `Dataset` saved in its own file (ideally in the columnar format,
+see `columnar.py`). The manifest is saved like a normal dataset (as `.npy` file),
+so it is found by `load_dataset`. Shard paths are stored relative to the manifest,
+and shards are only loaded (memory-mapped, if columnar) when they are accessed.
+
+Nothing ever needs to hold all shards at once: Representations of a sharded
+dataset are computed shard by shard (and cached per shard), kernels are assembled
+block by block, and `Model.predict` predicts one shard at a time. Only arrays with
+one entry per structure (properties, number of atoms) are ever concatenated.
+
+A sharded dataset has the same `hash` and `geom_hash` as the `Dataset` obtained by
+concatenating its shards, since these hashes are combinations of the hashes of the
+individual structures (this requires a hash scheme with structure hashes, see
+`engine/hashing.py`).
+
+Since the manifest is small, sharded datasets are cheap to pass to worker processes,
+for instance evaluators in an `EvaluationPool`, which load shards themselves.
+
+Usage:
+    sharded = ShardedDataset.from_datasets(datasets, name="big")
+    sharded.save(directory)  # writes big.npy and big/shard_00000.npd, ...
+    sharded = load_dataset("big")
+
+"""
+
+import os
+import numpy as np
+from pathlib import Path
+
+from cmlkit.engine import Configurable, save_npy, compute_hash, hashing
+from cmlkit.utility import convert
+
+from .dataset import get_offsets
+
+
+class ShardedDataset(Configurable):
+    """Dataset split across multiple files.
+
+    Attributes:
+        name: Name of the dataset.
+        desc: Description.
+        shards: List of paths of the shards (relative to root).
+        sizes: Number of structures in each shard.
+        root: Directory the shard paths are relative to, set when loading.
+        n: Total number of structures.
+        starts: Index of the first structure of each shard, plus n.
+        hash, geom_hash, id, history: As for `Dataset`.
+
+    Methods:
+        shard: Load one shard.
+        pp: Properties per X, concatenated over all shards.
+
+    """
+
+    kind = "sharded_dataset"
+
+    def __init__(
+        self,
+        shards,
+        sizes,
+        name=None,
+        desc="",
+        properties=[],
+        _hash=None,
+        _geom_hash=None,
+        _hash_scheme=None,
+        _datasets=None,
+    ):
+        super().__init__()
+
+        self.shards = [str(shard) for shard in shards]
+        self.sizes = np.array(sizes, dtype=int)
+        self.name = name
+        self.desc = desc
+        self.properties = list(properties)
+        self.root = Path("")
+
+        # datasets not yet saved, see from_datasets
+        self._datasets = _datasets
+
+        self._p = None
+        self._aux = None
+
+        # as for Dataset, saved hashes are only used if they were computed with
+        # the current hash scheme (manifests without a scheme are recomputed)
+        if _hash_scheme != hashing.hash_scheme:
+            _hash = None
+            _geom_hash = None
+
+        # otherwise, they are computed when first needed, since that
+        # requires loading the shards, which are relative to root
+        self._hash = _hash
+        self._geom_hash = _geom_hash
+
+    @property
+    def geom_hash(self):
+        if self._geom_hash is None:
+            self._geom_hash = self.get_geom_hash()
+        return self._geom_hash
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            self._hash = compute_hash(self.geom_hash, self.p)
+        return self._hash
+
+    @property
+    def history(self):
+        # same as for Dataset
+        return [f"dataset@{self.geom_hash}"]
+
+    @property
+    def id(self):
+        return self.geom_hash
+
+    @classmethod
+    def from_datasets(cls, datasets, name=None, desc=""):
+        """Create ShardedDataset from Datasets, which need to be saved before use."""
+        properties = list(datasets[0].p.keys())
+        for dataset in datasets:
+            assert (
+                list(dataset.p.keys()) == properties
+            ), "All shards must have the same properties."
+
+        return cls(
+            shards=[f"{name}/shard_{i:05d}.npd" for i in range(len(datasets))],
+            sizes=[dataset.n for dataset in datasets],
+            name=name,
+            desc=desc,
+            properties=properties,
+            _datasets=datasets,
+        )
+
+    def _get_config(self):
+        return {
+            "shards": self.shards,
+            "sizes": self.sizes.tolist(),
+            "name": self.name,
+            "desc": self.desc,
+            "properties": self.properties,
+            "_hash": self.hash,
+            "_geom_hash": self.geom_hash,
+            "_hash_scheme": hashing.hash_scheme,
+        }
+
+    def save(self, directory="", filename=None):
+        """Save manifest (and shards, if they haven't been saved yet) to directory.
+
+        Shards that were already saved are not moved, the manifest refers to them
+        relative to directory.
+        """
+        directory = Path(directory)
+
+        if filename is None:
+            filename = self.name
+
+        if self._datasets is not None:
+            for path, dataset in zip(self.shards, self._datasets):
+                path = directory / path
+                path.parent.mkdir(parents=True, exist_ok=True)
+                dataset.save(directory=path.parent, filename=path.name, columnar=True)
+
+            self._datasets = None
+        else:
+            # shards stay where they are, their paths are relative to the manifest
+            self.shards = [
+                os.path.relpath(self.root / shard, directory) for shard in self.shards
+            ]
+
+        self.root = directory
+        directory.mkdir(parents=True, exist_ok=True)
+        save_npy(directory / filename, self.get_config())
+
+    @property
+    def n(self):
+        return int(self.sizes.sum())
+
+    @property
+    def starts(self):
+        return get_offsets(self.sizes)
+
+    def __len__(self):
+        return len(self.shards)
+
+    def shard(self, i):
+        """Load shard i (memory-mapped, if it's columnar)."""
+        if self._datasets is not None:
+            return self._datasets[i]
+
+        from .dataset_loader import load_dataset
+
+        return load_dataset(self.root / self.shards[i])
+
+    def in_shards(self):
+        """Iterate over shards, loading one at a time."""
+        for i in range(len(self)):
+            yield self.shard(i)
+
+    def get_geom_hash(self):
+        """Combination of all structure hashes, same as for the concatenated Dataset."""
+
+        def chunks():
+            for shard in self.in_shards():
+                assert (
+                    shard.structure_hashes is not None
+                ), "ShardedDataset requires a hash scheme with structure hashes."
+                yield shard.structure_hashes
+
+        return hashing.combine_hash_chunks(chunks(), self.n)
+
+    @property
+    def p(self):
+        """Properties, concatenated over all shards."""
+        if self._p is None:
+            self.collect()
+        return self._p
+
+    @property
+    def aux(self):
+        """Auxiliary info (number of atoms, etc.), concatenated over all shards."""
+        if self._aux is None:
+            self.collect()
+        return self._aux
+
+    def collect(self):
+        p = {name: [] for name in self.properties}
+        aux = {}
+
+        for shard in self.in_shards():
+            for name in self.properties:
+                p[name].append(np.asarray(shard.p[name]))
+            for key, value in shard.aux.items():
+                aux.setdefault(key, []).append(value)
+
+        self._p = {name: np.concatenate(value) for name, value in p.items()}
+        self._aux = {key: np.concatenate(value) for key, value in aux.items()}
+
+    def pp(self, target, per="None"):
+        return convert(self, self.p[target], per=per)
@@ -2,4 +2,8 @@
 
 from .caches import Caches
 from .no import NoCache
+from .disk import DiskCache
+from .memory import MemoryCache
+from .tiered import TieredCache
 from .cached import Cached
+from .janitor import Janitor
@@ -1,16 +1,33 @@
+import time
+
+
 class Cache:
-    """Cache base class."""
+    """Cache base class.
+
+    Caches that record compute durations (`records_durations`) remember when
+    each key was missed, and must consume that time with `duration` (on store)
+    or drop it in `abandon`. Others don't record anything, so they don't
+    accumulate a timestamp for every key they ever missed.
+    """
+
+    records_durations = True
 
     def __init__(self):
         self.misses = 0
         self.hits = 0
 
+        # time of the last miss for each key, used to
+        # estimate how long it took to compute a result
+        self.missed_at = {}
+
     def __contains__(self, key):
         """Is key in cache?"""
 
         found = self.check(key)
         if not found:
             self.misses += 1
+            if self.records_durations:
+                self.missed_at[key] = time.monotonic()
 
         return found
 
@@ -39,10 +56,40 @@ class Cache:
 
         return data
 
+    def peek(self, key):
+        """Get cached result if available, without counting or claiming it.
+
+        Use this to look for results that can be used to obtain the
+        result for another key, see `Representation.from_parent`.
+
+        Returns:
+            Cached result if available, otherwise None.
+        """
+
+        if not self.check(key):
+            return None
+
+        return self.try_retrieve(key)
+
     def submit(self, key, data):
         # wrapping just in case
         self.store(key, data)
 
+    def abandon(self, key):
+        """Signal that computing the result for key has failed.
+
+        Caches that coordinate computations between processes
+        use this to let others know they shouldn't wait for us.
+        """
+        self.missed_at.pop(key, None)
+
+    def duration(self, key):
+        """Time since key was last missed, i.e. approximately the compute time."""
+        if key in self.missed_at:
+            return time.monotonic() - self.missed_at.pop(key)
+        else:
+            return None
+
     def try_retrieve(self, key):
         # overload this to implement
         # "risky" retrieval that may
@@ -1,8 +1,11 @@
 from pathlib import Path
 
-from cmlkit.engine import parse_config, compute_hash
+from cmlkit.engine import parse_config
 
 from .disk import DiskCache
+from .memory import MemoryCache
+from .tiered import TieredCache
+from .janitor import Janitor
 from .no import NoCache
 
 
@@ -13,8 +16,76 @@ class Caches:
         self.location = Path(location)
 
         self.caches = []
+        self.tiered = {}
+
+        # options for single-flight deduplication, see `register`
+        self.flight = None
+        self.flights = {}
+
+        # default for `locking` of disk caches, set by `EvaluationPool` in workers
+        self.locking = False
+
+    def janitor(self, **kwargs):
+        """Janitor for this cache location, see `janitor.py`."""
+        return Janitor(self.location, **kwargs)
+
+    def usage(self):
+        """Disk usage by component kind."""
+        return self.janitor().usage()
+
+    def stats(self):
+        """Hit/miss statistics of all registered caches, by tier if applicable."""
+        stats = {}
+        for name, key, cache in self.caches:
+            if isinstance(cache, TieredCache):
+                stats[key] = cache.stats
+            else:
+                stats[key] = {"hits": cache.hits, "misses": cache.misses}
+
+        return stats
+
+    def flush(self):
+        """Wait for pending write-behind operations."""
+        for cache in self.tiered.values():
+            cache.flush()
+
+    def make_disk(self, key, cache_inner):
+        cache_inner.setdefault("locking", self.locking)
+
+        if "location" in cache_inner:
+            cache_inner["location"] = Path(cache_inner["location"]) / key
+        else:
+            cache_inner["location"] = self.location / key
+
+        return DiskCache(**cache_inner)
 
     def register(self, component):
+        cache = self.make_cache(component)
+
+        # single flight: components that opt in (`single_flight = True`),
+        # and that aren't cached otherwise, get a disk cache in a shared
+        # location, which deduplicates computations between processes
+        # (for instance the workers of an `EvaluationPool`)
+        if self.flight is not None and getattr(component, "single_flight", False):
+            if cache is None or isinstance(cache, NoCache):
+                cache = self.make_flight(component)
+
+        return cache
+
+    def make_flight(self, component):
+        key = f"{component.kind}/{component.get_hash()}"
+        # the whole point of single flight is coordinating processes
+        flight = {"locking": True, **self.flight}
+        location = Path(flight.pop("location")) / key
+
+        if location not in self.flights:
+            cache = DiskCache(location=location, **flight)
+            self.flights[location] = cache
+            self.caches.append((str(component), key, cache))
+
+        return self.flights[location]
+
+    def make_cache(self, component):
         # in case it gets overwritten!
         self.location = Path(self.location)
 
@@ -25,22 +96,32 @@ class Caches:
             cache_kind, cache_inner = parse_config(
                 cache_config, shortcut_ok=True
             )
+            cache_inner = dict(cache_inner)  # don't modify the context
 
             if cache_kind == "no":
                 return NoCache()
 
             elif cache_kind == "disk":
-                if "location" in cache_inner:
-                    cache_inner["location"] = Path(cache_inner["location"]) / key
-                else:
-                    cache_inner["location"] = self.location / key
+                cache = self.make_disk(key, cache_inner)
+                self.caches.append((str(component), key, cache))
+
+            elif cache_kind == "tiered":
+                memory_bytes = cache_inner.pop("memory_bytes", "1G")
+                write_behind = cache_inner.pop("write_behind", True)
+                disk = self.make_disk(key, cache_inner)
+
+                # the memory tier is shared between all instances with the same config
+                if disk.location in self.tiered:
+                    return self.tiered[disk.location]
 
-                cache = DiskCache(**cache_inner)
+                memory = MemoryCache(memory_bytes)
+                cache = TieredCache(memory, disk, write_behind=write_behind)
+                self.tiered[disk.location] = cache
                 self.caches.append((str(component), key, cache))
 
             else:
                 raise NotImplementedError(
-                    f"Currently, only 'disk' type caches are supported. Not {cache_config}."
+                    f"Currently, only 'disk' and 'tiered' type caches are supported. Not {cache_config}."
                 )
 
             return cache
@@ -1,50 +1,208 @@
+import time
 from pickle import UnpicklingError
 
 from cmlkit import logger
-from cmlkit.engine.data import load_data
+from cmlkit.engine.data import load_data, data_filename
 
 from .cache import Cache
+from .janitor import Janitor, append_event, entry_size, remove_entry
+from .lock import Lock
 
 
 class DiskCache(Cache):
-    """Rudimentary disk cache.
+    """Disk cache with usage accounting and optional eviction.
 
-    WARNING: NO CLEANUP IS DONE. BE CAREFUL!
+    Defaults to dumping protocol 1 (uncompressed .npz), and reading
+    entries into memory. If you know you will be generating easily
+    compressible files you can manually switch to protocol 2 (compressed .npz)
+    in the component context. Protocol 3 is a directory of raw .npy files,
+    which can be memory-mapped when they are retrieved (with `mmap_mode="r"`),
+    so cache hits are almost free, and multiple processes on one machine
+    share the memory through the page cache. Retrieved arrays are then
+    read-only. Since entries are looked up by the filename of the configured
+    protocol, changing it means starting with an empty cache.
+
+    Every store and hit is recorded in an index in the cache
+    directory, which is used by the `Janitor` to evict entries.
+    If `max_bytes` or `max_entries` is given, a `Janitor` is run
+    on all caches of the same component kind (i.e. the parent
+    directory of `location`) whenever the budget is likely exceeded,
+    but at least every `gc_interval` seconds. Without budgets, NO
+    CLEANUP IS DONE, but `cmlkit cache gc` can be used to clean up
+    manually, also while other processes are using the cache.
+
+    Entries are written atomically, i.e. under a temporary name first.
+    If `locking` is True, a miss claims the key with a lock file, which
+    is released once the result is stored (or `abandon` is called).
+    Other processes (for instance workers of an `EvaluationPool`) that
+    miss the same key wait for the result instead of duplicating the
+    computation. Locks of crashed or killed processes become stale
+    after `stale_after` seconds and are broken. (See `lock.py`.) Locking
+    is off by default, since it's only useful if multiple processes share the
+    cache. `EvaluationPool` turns it on for the disk caches of its workers,
+    unless it is set explicitly in the cache config.
+
+    Parameters:
+        location: Directory of this cache.
+        protocol: Data protocol used for dumping.
+        mmap_mode: Memory-map mode for loading protocol 3 data, None to read into memory.
+        max_bytes: Optional, maximum size of caches of this kind (int or string like "10G").
+        max_entries: Optional, maximum number of entries in caches of this kind.
+        policy: Eviction policy, see `Janitor`.
+        gc_interval: Seconds after which to re-check usage if budgets are set.
+        locking: If True, coordinate computations with other processes.
+        stale_after: Seconds without heartbeat after which a lock is stale.
+        poll_interval: Seconds between checks while waiting for a lock.
 
-    Defaults to dumping protocol 1, which is
-    non-compressed .npz files. If you know you
-    will be generating easily compressible files
-    you can manually overwrite this in the component
-    context.
     """
 
-    def __init__(self, location, protocol=1):
+    def __init__(
+        self,
+        location,
+        protocol=1,
+        mmap_mode=None,
+        max_bytes=None,
+        max_entries=None,
+        policy="lru",
+        gc_interval=300.0,
+        locking=False,
+        stale_after=60.0,
+        poll_interval=0.5,
+    ):
         super().__init__()
 
         self.location = location
         self.protocol = protocol
+        self.mmap_mode = mmap_mode
+
+        if max_bytes is not None or max_entries is not None:
+            # location is root/kind/component_hash
+            self.janitor = Janitor(
+                self.location.parent.parent,
+                max_bytes=max_bytes,
+                max_entries=max_entries,
+                policy=policy,
+            )
+        else:
+            self.janitor = None
+
+        self.gc_interval = gc_interval
+        self.last_gc = None
+        self.usage = None
+
+        self.locking = locking
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self.held = {}  # key -> Lock, for keys we're computing
 
     def filename(self, key):
-        return self.location / (key + ".npz")
+        return data_filename(self.location / key, self.protocol)
+
+    def lockname(self, key):
+        return self.location / f".{key}.lock"
 
     def check(self, key):
-        return self.filename(key).is_file()
+        return self.filename(key).exists()
+
+    def get_if_cached(self, key):
+        data = super().get_if_cached(key)
+
+        if data is not None or not self.locking or key in self.held:
+            return data
+
+        # we missed: either we claim the key and compute it,
+        # or we wait for whoever is already computing it
+        self.location.mkdir(parents=True, exist_ok=True)
+        while True:
+            lock = Lock(self.lockname(key), stale_after=self.stale_after)
+
+            if lock.acquire():
+                # the result may have arrived between our check and acquiring
+                if self.check(key):
+                    lock.release()
+                    data = self.try_retrieve(key)
+                    if data is not None:
+                        self.hits += 1
+                        return data
+                    continue
+
+                self.held[key] = lock
+                return None
+
+            logger.info(f"Waiting for another process to compute {key} in {self.location}.")
+            lock.wait(poll_interval=self.poll_interval)
+
+            if self.check(key):
+                data = self.try_retrieve(key)
+                if data is not None:
+                    self.hits += 1
+                    return data
 
     def store(self, key, data):
+        duration = self.duration(key)
         self.location.mkdir(parents=True, exist_ok=True)
-        data.dump(self.filename(key), protocol=self.protocol)
+        filename = self.filename(key)
+
+        try:
+            data.dump(filename, protocol=self.protocol)
+        finally:
+            self.abandon(key)
+
+        size = entry_size(filename)
+        self.record("store", key, size=size, duration=duration)
+        self.account(size)
+
+    def abandon(self, key):
+        super().abandon(key)
+        if key in self.held:
+            self.held.pop(key).release()
 
     def retrieve(self, key):
-        return load_data(self.filename(key))
+        result = load_data(self.filename(key), mmap_mode=self.mmap_mode)
+        self.record("hit", key)
+
+        return result
 
     def try_retrieve(self, key):
         # sometimes, corrupted data is written to disk
         # this catches it and deletes the corrupted data
+        # (or the entry has been evicted in the meantime)
         try:
             return self.retrieve(key)
         except (EOFError, OSError, UnpicklingError):
             filename = self.filename(key)
-            logger.error(f"Could not read cache file {filename}; deleting it.")
-            filename.unlink()
+            self.missed_at[key] = time.monotonic()
+            if filename.exists():
+                remove_entry(filename)
+                logger.error(f"Could not read cache file {filename}; deleted it.")
 
             return None
+
+    def record(self, op, key, **kwargs):
+        try:
+            append_event(self.location, {"op": op, "key": key, "time": time.time(), **kwargs})
+        except OSError:
+            # accounting is best-effort, it must never break a computation
+            logger.warning(f"Could not write to cache index in {self.location}.")
+
+    def account(self, size):
+        """Keep track of usage, and collect garbage if needed."""
+        if self.janitor is None:
+            return
+
+        if self.usage is not None:
+            self.usage["bytes"] += size
+            self.usage["entries"] += 1
+
+        now = time.monotonic()
+        if (
+            self.usage is None
+            or now - self.last_gc > self.gc_interval
+            or self.janitor.over_budget(
+                self.janitor.default_budget, self.usage["bytes"], self.usage["entries"]
+            )
+        ):
+            kind = self.location.parent.name
+            self.janitor.collect_kind(kind)
+            self.usage = self.janitor.usage_of_kind(kind)
+            self.last_gc = now
@@ -0,0 +1,355 @@
+"""Usage accounting and cleanup for disk caches.
+
+`DiskCache` keeps an append-only index (`index.jsonl`) in each
+cache directory, recording when entries are stored and retrieved,
+how large they are, and (approximately) how long they took to compute.
+
+The `Janitor` reads these indices, works out how much space each
+component kind uses, and evicts entries until the configured
+budgets are respected. It is intended to run concurrently with
+workers that are using the cache:
+
+- Appending a single short line to a file is atomic on local
+  filesystems, so workers never need to coordinate with each other.
+- Compacting the index is done by writing a new file and renaming it
+  in place, so readers always see a complete index. Events appended
+  while the janitor is compacting may be lost, which only costs
+  some accounting precision: The files on disk are the ground truth,
+  entries without index information are accounted for using `stat`.
+- Deleting an entry while another process reads it is fine on POSIX
+  systems, and `DiskCache` treats entries vanishing from under it as misses.
+
+The layout of the cache is `location/kind/component_hash/entry`, and
+budgets are applied per kind, i.e. to all components of a given kind.
+
+"""
+
+import json
+import time
+import shutil
+from pathlib import Path
+
+from cmlkit import logger
+
+index_name = "index.jsonl"
+
+units = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_bytes(size):
+    """Turn size (int or string like '10G') into number of bytes."""
+    if size is None or isinstance(size, int):
+        return size
+
+    size = str(size).strip().upper().rstrip("B")
+    if size[-1:] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    else:
+        return int(float(size))
+
+
+def format_bytes(size):
+    for unit in ["", "K", "M", "G"]:
+        if size < 1024:
+            return f"{size:.1f}{unit}B"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+
+def append_event(location, event):
+    """Append event (a dict) to the index in location."""
+    line = json.dumps(event) + "\n"
+    with open(Path(location) / index_name, "a") as f:
+        f.write(line)
+
+
+def entry_size(path):
+    """Size of a cache entry (file or directory) in bytes."""
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    else:
+        return path.stat().st_size
+
+
+def remove_entry(path):
+    try:
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def remove_leftovers(location, max_age):
+    """Remove temporary files and lock files older than max_age seconds.
+
+    These are left behind by processes that crashed while writing.
+    (Live temporary files and locks are refreshed regularly.)
+    """
+    now = time.time()
+    for path in Path(location).iterdir():
+        if not path.name.startswith("."):
+            continue
+
+        try:
+            mtimes = [path.stat().st_mtime]
+            if path.is_dir():
+                mtimes += [p.stat().st_mtime for p in path.rglob("*")]
+        except FileNotFoundError:
+            continue
+
+        if now - max(mtimes) > max_age:
+            remove_entry(path)
+
+
+def is_entry(path):
+    # index files, temporary files and locks are not entries
+    return not (path.name == index_name or path.name.startswith("."))
+
+
+def read_entries(location):
+    """Read entries of one cache directory, combining index and filesystem.
+
+    Returns:
+        Dict of key -> dict with "path", "size", "stored", "accessed", "hits", "duration".
+    """
+    location = Path(location)
+
+    events = {}
+    index = location / index_name
+    if index.is_file():
+        with open(index, "r") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # partially written line, skip
+                    continue
+
+                info = events.setdefault(event["key"], {"hits": 0, "duration": None})
+                if event["op"] == "store":
+                    info["stored"] = event["time"]
+                    info["duration"] = event.get("duration", None)
+                    info["accessed"] = max(event["time"], info.get("accessed", 0.0))
+                elif event["op"] == "hit":
+                    info["accessed"] = max(event["time"], info.get("accessed", 0.0))
+                    info["hits"] += event.get("count", 1)
+
+    entries = {}
+    for path in location.iterdir():
+        if not is_entry(path):
+            continue
+
+        key = path.name.split(".")[0]
+        try:
+            stat = path.stat()
+            size = entry_size(path)
+        except FileNotFoundError:
+            continue
+
+        info = events.get(key, {"hits": 0, "duration": None})
+        entries[key] = {
+            "path": path,
+            "size": size,
+            "stored": info.get("stored", stat.st_mtime),
+            "accessed": info.get("accessed", stat.st_mtime),
+            "hits": info["hits"],
+            "duration": info["duration"],
+        }
+
+    return entries
+
+
+def compact_index(location, entries):
+    """Rewrite index in location to contain only one line per entry."""
+    location = Path(location)
+    tmp = location / f".{index_name}.{time.time()}.tmp"
+
+    with open(tmp, "w") as f:
+        for key, e in entries.items():
+            store = {
+                "op": "store",
+                "key": key,
+                "time": e["stored"],
+                "size": e["size"],
+                "duration": e["duration"],
+            }
+            hit = {"op": "hit", "key": key, "time": e["accessed"], "count": e["hits"]}
+            f.write(json.dumps(store) + "\n")
+            f.write(json.dumps(hit) + "\n")
+
+    tmp.replace(location / index_name)
+
+
+def score_lru(entry):
+    return entry["accessed"]
+
+
+def score_lfu(entry):
+    return (entry["hits"], entry["accessed"])
+
+
+def score_cost(entry):
+    # value of keeping an entry: compute time saved per byte,
+    # entries without known duration are assumed to be cheap
+    duration = entry["duration"] if entry["duration"] is not None else 0.0
+    return (duration * (1 + entry["hits"]) / max(entry["size"], 1), entry["accessed"])
+
+
+policies = {"lru": score_lru, "lfu": score_lfu, "cost": score_cost}
+
+
+class Janitor:
+    """Keeps disk usage of a cache location within budgets.
+
+    Entries with the lowest score according to the policy are evicted first:
+
+    - `lru`: least recently used
+    - `lfu`: least frequently used (ties broken by recency)
+    - `cost`: lowest recorded compute duration (times uses) per byte
+
+    Parameters:
+        location: Root of the cache (containing one directory per kind).
+        max_bytes: Default maximum size per kind (int or string like "10G").
+        max_entries: Default maximum number of entries per kind.
+        budgets: Dict of kind -> {"max_bytes": ..., "max_entries": ...},
+            overriding the defaults for specific kinds.
+        policy: Eviction policy, "lru", "lfu" or "cost".
+        max_age_leftovers: Seconds after which temporary files and locks
+            left behind by crashed processes are removed.
+
+    """
+
+    def __init__(
+        self,
+        location,
+        max_bytes=None,
+        max_entries=None,
+        budgets=None,
+        policy="lru",
+        max_age_leftovers=86400.0,
+    ):
+        self.location = Path(location)
+        self.max_age_leftovers = max_age_leftovers
+        self.default_budget = {
+            "max_bytes": parse_bytes(max_bytes),
+            "max_entries": max_entries,
+        }
+        self.budgets = {
+            kind: {
+                "max_bytes": parse_bytes(budget.get("max_bytes", max_bytes)),
+                "max_entries": budget.get("max_entries", max_entries),
+            }
+            for kind, budget in (budgets or {}).items()
+        }
+
+        assert policy in policies, f"Unknown eviction policy {policy}."
+        self.policy = policy
+        self.score = policies[policy]
+
+    def kinds(self):
+        if not self.location.is_dir():
+            return []
+        return sorted(p.name for p in self.location.iterdir() if p.is_dir())
+
+    def read_kind(self, kind):
+        """Entries of all components of a kind.
+
+        Returns:
+            Dict of component directory -> entries.
+        """
+        kind_location = self.location / kind
+        return {
+            d: read_entries(d)
+            for d in sorted(kind_location.iterdir())
+            if d.is_dir() and is_entry(d)
+        }
+
+    def usage(self):
+        """Disk usage by kind.
+
+        Returns:
+            Dict of kind -> {"bytes": total bytes, "entries": number of entries}.
+        """
+        return {kind: self.usage_of_kind(kind) for kind in self.kinds()}
+
+    def usage_of_kind(self, kind):
+        if not (self.location / kind).is_dir():
+            return {"bytes": 0, "entries": 0}
+
+        all_entries = [e for d in self.read_kind(kind).values() for e in d.values()]
+        return {
+            "bytes": sum(e["size"] for e in all_entries),
+            "entries": len(all_entries),
+        }
+
+    def collect(self, kinds=None, dry_run=False):
+        """Evict entries until all kinds are within budget.
+
+        Args:
+            kinds: Optional, list of kinds to process, defaults to all.
+            dry_run: If True, only report what would be evicted.
+
+        Returns:
+            List of paths of evicted entries.
+        """
+        if kinds is None:
+            kinds = self.kinds()
+
+        evicted = []
+        for kind in kinds:
+            evicted += self.collect_kind(kind, dry_run=dry_run)
+
+        return evicted
+
+    def collect_kind(self, kind, dry_run=False):
+        if not (self.location / kind).is_dir():
+            return []
+
+        budget = self.budgets.get(kind, self.default_budget)
+        components = self.read_kind(kind)
+
+        candidates = sorted(
+            [(d, key, e) for d, entries in components.items() for key, e in entries.items()],
+            key=lambda c: self.score(c[2]),
+        )
+
+        total_bytes = sum(c[2]["size"] for c in candidates)
+        total_entries = len(candidates)
+
+        evicted = []
+        changed = set()
+        for d, key, e in candidates:
+            if not self.over_budget(budget, total_bytes, total_entries):
+                break
+
+            if not dry_run:
+                remove_entry(e["path"])
+                del components[d][key]
+                changed.add(d)
+
+            evicted.append(e["path"])
+            total_bytes -= e["size"]
+            total_entries -= 1
+
+        if not dry_run:
+            for d, entries in components.items():
+                # only rewrite indices that lost entries
+                if d in changed:
+                    compact_index(d, entries)
+                remove_leftovers(d, self.max_age_leftovers)
+
+        if len(evicted) > 0:
+            logger.info(
+                f"Evicted {len(evicted)} entries from cache {kind}, now using {format_bytes(total_bytes)} in {total_entries} entries."
+            )
+
+        return evicted
+
+    def over_budget(self, budget, total_bytes, total_entries):
+        if budget["max_bytes"] is not None and total_bytes > budget["max_bytes"]:
+            return True
+        if budget["max_entries"] is not None and total_entries > budget["max_entries"]:
+            return True
+        return False
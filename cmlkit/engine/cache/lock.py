@@ -0,0 +1,196 @@
+"""Lock files for coordinating computations between processes.
+
+A `Lock` is a file created with `O_EXCL`, which works on local
+and (modern) network filesystems alike, so it can be used to
+coordinate processes on different machines sharing a cache.
+
+Locks are leases: While a process holds a lock, a background thread
+periodically touches the lock file. If the modification time of a lock
+file is older than `stale_after` seconds, or the owning process is
+known to be dead (same host, pid doesn't exist), the lock is considered
+stale and can be broken by someone else. This takes care of processes
+that crash or get killed (for instance by the timeout of `EvaluationPool`)
+while holding a lock.
+
+There is a small window in which two processes can both break the same
+stale lock, in which case one of them might break the other's fresh lock.
+This leads, at worst, to a computation being duplicated: All writes
+to the cache are atomic, so the result is never corrupted.
+
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+from uuid import uuid4
+from pathlib import Path
+
+
+class Lock:
+    """Lock file.
+
+    Parameters:
+        path: Path of the lock file.
+        stale_after: Seconds after the last heartbeat at which the lock is stale.
+
+    """
+
+    def __init__(self, path, stale_after=60.0):
+        self.path = Path(path)
+        self.stale_after = stale_after
+        self.token = uuid4().hex
+        self.held = False
+
+    def acquire(self):
+        """Attempt to acquire the lock, breaking it if it's stale.
+
+        Returns:
+            True if the lock was acquired, False if it's held by someone else.
+        """
+        for attempt in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if attempt == 0 and self.is_stale():
+                    self.break_stale()
+                    continue
+                return False
+
+            with os.fdopen(fd, "w") as f:
+                json.dump(
+                    {
+                        "host": socket.gethostname(),
+                        "pid": os.getpid(),
+                        "time": time.time(),
+                        "token": self.token,
+                    },
+                    f,
+                )
+
+            self.held = True
+            heartbeat.add(self)
+            return True
+
+        return False
+
+    def release(self):
+        if not self.held:
+            return
+
+        heartbeat.remove(self)
+        self.held = False
+
+        if self.owner().get("token", None) == self.token:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def refresh(self):
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            # our lock was broken, nothing to do but carry on
+            pass
+
+    def exists(self):
+        return self.path.exists()
+
+    def owner(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            # vanished, or is just being written
+            return {}
+
+    def is_stale(self):
+        try:
+            age = time.time() - self.path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+
+        if age > self.stale_after:
+            return True
+
+        owner = self.owner()
+        if owner.get("host", None) == socket.gethostname():
+            return not pid_exists(owner["pid"])
+
+        return False
+
+    def break_stale(self):
+        # renaming is atomic, so only one process can succeed in breaking
+        broken = self.path.with_name(f"{self.path.name}.{uuid4().hex}.broken")
+        try:
+            os.rename(self.path, broken)
+            broken.unlink()
+        except FileNotFoundError:
+            pass
+
+    def wait(self, poll_interval=0.5, timeout=None):
+        """Wait until the lock is released or becomes stale.
+
+        Returns:
+            True if the lock is free (or stale), False if timeout was reached.
+        """
+        start = time.monotonic()
+        while self.exists() and not self.is_stale():
+            if timeout is not None and time.monotonic() - start > timeout:
+                return False
+            time.sleep(poll_interval)
+
+        return True
+
+
+def pid_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # exists, but belongs to someone else
+        return True
+
+    return True
+
+
+class Heartbeat:
+    """Periodically refreshes all held locks in a background thread."""
+
+    def __init__(self, interval=10.0):
+        self.interval = interval
+        self.locks = set()
+        self.mutex = threading.Lock()
+        self.thread = None
+        self.pid = None  # process that owns the thread
+
+    def add(self, lock):
+        with self.mutex:
+            # after a fork, the thread of the parent doesn't exist in the child,
+            # and the locks of the parent are not ours to refresh
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.locks = set()
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+            self.locks.add(lock)
+            self.interval = min(self.interval, lock.stale_after / 4)
+
+    def remove(self, lock):
+        with self.mutex:
+            self.locks.discard(lock)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.mutex:
+                locks = list(self.locks)
+            for lock in locks:
+                lock.refresh()
+
+
+heartbeat = Heartbeat()
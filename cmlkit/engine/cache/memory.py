@@ -0,0 +1,72 @@
+from collections import OrderedDict
+import numpy as np
+
+from .cache import Cache
+from .janitor import parse_bytes
+
+
+class MemoryCache(Cache):
+    """In-process LRU cache, bounded by the size of the stored arrays.
+
+    Arrays of stored `Data` instances are set to read-only, so
+    results shared between callers can't be modified by accident.
+    This also applies to the instance that was submitted, so the caller
+    that computed a result gets read-only arrays as well. Code that
+    modifies results in place must copy them first, otherwise it fails
+    with `ValueError: assignment destination is read-only`.
+
+    Parameters:
+        max_bytes: Maximum total size of stored arrays (int or string like "1G").
+
+    """
+
+    # compute durations are only recorded by the disk tier
+    records_durations = False
+
+    def __init__(self, max_bytes="1G"):
+        super().__init__()
+
+        self.max_bytes = parse_bytes(max_bytes)
+        self.entries = OrderedDict()  # key -> (size, data), in order of last use
+        self.bytes = 0
+
+    def check(self, key):
+        return key in self.entries
+
+    def retrieve(self, key):
+        self.entries.move_to_end(key)
+        return self.entries[key][1]
+
+    def store(self, key, data):
+        size = data_nbytes(data)
+        if size > self.max_bytes:
+            # would evict everything else and still not fit
+            return
+
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key)[0]
+
+        freeze(data)
+        self.entries[key] = (size, data)
+        self.bytes += size
+
+        while self.bytes > self.max_bytes:
+            _, (evicted_size, _) = self.entries.popitem(last=False)
+            self.bytes -= evicted_size
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+
+def data_nbytes(data):
+    """Total size of the arrays in a Data instance."""
+    return sum(
+        array.nbytes for array in data.data.values() if isinstance(array, np.ndarray)
+    )
+
+
+def freeze(data):
+    for array in data.data.values():
+        if isinstance(array, np.ndarray):
+            array.flags.writeable = False
@@ -4,6 +4,8 @@ from .cache import Cache
 class NoCache(Cache):
     """Dummy cache."""
 
+    records_durations = False
+
     def check(self, key):
         return False
 
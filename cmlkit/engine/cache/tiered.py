@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from cmlkit import logger
+
+from .cache import Cache
+
+
+class TieredCache(Cache):
+    """Memory cache in front of a disk cache.
+
+    Lookups check the memory tier first, then the disk tier.
+    Results found on disk are promoted to memory. New results
+    are stored in memory immediately and written to disk in
+    a background thread (write-behind), unless `write_behind`
+    is False.
+
+    Hits and misses are counted per tier (see `stats`), the
+    `hits` and `misses` attributes count overall lookups.
+
+    Since results are held in memory, their arrays are read-only
+    (see `MemoryCache`), including those of freshly computed results.
+
+    Parameters:
+        memory: MemoryCache instance.
+        disk: DiskCache instance.
+        write_behind: If True, write to disk in the background.
+
+    """
+
+    # compute durations are recorded by the disk tier
+    records_durations = False
+
+    def __init__(self, memory, disk, write_behind=True):
+        super().__init__()
+
+        self.memory = memory
+        self.disk = disk
+        self.write_behind = write_behind
+
+        if write_behind:
+            self.writer = ThreadPoolExecutor(max_workers=1)
+        else:
+            self.writer = None
+
+    def get_if_cached(self, key):
+        data = self.memory.get_if_cached(key)
+
+        if data is None:
+            data = self.disk.get_if_cached(key)
+            if data is not None:
+                self.memory.submit(key, data)
+
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return data
+
+    def check(self, key):
+        return self.memory.check(key) or self.disk.check(key)
+
+    def retrieve(self, key):
+        if self.memory.check(key):
+            return self.memory.retrieve(key)
+        else:
+            data = self.disk.retrieve(key)
+            self.memory.submit(key, data)
+            return data
+
+    def store(self, key, data):
+        self.memory.submit(key, data)
+
+        if self.writer is None:
+            self.disk.submit(key, data)
+        else:
+            future = self.writer.submit(self.disk.submit, key, data)
+            future.add_done_callback(report_failure)
+
+    def abandon(self, key):
+        self.memory.abandon(key)
+        self.disk.abandon(key)
+
+    def flush(self):
+        """Wait until all pending disk writes are done."""
+        if self.writer is not None:
+            self.writer.shutdown(wait=True)
+            self.writer = ThreadPoolExecutor(max_workers=1)
+
+    @property
+    def stats(self):
+        return {
+            "memory": {
+                "hits": self.memory.hits,
+                "misses": self.memory.misses,
+                "bytes": self.memory.bytes,
+                "entries": len(self.memory.entries),
+            },
+            "disk": {"hits": self.disk.hits, "misses": self.disk.misses},
+        }
+
+
+def report_failure(future):
+    exception = future.exception()
+    if exception is not None:
+        logger.error(f"Write-behind to disk cache failed: {exception}")
@@ -1 +1 @@
-from .data import Data, load_data
+from .data import Data, load_data, data_filename
@@ -1,8 +1,10 @@
+import os
+import shutil
 import numpy as np
 from pathlib import Path
 
 from cmlkit.engine.config import Configurable
-from cmlkit.engine.inout import normalize_extension
+from cmlkit.engine.inout import normalize_extension, temporary_path
 from cmlkit.engine.hashing import compute_hash
 
 
@@ -52,9 +54,14 @@ class Data(Configurable):
         return {"data": self.data, "info": self.info, "meta": self.meta}
 
     def dump(self, path, protocol=1):
-        assert protocol == 1 or protocol == 2, "Data only supports protocols 1 and 2 (.npz)"
+        assert protocol in protocols, f"Data only supports protocols {list(protocols)}"
 
-        write_data_npz(path, self.kind, self.data, self.info, self.meta, protocol=protocol)
+        if protocol == 3:
+            write_data_npd(path, self.kind, self.data, self.info, self.meta)
+        else:
+            write_data_npz(
+                path, self.kind, self.data, self.info, self.meta, protocol=protocol
+            )
 
     @property
     def id(self):
@@ -65,13 +72,31 @@ class Data(Configurable):
         return self.meta["history"]
 
 
-def load_data(path):
+# protocol -> file extension
+protocols = {1: ".npz", 2: ".npz", 3: ".npd"}
+
+
+def data_filename(path, protocol):
+    """Filename (or directory name) that dumping to path with protocol will create."""
+    return normalize_extension(path, protocols[protocol])
+
+
+def load_data(path, mmap_mode=None):
+    """Load Data instance from path.
+
+    Args:
+        path: Path to a .npz file (protocols 1 and 2) or .npd directory (protocol 3)
+        mmap_mode: Only for protocol 3, if not None, arrays are memory-mapped
+            with this mode (see `np.load`) instead of being read into memory.
+    """
     path = Path(path)
 
     if path.suffix == ".npz":
         return load_data_npz(path)
+    elif path.suffix == ".npd":
+        return load_data_npd(path, mmap_mode=mmap_mode)
     else:
-        raise ValueError
+        raise ValueError(f"Don't know how to load Data from {path}.")
 
 
 def load_data_npz(path):
@@ -102,7 +127,94 @@ def write_data_npz(path, kind, data, info, meta, protocol):
     for name, array in data.items():
         kwds[f"data/{name}"] = array
 
-    if protocol == 1:
-        np.savez(normalize_extension(path, ".npz"), **kwds)
-    elif protocol == 2:
-        np.savez_compressed(normalize_extension(path, ".npz"), **kwds)
+    # write to temporary file first, so nobody ever sees partially written files
+    path = normalize_extension(path, ".npz")
+    tmp = temporary_path(path)
+
+    try:
+        if protocol == 1:
+            np.savez(tmp, **kwds)
+        elif protocol == 2:
+            np.savez_compressed(tmp, **kwds)
+
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def load_data_npd(path, mmap_mode=None):
+    header, data = read_npd(path, mmap_mode=mmap_mode)
+
+    config = {
+        header["kind"]: {"info": header["info"], "data": data, "meta": header["meta"]}
+    }
+
+    from cmlkit import from_config
+
+    return from_config(config)
+
+
+def write_npd_header(path, kind, info, meta, names):
+    """Write header of .npd directory; must be written after the arrays."""
+    header = {"kind": kind, "info": info, "meta": meta, "protocol": 3, "names": names}
+    np.save(Path(path) / "header.npy", header)
+
+
+def read_npd(path, mmap_mode=None):
+    """Read header and dict of arrays from a .npd directory."""
+    path = Path(path)
+
+    # the header is written last, so if it is missing, the data is incomplete
+    header = np.load(path / "header.npy", allow_pickle=True).item()
+    assert header["protocol"] == 3, "npd data should be protocol 3"
+
+    data = {}
+    for name in header["names"]:
+        data[name] = load_npy_array(path / "data" / f"{name}.npy", mmap_mode=mmap_mode)
+
+    return header, data
+
+
+def load_npy_array(path, mmap_mode=None):
+    if mmap_mode is not None:
+        try:
+            return np.load(path, mmap_mode=mmap_mode, allow_pickle=False)
+        except ValueError:
+            # object arrays can't be memory-mapped
+            pass
+
+    return np.load(path, allow_pickle=True)
+
+
+def write_data_npd(path, kind, data, info, meta):
+    """Write Data as directory of raw .npy files plus a header.
+
+    The arrays can be memory-mapped when loading, which makes
+    opening even large files essentially free, and allows
+    multiple processes to share memory through the page cache.
+
+    The directory is first written under a temporary name and
+    then renamed, so it appears atomically.
+    """
+    path = normalize_extension(path, ".npd")
+    tmp = temporary_path(path)
+
+    try:
+        (tmp / "data").mkdir(parents=True)
+
+        for name, array in data.items():
+            np.save(tmp / "data" / f"{name}.npy", array)
+
+        write_npd_header(tmp, kind, info, meta, list(data.keys()))
+
+        # renaming a directory is atomic, but it can't replace a non-empty
+        # directory, so if someone else has written the same path, we defer
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            if not (path / "header.npy").is_file():
+                raise
+    finally:
+        if tmp.exists():
+            shutil.rmtree(tmp)
@@ -1,64 +1,193 @@
 """Implements hashes that are (hopefully) stable across sessions.
 
-Note: I have found a hash instability in my implementation,
-which produces different hashes for dicts that were deepcopied
-from each other... which is VERY problematic. The hashes are stable
-across restarts, which is doubly strange.
+There are two hash schemes, identified by an integer version:
 
-Therefore, we now use the joblib implementation, which is slower, but stable.
+- `1`: The original implementation, which pickles everything through `joblib.hash`.
+    This is stable, but slow for large arrays, and in particular for the ragged
+    `object` arrays used in `Dataset`.
+- `2`: A streaming implementation, which canonicalises containers and scalars
+    and feeds `ndarray` buffers directly into a `blake2b` digest without
+    pickling. This is the default.
 
-Further improvements in this area are needed.
+Note: I have previously found a hash instability in a hand-rolled implementation,
+which produced different hashes for dicts that were deepcopied from each other.
+Scheme 2 avoids this by never relying on `pickle` or on insertion order: dicts are
+hashed in order of their (hashed) keys, lists and tuples are treated identically
+(they are indistinguishable after a round trip through `yaml` anyway), and every
+item is prefixed with a type tag and length, so partitioning doesn't matter,
+i.e. [[1, 2], [3, 4]] does NOT hash to the same as [1, 2, 3, 4].
+
+The scheme can be selected with the `CML_HASH_SCHEME` environment variable.
+Since all cache keys and `Dataset` hashes are derived from these hashes,
+changing the scheme invalidates existing caches: Setting `CML_HASH_SCHEME=1`
+keeps using caches (and saved dataset hashes) created with previous versions.
+
+For datasets, there are also per-structure hashes (see `structure_hashes`), which
+can be combined into a hash of any selection of structures (`combine_hashes`)
+without looking at the structures again. With scheme 2, the hash of the geometries
+of a `Dataset` is computed this way, so hashes of subsets are cheap.
 
 """
 
+import os
+import hashlib
+import pickle
+from pathlib import PurePath
 import numpy as np
 import joblib
 
 
+default_hash_scheme = 2
+
+if "CML_HASH_SCHEME" in os.environ:
+    hash_scheme = int(os.environ["CML_HASH_SCHEME"])
+else:
+    hash_scheme = default_hash_scheme
+
+
 def compute_hash(*args, **kwargs):
-    """Compute a hash of anything joblib can handle."""
+    """Compute a hash of (almost) anything, using the current hash scheme."""
+    return compute_hash_with_scheme(hash_scheme, *args, **kwargs)
+
+
+def compute_hash_with_scheme(scheme, *args, **kwargs):
+    """Compute a hash with an explicitly given hash scheme."""
     to_hash = {"args": args, "kwargs": kwargs}
-    return joblib.hash(to_hash)
-
-
-# def fast_hash(*items, **kwitems):
-#     """Return hexdigest of argument(s).
-
-#     Caveats:
-#         Hash is NOT invariant under partitioning of ndarrays, i.e.
-#         [[1, 2], [3, 4]] hashes to the same as [1, 2, 3, 4].
-#         TODO: Maybe fix this by switching to a different hashing scheme
-#         for numpy objects
-#     """
-#     hashf = hashlib.md5()
-
-#     for i in items:
-#         _hash(i, hashf)
-#     for k, v in kwitems.items():
-#         _hash(k, hashf)
-#         _hash(v, hashf)
-#
-#     return hashf.hexdigest()
-
-
-# def _hash(item, f):
-#     if isinstance(item, np.ndarray) and item.dtype == object:
-#         for i in item:
-#             _hash(i, f)
-#     elif item is None:
-#         _hash('None', f)
-#     elif isinstance(item, dict):
-#         for v in sorted(item.items()):
-#             _hash(v, f)
-#     elif isinstance(item, (tuple, list)):
-#         for i in item:
-#             _hash(i, f)
-#     elif isinstance(item, str):
-#         f.update(item.encode('utf-8'))
-#     elif isinstance(item, float) or isinstance(item, int) or isinstance(item, bool):
-#         _hash(str(item), f)
-#     else:
-#         try:
-#             f.update(hash(item))
-#         except:
-#             raise ValueError("Cannot hash " + str(item))
+    return schemes[scheme](to_hash)
+
+
+def joblib_hash(item):
+    """Scheme 1: Hash of anything joblib can handle."""
+    return joblib.hash(item)
+
+
+def fast_hash(item):
+    """Scheme 2: Streaming hash of anything _update can handle.
+
+    Returns a hexdigest of the same length as joblib.hash.
+    """
+    hashf = hashlib.blake2b(digest_size=16)
+    _update(hashf, item)
+    return hashf.hexdigest()
+
+
+def _update(f, item):
+    # arrays come first, since they are by far the most common item in large inputs
+    if isinstance(item, np.ndarray):
+        _update_array(f, item)
+    elif item is None:
+        f.update(b"N")
+    elif isinstance(item, (bool, np.bool_)):
+        f.update(b"T" if item else b"F")
+    elif isinstance(item, (int, np.integer)):
+        _update_tagged(f, b"i", str(int(item)).encode())
+    elif isinstance(item, (float, np.floating)):
+        # repr is the shortest string that round-trips, so it's canonical
+        _update_tagged(f, b"f", repr(float(item)).encode())
+    elif isinstance(item, (complex, np.complexfloating)):
+        _update_tagged(f, b"c", repr(complex(item)).encode())
+    elif isinstance(item, str):
+        _update_tagged(f, b"s", item.encode("utf-8"))
+    elif isinstance(item, (bytes, bytearray)):
+        _update_tagged(f, b"b", bytes(item))
+    elif isinstance(item, PurePath):
+        _update_tagged(f, b"s", str(item).encode("utf-8"))
+    elif isinstance(item, dict):
+        f.update(b"d" + _length(item))
+        # sort by the hash of the keys, so arbitrary (mixed) key types work
+        for key, value in sorted(
+            ((fast_hash(k), v) for k, v in item.items()), key=lambda kv: kv[0]
+        ):
+            f.update(key.encode())
+            _update(f, value)
+    elif isinstance(item, (list, tuple)):
+        f.update(b"l" + _length(item))
+        for i in item:
+            _update(f, i)
+    elif isinstance(item, (set, frozenset)):
+        f.update(b"S" + _length(item))
+        for h in sorted(fast_hash(i) for i in item):
+            f.update(h.encode())
+    elif isinstance(item, np.generic):
+        _update(f, item.item())
+    else:
+        # last resort, this is not guaranteed to be stable
+        _update_tagged(f, b"p", pickle.dumps(item, protocol=4))
+
+
+def _update_array(f, array):
+    if array.dtype == object:
+        f.update(b"o" + _shape(array))
+        for i in array.flat:
+            _update(f, i)
+    else:
+        dtype = array.dtype
+        if dtype.byteorder == ">":
+            dtype = dtype.newbyteorder("<")
+
+        _update_tagged(f, b"a", dtype.str.encode())
+        f.update(_shape(array))
+        array = np.ascontiguousarray(array, dtype=dtype)
+        f.update(array.reshape(-1).view(np.uint8).data)
+
+
+def _update_tagged(f, tag, content):
+    f.update(tag + _length(content))
+    f.update(content)
+
+
+def _length(item):
+    return len(item).to_bytes(8, "little")
+
+
+def _shape(array):
+    return len(array.shape).to_bytes(1, "little") + np.asarray(
+        array.shape, dtype="<i8"
+    ).tobytes()
+
+
+def structure_hashes(z, r, b=None):
+    """Hashes of individual structures.
+
+    Args:
+        z: Atomic numbers, one array per structure.
+        r: Positions, one array per structure.
+        b: Optional, basis vectors, one array per structure.
+
+    Returns:
+        Array of shape (n, 16) (dtype uint8), containing the digest for each structure.
+    """
+    digests = np.empty((len(z), 16), dtype=np.uint8)
+
+    for i in range(len(z)):
+        hashf = hashlib.blake2b(digest_size=16)
+        _update(hashf, z[i])
+        _update(hashf, r[i])
+        _update(hashf, None if b is None else b[i])
+        digests[i] = np.frombuffer(hashf.digest(), dtype=np.uint8)
+
+    return digests
+
+
+def combine_hashes(digests):
+    """Merkle-style hash of a sequence of digests (as returned by `structure_hashes`).
+
+    The order of digests matters. Returns a hexdigest like `fast_hash`.
+    """
+    digests = np.ascontiguousarray(digests, dtype=np.uint8)
+    return combine_hash_chunks([digests], len(digests))
+
+
+def combine_hash_chunks(chunks, n):
+    """Like `combine_hashes`, but for n digests given as consecutive chunks.
+
+    The result is the same as for `combine_hashes` on the concatenated chunks.
+    """
+    hashf = hashlib.blake2b(digest_size=16)
+    hashf.update(b"m" + n.to_bytes(8, "little"))
+    for digests in chunks:
+        hashf.update(np.ascontiguousarray(digests, dtype=np.uint8).data)
+    return hashf.hexdigest()
+
+
+schemes = {1: joblib_hash, 2: fast_hash}
@@ -1,10 +1,11 @@
 """I/o. Talk to the disk!"""
 
+import os
 import numpy as np
 import yaml
 import son
+from uuid import uuid4
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
 
 
 # register some custom dumpers for yaml
@@ -59,17 +60,32 @@ def save_npy(filename, d):
 
 
 def safe_save_npy(filename, d):
-    """Save a dict with numpy using a separate Thread.
+    """Save a dict with numpy atomically.
 
     This is important because otherwise corrupted files are written to disk,
-    when the pickler gets interrupted mid-write.
+    when the pickler gets interrupted mid-write, or other processes might
+    read a partially written file. We therefore write to a temporary file
+    first, and then rename it, which is atomic.
 
     Args:
         filename: Path-like object. (Extension not required.)
         d: Dict to save.
     """
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        executor.submit(save_npy, filename, d)
+    filename = normalize_extension(filename, ".npy")
+    tmp = temporary_path(filename)
+
+    try:
+        np.save(tmp, d)
+        os.replace(tmp, filename)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def temporary_path(path):
+    """Unique, hidden sibling of path (with the same extension) for atomic writes."""
+    path = Path(path)
+    return path.with_name(f".{path.stem}.{uuid4().hex}.tmp{path.suffix}")
 
 
 def read_npy(filename):
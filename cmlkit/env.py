@@ -41,6 +41,9 @@ else:
     cache_location = Path(current) / "cml_cache"
 
 
+# the hash scheme is selected with CML_HASH_SCHEME, which is read
+# directly in engine.hashing (it is needed before this module is imported)
+
 # path of ruNNer binary (needed for symmetry functions)
 if "CML_RUNNER_PATH" in os.environ:
     runner_path = Path(os.environ["CML_RUNNER_PATH"])
@@ -23,8 +23,11 @@ case no conversion is ever done!
 
 """
 
+import numpy as np
+
 from cmlkit.engine import Component
 from cmlkit import from_config
+from cmlkit.dataset import ShardedDataset
 from cmlkit.representation import Composed
 from .utility import convert, unconvert
 
@@ -102,11 +105,64 @@ class Model(Component):
             per: Optional, String specifying in which units
                 the prediciton should be made.
 
+        For a `ShardedDataset`, predictions are made one shard at a time.
+
         Returns:
             ndarray with predictions.
 
         """
+        if isinstance(data, ShardedDataset):
+            return np.concatenate(
+                [self.predict(shard, per=per) for shard in data.in_shards()]
+            )
+
         z = self.representation(data)
         pred = self.regression.predict(z)
+        return self.convert_prediction(data, pred, per)
+
+    def train_path(self, data, target):
+        """Train model for many regularisation strengths at once.
+
+        Requires a regression method that supports it, see `KRR.train_path`.
+
+        Args:
+            data: Dataset instance
+            target: Name of target property,
+                must be present in data.
+        """
+        x = self.representation(data)
+        y = data.pp(target, self.per)
+
+        self.regression.train_path(x=x, y=y)
+
+        return self
+
+    def predict_path(self, data, nls, per=None):
+        """Predict with model, for each regularisation strength in nls.
+
+        Requires `train_path` to have been called.
+
+        Args:
+            data: Dataset instance
+            nls: List of regularisation strengths.
+            per: Optional, String specifying in which units
+                the prediciton should be made.
+
+        Returns:
+            ndarray of shape (len(nls), n_predictions).
+
+        """
+        if isinstance(data, ShardedDataset):
+            return np.concatenate(
+                [self.predict_path(shard, nls, per=per) for shard in data.in_shards()],
+                axis=1,
+            )
+
+        z = self.representation(data)
+        preds = self.regression.predict_path(z, nls)
+        return np.array([self.convert_prediction(data, pred, per) for pred in preds])
+
+    def convert_prediction(self, data, pred, per):
+        """Convert prediction of the regression method from self.per into per."""
         pred = unconvert(data, pred, from_per=self.per)
         return convert(data, pred, per)
@@ -1,7 +1,7 @@
 """Regression methods."""
 
-from .data import KernelMatrix
+from .data import KernelMatrix, DistanceMatrix
 from .kernel import Kernel
 from .qmml import components as qmml_components
 
-components = [*qmml_components, KernelMatrix]
+components = [*qmml_components, KernelMatrix, DistanceMatrix]
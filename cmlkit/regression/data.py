@@ -20,3 +20,20 @@ class KernelMatrix(Data):
     @classmethod
     def mock(cls, array):
         return cls.create(data={"array": array})
+
+
+class DistanceMatrix(Data):
+
+    kind = "data_distance_matrix"
+
+    @classmethod
+    def from_array(cls, distance, representation, array, info=None):
+        data = {"array": array}
+
+        return cls.result(
+            data=data, inputs=representation, component=distance, info=info
+        )
+
+    @property
+    def array(self):
+        return self.data["array"]
@@ -1,14 +1,31 @@
-from cmlkit.engine import Component
+import os
+import numpy as np
+from pathlib import Path
+
+from cmlkit.engine import Component, temporary_path
+from cmlkit.representation.data import GlobalRepresentation, ShardedRepresentation
 
 from .data import KernelMatrix
 
 
 class Kernel(Component):
-    """Base class for kernels."""
+    """Base class for kernels.
+
+    Kernels between representations of sharded datasets (`ShardedRepresentation`)
+    are computed block by block, one pair of shards at a time, and written into
+    the full kernel matrix. For symmetric kernels, only blocks on and above the
+    diagonal are computed.
+
+    If `out_of_core` is set in the context to a directory, kernel matrices computed
+    in blocks are memory-mapped from a (deleted) file in that directory, so they
+    don't need to fit into memory. (Support depends on the subclass.)
+    """
 
     # Sub-classes must provide kind
 
     def __init__(self, context={}):
+        # can't use default_context because subclasses overwrite it
+        context = {"out_of_core": None, **context}
         super().__init__(context=context)
 
     def __call__(self, x, z=None):
@@ -17,9 +34,15 @@ class Kernel(Component):
             key = x.id
             result = self.cache.get_if_cached(key)
             if result is None:
-                result = KernelMatrix.from_array(
-                    self, x, self.compute_symmetric(x=x)
-                )
+                try:
+                    if isinstance(x, ShardedRepresentation):
+                        array = self.compute_sharded(x)
+                    else:
+                        array = self.compute_symmetric(x=x)
+                    result = KernelMatrix.from_array(self, x, array)
+                except BaseException:
+                    self.cache.abandon(key)
+                    raise
                 self.cache.submit(key, result)
 
             return result
@@ -28,10 +51,79 @@ class Kernel(Component):
             key = f"{x.id}+{z.id}"
             result = self.cache.get_if_cached(key)
             if result is None:
-                result = KernelMatrix.from_array(
-                    self, (x, z), self.compute_asymmetric(x=x, z=z)
-                )
+                try:
+                    if isinstance(x, ShardedRepresentation) or isinstance(
+                        z, ShardedRepresentation
+                    ):
+                        array = self.compute_sharded(x, z)
+                    else:
+                        array = self.compute_asymmetric(x=x, z=z)
+                    result = KernelMatrix.from_array(self, (x, z), array)
+                except BaseException:
+                    self.cache.abandon(key)
+                    raise
 
                 self.cache.submit(key, result)
 
             return result
+
+    def compute_sharded(self, x, z=None):
+        """Compute kernel matrix block by block, for each pair of shards."""
+        symmetric = z is None
+        if symmetric:
+            z = x
+
+        out = None
+        for i, (start_x, block_x) in enumerate(blocks(x)):
+            for j, (start_z, block_z) in enumerate(blocks(z)):
+                if symmetric and j < i:
+                    continue
+                elif symmetric and j == i:
+                    block = self.compute_symmetric(x=block_x)
+                else:
+                    block = self.compute_asymmetric(x=block_x, z=block_z)
+
+                if out is None:
+                    shape = (n_structures(x), n_structures(z))
+                    out = allocate(shape, block.dtype, self.context["out_of_core"])
+
+                rows, cols = block.shape
+                out[start_x : start_x + rows, start_z : start_z + cols] = block
+                if symmetric and j > i:
+                    out[start_z : start_z + cols, start_x : start_x + rows] = block.T
+
+        return out
+
+
+def blocks(x):
+    """Iterate over (start, representation) for each shard (or just x if unsharded)."""
+    if isinstance(x, ShardedRepresentation):
+        return zip(x.starts, x)
+    else:
+        return [(0, x)]
+
+
+def n_structures(x):
+    if isinstance(x, GlobalRepresentation):
+        return len(x.array)
+    else:
+        return x.n
+
+
+def allocate(shape, dtype, out_of_core=None):
+    """Allocate output array, memory-mapped from a file in out_of_core if given.
+
+    The file is unlinked right away, the mapping stays valid until the array
+    is garbage collected, after which the space on disk is freed.
+    """
+    if out_of_core is None:
+        return np.empty(shape, dtype=dtype)
+
+    directory = Path(out_of_core)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = temporary_path(directory / "kernel.npy")
+
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+    os.unlink(path)
+
+    return out
@@ -17,5 +17,7 @@ from .kernel_functions import (
 from .kernel_atomic import kernel_atomic, KernelAtomic
 from .kernel_global import KernelGlobal
 from .krr import KRR
+from .distance import Distance
+from .low_rank import NystroemKRR, RandomFeaturesKRR
 
-components = [KernelAtomic, KernelGlobal, KRR]
+components = [KernelAtomic, KernelGlobal, KRR, Distance, NystroemKRR, RandomFeaturesKRR]
@@ -0,0 +1,159 @@
+"""Cached distance matrices for kernel functions.
+
+The Gaussian and Laplacian kernel functions are functions of a distance between
+representations (squared euclidean and manhattan distance, respectively), and their
+length scale only enters afterwards. When a length scale is tuned, the expensive part,
+computing the distances, is therefore the same for every value, and only the
+elementwise exponential changes. But the kernel matrix depends on the length scale,
+so it has to be computed from scratch every time.
+
+`Distance` computes distance matrices as a separate `Component`, so they are cached
+(keyed on the ids of the representations) independently of the length scale. If
+`"cache_distances": True` is set in the context of `KernelGlobal` or `KernelAtomic`,
+and the kernel function is distance-based, kernel matrices are computed from
+the distances obtained from `Distance`, which is cached as usual, for instance
+with `context={"cache_distances": True, "distance": {"cache": "disk"}}`.
+
+For atomic representations, the full atom-atom distance matrix would usually be
+too large, so `Distance.block` computes (and caches) it for one block of structures
+at a time. `KernelAtomic` then always uses the native implementation (see `native.py`),
+and the blocks are determined by `max_bytes`, which should therefore not be changed
+between evaluations.
+
+Distances are always computed with numpy, in the `dtype` of the kernel function,
+which is part of the config of `Distance` (if it's not None), like for `Kernelf`.
+
+"""
+
+from cmlkit.engine import Component
+from cmlkit.regression.data import DistanceMatrix
+
+from . import native
+
+
+class Distance(Component):
+    """Distance matrices between global or atomic representations.
+
+    Parameters:
+        metric: Either "squared_euclidean" or "manhattan".
+        dtype: Optional, dtype of the computation, defaults to the one in the context.
+
+    """
+
+    kind = "distance"
+
+    default_context = {"dtype": None, "max_size": None}
+
+    def __init__(self, metric, dtype=None, context={}):
+        # can't use default_context for out_of_core, since it's set by Kernel
+        context = {"out_of_core": None, **context}
+        super().__init__(context=context)
+
+        assert metric in distancefs, f"Unknown metric {metric}."
+        self.metric = metric
+
+        if dtype is None:
+            dtype = self.context["dtype"]
+        self.dtype = dtype
+
+    def _get_config(self):
+        config = {"metric": self.metric}
+        if self.dtype is not None:
+            config["dtype"] = self.dtype
+
+        return config
+
+    def __call__(self, x, z=None):
+        """Distance matrix between global representations x (and z)."""
+        from .kernel_global import kernel_global
+
+        if z is None:
+            key = x.id
+            inputs = x
+        else:
+            key = f"{x.id}+{z.id}"
+            inputs = (x, z)
+
+        result = self.cache.get_if_cached(key)
+        if result is None:
+            try:
+                array = kernel_global(
+                    self.distancef,
+                    x.array,
+                    None if z is None else z.array,
+                    max_size=self.context["max_size"],
+                    out_of_core=self.context["out_of_core"],
+                )
+                result = DistanceMatrix.from_array(self, inputs, array)
+            except BaseException:
+                self.cache.abandon(key)
+                raise
+
+            self.cache.submit(key, result)
+
+        return result
+
+    def block(self, x, z, x_range, z_range):
+        """Atom-atom distance matrix between blocks of atomic representations.
+
+        Args:
+            x, z: AtomicRepresentation, z can be None (for z = x).
+            x_range, z_range: Tuples (start, stop) of structures in the block.
+
+        Returns:
+            ndarray of shape (atoms in x block, atoms in z block).
+        """
+        symmetric = z is None and x_range == z_range
+        blocks = f"[{x_range[0]}:{x_range[1]}]+[{z_range[0]}:{z_range[1]}]"
+        if z is None:
+            key = f"{x.id}{blocks}"
+            inputs = x
+        else:
+            key = f"{x.id}+{z.id}{blocks}"
+            inputs = (x, z)
+
+        result = self.cache.get_if_cached(key)
+        if result is None:
+            try:
+                x_atoms = atoms(x, x_range)
+                if symmetric:
+                    array = self.distancef(x_atoms)
+                else:
+                    z_atoms = atoms(x if z is None else z, z_range)
+                    array = self.distancef(x_atoms, z=z_atoms)
+
+                info = {"x_range": [int(i) for i in x_range]}
+                info["z_range"] = [int(i) for i in z_range]
+                result = DistanceMatrix.from_array(self, inputs, array, info=info)
+            except BaseException:
+                self.cache.abandon(key)
+                raise
+
+            self.cache.submit(key, result)
+
+        return result.array
+
+    def distancef(self, x, z=None):
+        return distancefs[self.metric](x, z=z, dtype=self.dtype)
+
+
+def get_distance(kernelf, context):
+    """Distance component for kernelf, if distances are to be cached, otherwise None."""
+    if not context.get("cache_distances", False) or kernelf.kind not in metrics:
+        return None
+
+    return Distance(metric=metrics[kernelf.kind], dtype=kernelf.dtype, context=context)
+
+
+def atoms(x, structures):
+    start, stop = structures
+    return x.linear[x.offsets[start] : x.offsets[stop]]
+
+
+# kernelf kind -> distance the kernelf is a function of
+metrics = {"gaussian": "squared_euclidean", "laplacian": "manhattan"}
+
+distancefs = {
+    "squared_euclidean": native.squared_euclidean,
+    "manhattan": native.manhattan,
+}
@@ -11,6 +11,15 @@ n_total_atoms x n_total_atoms,
 which can be very large. To avoid this, we perform the computation
 in blocks of a given `max_size`.
 
+With the numpy backend (see `native.py`), a self-contained implementation is used
+instead, which doesn't need `qmmlpack` (apart from, possibly, the kernel function),
+and chooses blocks such that the atom-atom kernel matrix for each block takes up at
+most `max_bytes` bytes (set in the context).
+
+If `cache_distances` is set in the context, the atom-atom kernel matrix of each
+block is computed from a (cached) distance matrix, see `distance.py`. This always
+uses the native implementation.
+
 """
 
 import numpy as np
@@ -22,6 +31,8 @@ from cmlkit.representation.data import AtomicRepresentation
 from cmlkit.regression import Kernel
 
 from .kernel_functions import get_kernelf
+from .distance import get_distance
+from . import native
 
 
 class KernelAtomic(Kernel):
@@ -29,18 +40,45 @@ class KernelAtomic(Kernel):
 
     kind = "kernel_atomic"
 
-    default_context = {"max_size": 256}
+    default_context = {
+        "max_size": 256,
+        "max_bytes": native.max_bytes,
+        "cache_distances": False,
+    }
 
     def __init__(self, kernelf, norm=False, context={}):
         super().__init__(context=context)
 
-        self.kernelf = get_kernelf(kernelf)
+        self.kernelf = get_kernelf(kernelf, context=self.context)
+        self.distance = get_distance(self.kernelf, self.context)
         self.norm = norm
 
+    def native(self):
+        return self.distance is not None or native.get_backend(self.context) == "numpy"
+
+    def distances(self, x, z=None):
+        """Callable returning cached distances for blocks, see `native.kernel_atomic`."""
+        if self.distance is None:
+            return None
+
+        return lambda x_range, z_range: self.distance.block(x, z, x_range, z_range)
+
     def compute_symmetric(self, x):
         assert isinstance(
             x, AtomicRepresentation
         ), "KernelAtomic only works on atomic representations."
+
+        if self.native():
+            return native.kernel_atomic(
+                self.kernelf,
+                x.linear,
+                x.offsets,
+                norm=self.norm,
+                max_bytes=self.context["max_bytes"],
+                out_of_core=self.context["out_of_core"],
+                distances=self.distances(x),
+            )
+
         return _kernel_atomic(
             self.kernelf,
             x=x,
@@ -57,6 +95,20 @@ class KernelAtomic(Kernel):
         assert isinstance(
             z, AtomicRepresentation
         ), "KernelAtomic only works on atomic representations."
+
+        if self.native():
+            return native.kernel_atomic(
+                self.kernelf,
+                x.linear,
+                x.offsets,
+                z.linear,
+                z.offsets,
+                norm=self.norm,
+                max_bytes=self.context["max_bytes"],
+                out_of_core=self.context["out_of_core"],
+                distances=self.distances(x, z),
+            )
+
         return _kernel_atomic(
             self.kernelf,
             x=x,
@@ -85,6 +137,14 @@ def kernel_atomic(kernelf, x, z=None, norm=False, max_size=256):
 
     """
 
+    if native.get_backend(getattr(kernelf, "context", {})) == "numpy":
+        if z is None:
+            return native.kernel_atomic(kernelf, x.linear, x.offsets, norm=norm)
+        else:
+            return native.kernel_atomic(
+                kernelf, x.linear, x.offsets, z.linear, z.offsets, norm=norm
+            )
+
     if z is None:
         return _kernel_atomic(
             kernelf, x, x, symmetric=True, norm=norm, max_size=max_size
@@ -11,6 +11,12 @@ individually and combine the result into an overall kernel.
 This is really just a thin translation layer that makes the qmmlpack
 callables de/serisalisable in the `cmlkit` way.
 
+If qmmlpack is not installed, or the `backend` context variable is "numpy",
+the native implementations in `native.py` are used instead. Their `dtype`
+(for instance "float32") can be set as parameter, or in the context. Either way,
+it becomes part of the config (if it's not None), so results computed with
+different dtypes are never mixed up in caches.
+
 There is no getattr magic because it doesn't seem needed.
 
 """
@@ -19,6 +25,8 @@ There is no getattr magic because it doesn't seem needed.
 from cmlkit.engine import Component, _from_config
 from cmlkit.utility import import_qmmlpack
 
+from . import native
+
 
 def get_kernelf(config, context={}):
     """Get a kernel function."""
@@ -34,19 +42,44 @@ def get_raw_kernelf(name):
 class Kernelf(Component):
     """Base class for kernel functions."""
 
-    def __init__(self, ls, context={}):
+    default_context = {"backend": "auto", "dtype": None}
+
+    def __init__(self, ls, dtype=None, context={}):
         super().__init__(context=context)
 
         self.ls = ls
 
+        if dtype is None:
+            dtype = self.context["dtype"]
+        self.dtype = dtype
+
     def __call__(self, x, z=None, diagonal=False, distance=False):
+        if native.get_backend(self.context) == "numpy":
+            kernelf = native.kernelfs[kernelfs[self.kind]]
+
+            return kernelf(
+                x,
+                z=z,
+                theta=self.ls,
+                diagonal=diagonal,
+                distance=distance,
+                dtype=self.dtype,
+            )
+
         qmmlpack = import_qmmlpack("use cmlkit.regression.qmml")
         kernelf = getattr(qmmlpack, kernelfs[self.kind])
 
-        return kernelf(x=x, z=z, theta=self.ls, diagonal=diagonal)
+        if distance:
+            return kernelf(x=x, z=z, theta=self.ls, diagonal=diagonal, distance=True)
+        else:
+            return kernelf(x=x, z=z, theta=self.ls, diagonal=diagonal)
 
     def _get_config(self):
-        return {"ls": self.ls}
+        config = {"ls": self.ls}
+        if self.dtype is not None:
+            config["dtype"] = self.dtype
+
+        return config
 
 
 class KernelfGaussian(Kernelf):
@@ -87,11 +120,14 @@ class KernelfLinear(Kernelf):
 
     kind = "linear"
 
-    def __init__(self, context={}):
-        super().__init__(ls=None, context=context)
+    def __init__(self, dtype=None, context={}):
+        super().__init__(ls=None, dtype=dtype, context=context)
 
     def _get_config(self):
-        return {}
+        config = super()._get_config()
+        del config["ls"]
+
+        return config
 
 
 kernelfs = {
@@ -1,12 +1,25 @@
 """Compute kernels between global representations.
 
-This is just to provide a unified kernel interface.
+This is mostly just to provide a unified kernel interface.
+
+For large numbers of structures, the kernel matrix can be computed in blocks
+of `max_size` x `max_size` structures (set in the context), which bounds the
+size of the intermediate buffers needed by the kernel function. The blocks are
+written directly into the (preallocated) output, and for symmetric kernels, only
+blocks on and above the diagonal are computed. If `out_of_core` is set, the output
+is memory-mapped from a file in that directory, so the operating system can write
+finished blocks to disk instead of keeping the whole matrix in memory.
+
+If `cache_distances` is set in the context, the kernel matrix is computed from
+a (cached) distance matrix instead, see `distance.py`.
 
 """
 
 from cmlkit.regression import Kernel
+from cmlkit.regression.kernel import allocate
 from cmlkit.representation.data import GlobalRepresentation
 from .kernel_functions import get_kernelf
+from .distance import get_distance
 
 
 class KernelGlobal(Kernel):
@@ -14,15 +27,26 @@ class KernelGlobal(Kernel):
 
     kind = "kernel_global"
 
+    default_context = {"max_size": None, "cache_distances": False}
+
     def __init__(self, kernelf, context={}):
         super().__init__(context=context)
-        self.kernelf = get_kernelf(kernelf)
+        self.kernelf = get_kernelf(kernelf, context=self.context)
+        self.distance = get_distance(self.kernelf, self.context)
 
     def compute_symmetric(self, x, z=None):
         assert isinstance(
             x, GlobalRepresentation
         ), "KernelGlobal only works on global representations."
-        return self.kernelf(x=x.array)
+        if self.distance is not None:
+            return self.kernelf(self.distance(x).array, distance=True)
+
+        return kernel_global(
+            self.kernelf,
+            x.array,
+            max_size=self.context["max_size"],
+            out_of_core=self.context["out_of_core"],
+        )
 
     def compute_asymmetric(self, x, z):
         assert isinstance(
@@ -31,7 +55,64 @@ class KernelGlobal(Kernel):
         assert isinstance(
             z, GlobalRepresentation
         ), "KernelGlobal only works on global representations."
-        return self.kernelf(x=x.array, z=z.array)
+        if self.distance is not None:
+            return self.kernelf(self.distance(x, z).array, distance=True)
+
+        return kernel_global(
+            self.kernelf,
+            x.array,
+            z.array,
+            max_size=self.context["max_size"],
+            out_of_core=self.context["out_of_core"],
+        )
 
     def _get_config(self):
         return {"kernelf": self.kernelf.get_config()}
+
+
+def kernel_global(kernelf, x, z=None, max_size=None, out_of_core=None):
+    """Compute kernel matrix between the rows of x (and z) in blocks.
+
+    Args:
+        kernelf: Callable kernelf
+        x: ndarray with global representations
+        z: Optional, ndarray with global representations. If None, compute
+            the symmetric kernel matrix for x.
+        max_size: Number of rows/columns of blocks, None computes everything at once.
+        out_of_core: Optional, directory in which to memory-map the output.
+
+    Returns:
+        ndarray of shape (len(x), len(z)).
+
+    """
+    symmetric = z is None
+    if symmetric:
+        z = x
+
+    n, m = len(x), len(z)
+
+    if max_size is None or max_size >= max(n, m):
+        if out_of_core is None:
+            if symmetric:
+                return kernelf(x)
+            else:
+                return kernelf(x, z=z)
+        max_size = max(n, m)
+
+    out = None
+    for i in range(0, n, max_size):
+        for j in range(i if symmetric else 0, m, max_size):
+            if symmetric and i == j:
+                block = kernelf(x[i : i + max_size])
+            else:
+                block = kernelf(x[i : i + max_size], z=z[j : j + max_size])
+
+            if out is None:
+                out = allocate((n, m), block.dtype, out_of_core)
+
+            rows, cols = block.shape
+            out[i : i + rows, j : j + cols] = block
+            if symmetric and i != j:
+                out[j : j + cols, i : i + rows] = block.T
+
+    return out
@@ -6,9 +6,20 @@ from cmlkit import from_config
 
 from cmlkit.utility import import_qmmlpack
 
+from . import native
+
 
 class KRR(Component):
-    """Kernel Ridge Regression with qmmlpack backend.
+    """Kernel Ridge Regression with qmmlpack or native backend.
+
+    With the numpy backend (see `native.py`), the `dtype` (for instance "float32")
+    of the computation can be set as parameter or in the context (where it also
+    applies to the kernel). It is part of the config if it's not None, so models
+    with different dtypes have different hashes. If `keep_factor` is set, the
+    Cholesky factor is retained after training. The kernel matrix is copied before
+    it is factorised, since it may be shared (for instance with a cache). If nothing
+    else uses it, `overwrite` can be set in the context to factorise it in place
+    instead, which halves peak memory. (Read-only kernel matrices are always copied.)
 
     Parameters:
         kernel: Component (or config) with signature f(x, z=None) -> ndarray that
@@ -17,27 +28,43 @@ class KRR(Component):
         nl: Regularisation strength, equivalent to `sigma**2` in Rasmussen & Williams
             (this is the factor that is added to the diagonal elements of the kernel matrix)
         centering: Optional, if True, labels and kernel matrices are centered to mean=0
+        dtype: Optional, dtype of the regression, defaults to the one in the context
 
     """
 
     kind = "krr"
-    default_context = {"print_timings": False}
-
-    def __init__(self, kernel, nl, centering=False, context={}):
+    default_context = {
+        "print_timings": False,
+        "keep_factor": False,
+        "dtype": None,
+        "overwrite": False,
+    }
+
+    def __init__(self, kernel, nl, centering=False, dtype=None, context={}):
         super().__init__(context=context)
 
         self.kernel = from_config(kernel, context=self.context)
         self.nl = nl
         self.centering = centering
 
+        if dtype is None:
+            dtype = self.context["dtype"]
+        self.dtype = dtype
+
         self.trained = False
+        self.krr = None
+        self.path = None
 
     def _get_config(self):
-        return {
+        config = {
             "nl": self.nl,
             "kernel": self.kernel.get_config(),
             "centering": self.centering,
         }
+        if self.dtype is not None:
+            config["dtype"] = self.dtype
+
+        return config
 
     def train(self, x, y):
         """Train KRR model.
@@ -48,17 +75,75 @@ class KRR(Component):
 
         """
         self.x_train = x
+        self.path = None
 
         kernel = self.kernel(self.x_train).array
 
-        qmmlpack = import_qmmlpack("use cmlkit.regression.qmml")
-        self.krr = qmmlpack.KernelRidgeRegression(
-            kernel, y, theta=(self.nl,), centering=self.centering
-        )
+        if native.get_backend(self.context) == "numpy":
+            self.krr = native.KernelRidgeRegression(
+                kernel,
+                y,
+                self.nl,
+                centering=self.centering,
+                overwrite=self.context["overwrite"],
+                keep_factor=self.context["keep_factor"],
+                dtype=self.dtype,
+            )
+        else:
+            qmmlpack = import_qmmlpack("use cmlkit.regression.qmml")
+            self.krr = qmmlpack.KernelRidgeRegression(
+                kernel, y, theta=(self.nl,), centering=self.centering
+            )
 
         self.trained = True
         return self  # return the trained regressor!
 
+    def train_path(self, x, y):
+        """Prepare KRR for many regularisation strengths at once, see `predict_path`.
+
+        The kernel matrix is eigendecomposed once (with scipy, regardless of backend),
+        after which the model can be solved for any `nl` in O(n^2). Afterwards,
+        `predict` uses the `nl` of this KRR instance.
+
+        Args:
+            x: Either global or atomic representations.
+            y: Array with labels.
+
+        """
+        self.x_train = x
+        self.krr = None
+
+        kernel = self.kernel(self.x_train).array
+
+        self.path = native.RegularisationPath(
+            kernel,
+            y,
+            centering=self.centering,
+            overwrite=self.context["overwrite"],
+            dtype=self.dtype,
+        )
+
+        self.trained = True
+        return self
+
+    def predict_path(self, z, nls):
+        """Predict with KRR for each regularisation strength in nls.
+
+        Requires `train_path` to have been called.
+
+        Args:
+            z: Either global or atomic representation.
+            nls: List of regularisation strengths.
+
+        Returns:
+            ndarray of shape (len(nls), n_predictions).
+        """
+        assert self.path is not None, "predict_path requires train_path, not train."
+
+        kernel = self.kernel(x=self.x_train, z=z).array
+
+        return self.path(kernel, nls)
+
     def predict(self, z):
         """Predict with KRR model.
 
@@ -68,6 +153,10 @@ class KRR(Component):
 
         kernel = self.kernel(x=self.x_train, z=z).array
 
+        if self.krr is None:
+            # trained with train_path
+            return self.path(kernel, [self.nl])[0]
+
         prediction = self.krr(kernel)
 
         return prediction
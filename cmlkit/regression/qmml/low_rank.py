@@ -0,0 +1,357 @@
+"""Low-rank approximations of kernel ridge regression.
+
+`KRR` needs the full n x n kernel matrix of the training set, which limits the
+size of training sets by memory. The regressors in this module instead map every
+structure to m features, such that the kernel is approximated by the inner product
+of features, and perform ridge regression in this feature space. This needs memory
+for the n x m feature matrix (and the m x m normal equations), and the time
+to train scales as O(n m^2) instead of O(n^3).
+
+`NystroemKRR` uses the Nyström approximation: The kernel is evaluated between all
+structures and m "landmark" structures from the training set, and the features are
+K_nm K_mm^(-1/2). Landmarks can be picked at random, by k-means++ seeding, or by
+farthest-point sampling. The latter two operate in representation space, which is the
+global representation itself, or the mean over the atoms of a structure for atomic
+representations. Any kernel can be used.
+
+`RandomFeaturesKRR` uses random Fourier features, so the kernel is never evaluated.
+This works for the Gaussian and Laplacian kernel functions, and for both global and
+atomic kernels (where the features of a structure are summed over its atoms).
+
+Both take the same `kernel` config as `KRR`, so they can replace it in any model.
+For large n, `nl` typically needs to be larger than for exact KRR.
+
+"""
+
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve, eigh
+
+from cmlkit.engine import Component
+from cmlkit import from_config
+from cmlkit.representation.data import GlobalRepresentation, ShardedRepresentation
+
+from . import native
+
+
+class NystroemKRR(Component):
+    """Kernel Ridge Regression with Nyström approximation.
+
+    Parameters:
+        kernel: Kernel config, as for `KRR`
+        nl: Regularisation strength
+        m: Number of landmarks
+        landmarks: Optional, strategy to pick landmarks: "random", "kmeans++",
+            or "farthest"
+        seed: Optional, seed for picking landmarks
+        centering: Optional, if True, labels and features are centered to mean=0
+
+    """
+
+    kind = "krr_nystroem"
+
+    def __init__(
+        self, kernel, nl, m, landmarks="random", seed=123, centering=False, context={}
+    ):
+        super().__init__(context=context)
+
+        assert landmarks in strategies, f"Unknown landmark strategy {landmarks}."
+
+        self.kernel = from_config(kernel, context=self.context)
+        self.nl = nl
+        self.m = m
+        self.landmarks = landmarks
+        self.seed = seed
+        self.centering = centering
+
+        self.trained = False
+
+    def _get_config(self):
+        return {
+            "nl": self.nl,
+            "kernel": self.kernel.get_config(),
+            "m": self.m,
+            "landmarks": self.landmarks,
+            "seed": self.seed,
+            "centering": self.centering,
+        }
+
+    def train(self, x, y):
+        """Train Nyström KRR model.
+
+        Args:
+            x: Either global or atomic representations.
+            y: Array with labels.
+
+        """
+        assert not isinstance(
+            x, ShardedRepresentation
+        ), "NystroemKRR doesn't support sharded datasets, use RandomFeaturesKRR."
+
+        idx = strategies[self.landmarks](points(x), self.m, self.seed)
+        self.x_landmarks = x.take(idx)
+
+        self.projection = nystroem_projection(self.kernel(self.x_landmarks).array)
+        self.ridge = FeatureRidgeRegression(
+            self.features(x), y, self.nl, centering=self.centering
+        )
+
+        self.trained = True
+        return self
+
+    def predict(self, z):
+        """Predict with Nyström KRR model.
+
+        Args:
+            z: Either global or atomic representation.
+        """
+        return self.ridge(self.features(z))
+
+    def features(self, x):
+        return self.kernel(x=x, z=self.x_landmarks).array @ self.projection
+
+
+class RandomFeaturesKRR(Component):
+    """Kernel Ridge Regression with random Fourier features.
+
+    Parameters:
+        kernel: Kernel config, as for `KRR`, with a Gaussian or Laplacian kernelf
+        nl: Regularisation strength
+        m: Number of features
+        seed: Optional, seed for drawing the features
+        centering: Optional, if True, labels and features are centered to mean=0
+
+    """
+
+    kind = "krr_rff"
+
+    default_context = {"max_bytes": native.max_bytes}
+
+    def __init__(self, kernel, nl, m, seed=123, centering=False, context={}):
+        super().__init__(context=context)
+
+        self.kernel = from_config(kernel, context=self.context)
+        self.nl = nl
+        self.m = m
+        self.seed = seed
+        self.centering = centering
+
+        kernelf = self.kernel.kernelf.get_kind()
+        assert (
+            kernelf in spectra
+        ), f"Random features are not available for the {kernelf} kernel function."
+
+        self.trained = False
+
+    def _get_config(self):
+        return {
+            "nl": self.nl,
+            "kernel": self.kernel.get_config(),
+            "m": self.m,
+            "seed": self.seed,
+            "centering": self.centering,
+        }
+
+    def train(self, x, y):
+        """Train random features KRR model.
+
+        Args:
+            x: Either global or atomic representations (or sharded ones).
+            y: Array with labels.
+
+        """
+        if is_global(x):
+            dimension = first(x).array.shape[1]
+        else:
+            dimension = first(x).linear.shape[1]
+
+        kernelf = self.kernel.kernelf
+        self.frequencies, self.phases = spectra[kernelf.get_kind()](
+            dimension, self.m, kernelf.ls, self.seed
+        )
+
+        self.ridge = FeatureRidgeRegression(
+            self.features(x), y, self.nl, centering=self.centering
+        )
+
+        self.trained = True
+        return self
+
+    def predict(self, z):
+        """Predict with random features KRR model.
+
+        Args:
+            z: Either global or atomic representation.
+        """
+        return self.ridge(self.features(z))
+
+    def features(self, x):
+        if isinstance(x, ShardedRepresentation):
+            return np.concatenate([self.features(shard) for shard in x])
+
+        if is_global(x):
+            return random_features(x.array, self.frequencies, self.phases)
+
+        # sum over atoms, for blocks of structures to bound memory use
+        max_atoms = max(1, self.context["max_bytes"] // (8 * self.m))
+        out = np.empty((x.n, self.m))
+        for start, stop in native.get_blocks(x.offsets, max_atoms):
+            idx = x.offsets[start:stop] - x.offsets[start]
+            atoms = x.linear[x.offsets[start] : x.offsets[stop]]
+
+            features = random_features(atoms, self.frequencies, self.phases)
+            out[start:stop] = np.add.reduceat(features, idx, axis=0)
+
+        if self.kernel.norm:
+            out /= np.asarray(x.counts)[:, None]
+
+        return out
+
+
+class FeatureRidgeRegression:
+    """Ridge regression on explicit features.
+
+    Solves (F^T F + nl I) w = F^T y with a Cholesky factorisation.
+
+    Args:
+        features: ndarray of shape (n, m).
+        y: Labels.
+        nl: Regularisation strength.
+        centering: If True, centre features and labels.
+
+    """
+
+    def __init__(self, features, y, nl, centering=False):
+        y = np.asarray(y, dtype=features.dtype)
+
+        self.centering = centering
+        if centering:
+            self.feature_means = features.mean(axis=0)
+            self.y_mean = y.mean()
+            features = features - self.feature_means
+            y = y - self.y_mean
+        else:
+            self.y_mean = 0.0
+
+        normal = features.T @ features
+        native.add_to_diagonal(normal, nl)
+
+        factor = cho_factor(normal, overwrite_a=True, check_finite=False)
+        self.weights = cho_solve(factor, features.T @ y, check_finite=False)
+
+    def __call__(self, features):
+        """Predict, given the features of the prediction samples."""
+        if self.centering:
+            features = features - self.feature_means
+
+        return features @ self.weights + self.y_mean
+
+
+def nystroem_projection(kernel):
+    """Matrix P with P P^T = pseudo-inverse of kernel, discarding tiny eigenvalues."""
+    values, vectors = eigh(kernel, check_finite=False)
+
+    cutoff = values.max() * len(values) * np.finfo(values.dtype).eps
+    keep = values > cutoff
+
+    return vectors[:, keep] / np.sqrt(values[keep])
+
+
+def points(x):
+    """Points in representation space, one per structure."""
+    if is_global(x):
+        return np.asarray(x.array)
+
+    counts = np.asarray(x.counts)[:, None]
+    return np.add.reduceat(x.linear, x.offsets[:-1], axis=0) / counts
+
+
+def landmarks_random(points, m, seed):
+    """Pick m points at random."""
+    rng = np.random.RandomState(seed)
+    return np.sort(rng.choice(len(points), size=min(m, len(points)), replace=False))
+
+
+def landmarks_kmeanspp(points, m, seed):
+    """Pick m points by k-means++ seeding, i.e. with probability ~ squared distance."""
+    rng = np.random.RandomState(seed)
+    return greedy_landmarks(points, m, rng, lambda d: rng.choice(len(d), p=d / d.sum()))
+
+
+def landmarks_farthest(points, m, seed):
+    """Pick m points by farthest point sampling, starting at a random point."""
+    rng = np.random.RandomState(seed)
+    return greedy_landmarks(points, m, rng, np.argmax)
+
+
+def greedy_landmarks(points, m, rng, pick):
+    """Pick points one by one, given the squared distance to the picked ones."""
+    n = len(points)
+    m = min(m, n)
+
+    picked = [rng.randint(n)]
+    distances = native.squared_euclidean(points, z=points[picked]).ravel()
+
+    while len(picked) < m:
+        if distances.sum() == 0.0:
+            # all remaining points are duplicates, pick any of them
+            rest = np.setdiff1d(np.arange(n), picked)
+            picked.extend(rng.choice(rest, size=m - len(picked), replace=False))
+            break
+
+        i = pick(distances)
+        picked.append(i)
+
+        new = native.squared_euclidean(points, z=points[[i]]).ravel()
+        np.minimum(distances, new, out=distances)
+        distances[picked] = 0.0
+
+    return np.sort(picked)
+
+
+def spectrum_gaussian(dimension, m, ls, seed):
+    """Frequencies and phases of random features for the Gaussian kernel."""
+    rng = np.random.RandomState(seed)
+    frequencies = rng.normal(scale=1.0 / ls, size=(dimension, m))
+    phases = rng.uniform(0.0, 2.0 * np.pi, size=m)
+
+    return frequencies, phases
+
+
+def spectrum_laplacian(dimension, m, ls, seed):
+    """Frequencies and phases of random features for the Laplacian kernel."""
+    rng = np.random.RandomState(seed)
+    frequencies = rng.standard_cauchy(size=(dimension, m)) / ls
+    phases = rng.uniform(0.0, 2.0 * np.pi, size=m)
+
+    return frequencies, phases
+
+
+def random_features(x, frequencies, phases):
+    """Random Fourier features sqrt(2/m) cos(x w + b)."""
+    out = x @ frequencies
+    out += phases
+    np.cos(out, out=out)
+    out *= np.sqrt(2.0 / len(phases))
+
+    return out
+
+
+def is_global(x):
+    return isinstance(first(x), GlobalRepresentation)
+
+
+def first(x):
+    """First shard of a sharded representation, or x itself."""
+    if isinstance(x, ShardedRepresentation):
+        return x[0]
+    else:
+        return x
+
+
+strategies = {
+    "random": landmarks_random,
+    "kmeans++": landmarks_kmeanspp,
+    "farthest": landmarks_farthest,
+}
+
+spectra = {"gaussian": spectrum_gaussian, "laplacian": spectrum_laplacian}
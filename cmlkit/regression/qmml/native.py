@@ -0,0 +1,520 @@
+"""Native (numpy) implementations of qmmlpack functionality.
+
+These are drop-in replacements for the parts of `qmmlpack` that `cmlkit` uses,
+so models can be trained without installing it. Which implementation is used
+is controlled with the `backend` context variable: "qmmlpack", "numpy", or
+"auto" (the default), which uses `qmmlpack` if it is installed, and numpy otherwise.
+
+Kernel functions:
+
+Squared euclidean distances are computed as `||x||^2 + ||z||^2 - 2 x.z`, so the
+bulk of the work is a single matrix product (which is done by BLAS), and the
+remaining operations, including the exponentiation, are done in place on
+the output. Manhattan distances (for the Laplacian kernel) can't be expanded
+like this, so they are computed in blocks of rows, bounding the size of the
+intermediate arrays by `max_bytes`.
+
+With `dtype="float32"` (in the context of the kernel function), everything is
+computed in single precision, which is about twice as fast, and needs half the
+memory, at the cost of some accuracy (the distance expansion suffers from
+cancellation for nearby points).
+
+Atomic kernels:
+
+`kernel_atomic` computes kernels between atomic representations, given as linear
+arrays of atomic representations plus offsets, by computing the atom-atom kernel
+matrix for blocks of structures and summing it up by structure with `np.add.reduceat`.
+Blocks are chosen such that the atom-atom kernel matrix of a block takes up at most
+`max_bytes` bytes (unless a single pair of structures is larger than that).
+
+Kernel ridge regression:
+
+`KernelRidgeRegression` solves the KRR problem with a Cholesky factorisation
+(LAPACK via scipy), which is done in place, on the kernel matrix itself, if possible.
+The regulariser is also added in place, so training needs memory for roughly
+one kernel matrix. If the kernel matrix can't be overwritten (for instance because
+it's in a cache, where it is read-only), it is copied first.
+
+`RegularisationPath` instead eigendecomposes the kernel matrix, after which the KRR
+problem can be solved for any regularisation strength `nl` in O(n^2), so many values
+of `nl` can be tried at the cost of training once.
+
+Cross-validation residuals of KRR are available in closed form: With A = K + nl I
+and weights A^-1 y, the residuals of the samples in a fold F, predicted by a model
+trained on all other samples, are ((A^-1)_FF)^-1 weights_F. For leave-one-out,
+this is weights_i / (A^-1)_ii. `KernelRidgeRegression.cv_residuals` computes A^-1
+in place from the Cholesky factor, so exact leave-one-out and k-fold cross-validation
+cost about as much as training once.
+
+"""
+
+import numpy as np
+from functools import lru_cache
+from scipy.linalg import cho_factor, cho_solve, eigh, get_lapack_funcs
+
+# maximum size of intermediate arrays for manhattan distances, in bytes
+max_bytes = 2 ** 27
+
+
+def get_backend(context):
+    """Backend to use for context, resolving "auto"."""
+    backend = context.get("backend", "auto")
+
+    if backend == "auto":
+        if has_qmmlpack():
+            return "qmmlpack"
+        else:
+            return "numpy"
+
+    assert backend in ["qmmlpack", "numpy"], f"Unknown backend {backend}."
+    return backend
+
+
+@lru_cache(maxsize=None)
+def has_qmmlpack():
+    from cmlkit import DependencyMissing
+    from cmlkit.utility import import_qmmlpack
+
+    try:
+        import_qmmlpack()
+        return True
+    except DependencyMissing:
+        return False
+
+
+def kernel_gaussian(x, z=None, theta=1.0, diagonal=False, distance=False, dtype=None):
+    """Gaussian kernel k(x,z) = exp(-||x-z||^2/2s^2), with s=theta.
+
+    Args:
+        x, z: ndarrays of shape (n, d) and (m, d). If z is None, z=x.
+        theta: Length scale.
+        diagonal: If True, only compute k(x_i, z_i) (or k(x_i, x_i) if z is None).
+        distance: If True, x is a precomputed matrix of squared euclidean distances.
+        dtype: Optional, dtype of computation.
+
+    Returns:
+        ndarray of shape (n, m), or (n, ) if diagonal.
+    """
+    if distance:
+        out = np.array(x, dtype=dtype)
+    elif diagonal:
+        out = diagonal_distance(x, z, dtype, squared=True)
+    else:
+        out = squared_euclidean(x, z, dtype)
+
+    out *= -1.0 / (2.0 * theta ** 2)
+    return np.exp(out, out=out)
+
+
+def kernel_laplacian(x, z=None, theta=1.0, diagonal=False, distance=False, dtype=None):
+    """Laplacian kernel k(x,z) = exp(-||x-z||_1/s), with s=theta.
+
+    Args:
+        x, z: ndarrays of shape (n, d) and (m, d). If z is None, z=x.
+        theta: Length scale.
+        diagonal: If True, only compute k(x_i, z_i) (or k(x_i, x_i) if z is None).
+        distance: If True, x is a precomputed matrix of manhattan distances.
+        dtype: Optional, dtype of computation.
+
+    Returns:
+        ndarray of shape (n, m), or (n, ) if diagonal.
+    """
+    if distance:
+        out = np.array(x, dtype=dtype)
+    elif diagonal:
+        out = diagonal_distance(x, z, dtype, squared=False)
+    else:
+        out = manhattan(x, z, dtype)
+
+    out *= -1.0 / theta
+    return np.exp(out, out=out)
+
+
+def kernel_linear(x, z=None, theta=None, diagonal=False, distance=False, dtype=None):
+    """Linear kernel k(x,z) = <x,z>.
+
+    Args:
+        x, z: ndarrays of shape (n, d) and (m, d). If z is None, z=x.
+        theta: Ignored.
+        diagonal: If True, only compute k(x_i, z_i) (or k(x_i, x_i) if z is None).
+        distance: Not supported.
+        dtype: Optional, dtype of computation.
+
+    Returns:
+        ndarray of shape (n, m), or (n, ) if diagonal.
+    """
+    assert not distance, "The linear kernel is not based on a distance."
+
+    x = np.asarray(x, dtype=dtype)
+    z = x if z is None else np.asarray(z, dtype=dtype)
+
+    if diagonal:
+        return np.einsum("ij,ij->i", x, z)
+    else:
+        return x @ z.T
+
+
+def squared_euclidean(x, z=None, dtype=None):
+    """Matrix of squared euclidean distances between rows of x and z."""
+    x = np.asarray(x, dtype=dtype)
+    symmetric = z is None
+
+    norms_x = np.einsum("ij,ij->i", x, x)
+    if symmetric:
+        z, norms_z = x, norms_x
+    else:
+        z = np.asarray(z, dtype=dtype)
+        norms_z = np.einsum("ij,ij->i", z, z)
+
+    out = x @ z.T
+    out *= -2.0
+    out += norms_x[:, None]
+    out += norms_z[None, :]
+
+    # rounding errors can lead to slightly negative distances
+    np.maximum(out, 0.0, out=out)
+    if symmetric:
+        np.fill_diagonal(out, 0.0)
+
+    return out
+
+
+def manhattan(x, z=None, dtype=None):
+    """Matrix of manhattan distances between rows of x and z, computed in blocks."""
+    x = np.asarray(x, dtype=dtype)
+    z = x if z is None else np.asarray(z, dtype=dtype)
+
+    n, m = len(x), len(z)
+    out = np.empty((n, m), dtype=np.result_type(x, z))
+
+    size = max(1, max_bytes // max(1, m * x.shape[1] * out.itemsize))
+    for start in range(0, n, size):
+        block = x[start : start + size, None, :] - z[None, :, :]
+        np.abs(block, out=block)
+        block.sum(axis=2, out=out[start : start + size])
+
+    return out
+
+
+def diagonal_distance(x, z, dtype, squared):
+    """Squared euclidean (or manhattan) distances between x_i and z_i only."""
+    x = np.asarray(x, dtype=dtype)
+
+    if z is None:
+        return np.zeros(len(x), dtype=x.dtype)
+
+    difference = x - np.asarray(z, dtype=dtype)
+    if squared:
+        return np.einsum("ij,ij->i", difference, difference)
+    else:
+        return np.abs(difference, out=difference).sum(axis=1)
+
+
+def kernel_atomic(
+    kernelf,
+    x,
+    x_offsets,
+    z=None,
+    z_offsets=None,
+    norm=False,
+    max_bytes=max_bytes,
+    out_of_core=None,
+    distances=None,
+):
+    """Kernel matrix between atomic representations.
+
+    K_ij is the sum of kernelf over all pairs of atoms in structure i of x and j of z.
+
+    Args:
+        kernelf: Callable kernelf, taking (x, z=None)
+        x: Linear array of atomic representations, shape (total_atoms, d).
+        x_offsets: Structure i is x[x_offsets[i]:x_offsets[i+1]].
+        z, z_offsets: Optional, same for z. If None, compute symmetric kernel for x.
+        norm: If True, divide by the number of atoms in each pair of structures.
+        max_bytes: Maximum size of atom-atom kernel matrix of each block, in bytes.
+        out_of_core: Optional, directory in which to memory-map the output.
+        distances: Optional, callable taking the (start, stop) ranges of structures
+            of a block in x and z, returning the atom-atom distance matrix for the
+            block, to which kernelf is then applied (with distance=True).
+
+    Returns:
+        ndarray of shape (n_x, n_z).
+    """
+    from cmlkit.regression.kernel import allocate
+
+    symmetric = z is None
+    if symmetric:
+        z, z_offsets = x, x_offsets
+
+    x_offsets = np.asarray(x_offsets)
+    z_offsets = np.asarray(z_offsets)
+
+    # square blocks, so the budget is split evenly between rows and columns
+    max_atoms = max(1, int(np.sqrt(max_bytes / np.dtype(float).itemsize)))
+    x_blocks = get_blocks(x_offsets, max_atoms)
+    z_blocks = x_blocks if symmetric else get_blocks(z_offsets, max_atoms)
+
+    out = None
+    for i, (x_start, x_stop) in enumerate(x_blocks):
+        x_idx = x_offsets[x_start:x_stop] - x_offsets[x_start]
+        x_atoms = slice(x_offsets[x_start], x_offsets[x_stop])
+
+        for j, (z_start, z_stop) in enumerate(z_blocks):
+            if symmetric and j < i:
+                continue
+
+            z_idx = z_offsets[z_start:z_stop] - z_offsets[z_start]
+            z_atoms = slice(z_offsets[z_start], z_offsets[z_stop])
+
+            if distances is not None:
+                d = distances((x_start, x_stop), (z_start, z_stop))
+                k = kernelf(d, distance=True)
+            elif symmetric and i == j:
+                k = kernelf(x[x_atoms])
+            else:
+                k = kernelf(x[x_atoms], z=z[z_atoms])
+
+            block = np.add.reduceat(np.add.reduceat(k, x_idx, axis=0), z_idx, axis=1)
+
+            if out is None:
+                shape = (len(x_offsets) - 1, len(z_offsets) - 1)
+                out = allocate(shape, block.dtype, out_of_core)
+
+            out[x_start:x_stop, z_start:z_stop] = block
+            if symmetric and i != j:
+                out[z_start:z_stop, x_start:x_stop] = block.T
+
+    if norm:
+        out /= np.diff(x_offsets)[:, None]
+        out /= np.diff(z_offsets)[None, :]
+
+    return out
+
+
+def get_blocks(offsets, max_atoms):
+    """Split structures into (start, stop) blocks with at most max_atoms atoms each.
+
+    Structures with more than max_atoms atoms get a block of their own.
+    """
+    blocks = []
+    start = 0
+    n = len(offsets) - 1
+
+    while start < n:
+        # last structure that still fits, but at least one
+        stop = np.searchsorted(offsets, offsets[start] + max_atoms, side="right") - 1
+        stop = min(max(stop, start + 1), n)
+
+        blocks.append((start, stop))
+        start = stop
+
+    return blocks
+
+
+class KernelRidgeRegression:
+    """Kernel ridge regression.
+
+    Drop-in replacement for `qmmlpack.KernelRidgeRegression`.
+
+    Args:
+        kernel: Kernel matrix of the training set.
+        y: Labels.
+        nl: Regularisation strength, added to the diagonal.
+        centering: If True, centre kernel matrix and labels.
+        overwrite: If True, factorise kernel in place if possible. (It can't be used
+            afterwards.)
+        keep_factor: If True, keep the Cholesky factor (`factor`), otherwise
+            only the weights are kept.
+        dtype: Optional, dtype of computation (for instance "float32").
+
+    """
+
+    def __init__(
+        self,
+        kernel,
+        y,
+        nl,
+        centering=False,
+        overwrite=False,
+        keep_factor=False,
+        dtype=None,
+    ):
+        kernel = writeable_fortran(kernel, dtype, overwrite)
+        y = np.asarray(y, dtype=kernel.dtype)
+
+        self.centering = centering
+        if centering:
+            self.kernel_means, self.kernel_mean = center_kernel(kernel)
+            self.y_mean = y.mean()
+            y = y - self.y_mean
+        else:
+            self.y_mean = 0.0
+
+        add_to_diagonal(kernel, nl)
+
+        factor = cho_factor(kernel, overwrite_a=True, check_finite=False)
+        self.weights = cho_solve(factor, y, check_finite=False)
+
+        if keep_factor:
+            self.factor = factor
+        else:
+            self.factor = None
+
+    def __call__(self, kernel):
+        """Predict, given the kernel matrix between training and prediction samples."""
+        if self.centering:
+            kernel = center_prediction_kernel(
+                kernel, self.kernel_means, self.kernel_mean
+            )
+
+        return kernel.T @ self.weights + self.y_mean
+
+    def cv_residuals(self, folds=None):
+        """Residuals (label - prediction) of cross-validation, in closed form.
+
+        Requires `keep_factor`. The inverse of the regularised kernel matrix is
+        computed in place of the Cholesky factor, which is discarded afterwards.
+        With centering, the centering is not redone for each fold, so the residuals
+        are a (close) approximation.
+
+        Args:
+            folds: Optional, list of index arrays, each of which is left out once.
+                If None, leave-one-out cross-validation is performed.
+
+        Returns:
+            ndarray with one residual per training sample.
+        """
+        assert self.factor is not None, "Cross-validation requires keep_factor=True."
+
+        factor, lower = self.factor
+        potri = get_lapack_funcs("potri", (factor,))
+        inverse, info = potri(factor, lower=lower, overwrite_c=True)
+        assert info == 0, f"Inverting kernel matrix failed (info={info})."
+        self.factor = None
+
+        if folds is None:
+            return self.weights / np.diag(inverse)
+
+        residuals = np.empty_like(self.weights)
+        for fold in folds:
+            fold = np.sort(fold)
+            # only one triangle of the inverse is computed
+            block = inverse[np.ix_(fold, fold)]
+            if lower:
+                block = np.tril(block) + np.tril(block, -1).T
+            else:
+                block = np.triu(block) + np.triu(block, 1).T
+
+            residuals[fold] = np.linalg.solve(block, self.weights[fold])
+
+        return residuals
+
+
+class RegularisationPath:
+    """Kernel ridge regression for many regularisation strengths at once.
+
+    The kernel matrix K is eigendecomposed as K = V diag(w) V^T, so the weights
+    for regularisation strength nl are V diag(1/(w + nl)) V^T y.
+
+    Args:
+        kernel: Kernel matrix of the training set.
+        y: Labels.
+        centering: If True, centre kernel matrix and labels.
+        overwrite: If True, decompose kernel in place if possible.
+        dtype: Optional, dtype of computation.
+
+    """
+
+    def __init__(self, kernel, y, centering=False, overwrite=False, dtype=None):
+        kernel = writeable_fortran(kernel, dtype, overwrite)
+        y = np.asarray(y, dtype=kernel.dtype)
+
+        self.centering = centering
+        if centering:
+            self.kernel_means, self.kernel_mean = center_kernel(kernel)
+            self.y_mean = y.mean()
+            y = y - self.y_mean
+        else:
+            self.y_mean = 0.0
+
+        self.eigenvalues, self.eigenvectors = eigh(
+            kernel, overwrite_a=True, check_finite=False
+        )
+        self.projected = self.eigenvectors.T @ y
+
+    def weights(self, nl):
+        """Weights for regularisation strength nl."""
+        return self.eigenvectors @ (self.projected / (self.eigenvalues + nl))
+
+    def __call__(self, kernel, nls):
+        """Predict for each nl.
+
+        Args:
+            kernel: Kernel matrix between training and prediction samples.
+            nls: List of regularisation strengths.
+
+        Returns:
+            ndarray of shape (len(nls), n_predictions).
+        """
+        if self.centering:
+            kernel = center_prediction_kernel(
+                kernel, self.kernel_means, self.kernel_mean
+            )
+
+        # project once, then each nl is a cheap matrix-vector product
+        projected_kernel = kernel.T @ self.eigenvectors
+        coefficients = self.projected[:, None] / (
+            self.eigenvalues[:, None] + np.asarray(nls)[None, :]
+        )
+
+        return (projected_kernel @ coefficients).T + self.y_mean
+
+
+def center_kernel(kernel):
+    """Centre kernel matrix in place, returning the means needed for predictions."""
+    means = kernel.mean(axis=0)
+    mean = means.mean()
+
+    kernel -= means[None, :]
+    kernel -= means[:, None]
+    kernel += mean
+
+    return means, mean
+
+
+def center_prediction_kernel(kernel, means, mean):
+    """Centre kernel matrix between training and prediction samples."""
+    kernel = kernel - kernel.mean(axis=0)[None, :]
+    kernel -= means[:, None]
+    kernel += mean
+
+    return kernel
+
+
+def writeable_fortran(kernel, dtype=None, overwrite=False):
+    """Symmetric matrix as writeable, Fortran-ordered array, copying only if needed.
+
+    LAPACK works in Fortran order. Since the matrix is symmetric, the transpose
+    of a C-ordered matrix is the same matrix in Fortran order, so no copy is needed.
+    """
+    if dtype is not None and np.dtype(dtype) != kernel.dtype:
+        kernel = kernel.astype(dtype)
+    elif not overwrite or not kernel.flags.writeable:
+        kernel = kernel.copy()
+
+    if kernel.flags.c_contiguous:
+        return kernel.T
+    else:
+        return np.asfortranarray(kernel)
+
+
+def add_to_diagonal(matrix, value):
+    """Add value to the diagonal of a square matrix, in place."""
+    matrix[np.diag_indices(len(matrix))] += value
+
+
+kernelfs = {
+    "kernel_gaussian": kernel_gaussian,
+    "kernel_laplacian": kernel_laplacian,
+    "kernel_linear": kernel_linear,
+}
@@ -1,5 +1,5 @@
 from .representation import Representation
-from .data import GlobalRepresentation, AtomicRepresentation
+from .data import GlobalRepresentation, AtomicRepresentation, ShardedRepresentation
 from .composed import Composed
 from .soap import SOAP
 from .mbtr import MBTR1, MBTR2, MBTR3, MBTR4
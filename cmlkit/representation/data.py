@@ -1,7 +1,8 @@
 """Data classes for computed representations."""
 
 import numpy as np
-from cmlkit.engine import Data
+from cmlkit.engine import Data, compute_hash
+from cmlkit.engine.cache import NoCache
 
 
 class GlobalRepresentation(Data):
@@ -21,6 +22,16 @@ class GlobalRepresentation(Data):
     def array(self):
         return self.data["array"]
 
+    def take(self, idx):
+        """Return GlobalRepresentation for the structures in idx."""
+
+        return GlobalRepresentation.mock(self.take_array(idx))
+
+    def take_array(self, idx):
+        """Array for the structures in idx, without creating (and hashing) Data."""
+
+        return self.array[idx]
+
 
 class AtomicRepresentation(Data):
     kind = "data_atomic_representation"
@@ -75,6 +86,82 @@ class AtomicRepresentation(Data):
 
         return AtomicRepresentation.mock(counts, linear)
 
+    def take(self, idx):
+        """Return AtomicRepresentation for the structures in idx."""
+
+        counts = np.asarray(self.counts)[idx]
+
+        return AtomicRepresentation.mock(counts, self.take_array(idx))
+
+    def take_array(self, idx):
+        """Linear array for the structures in idx, without creating (and hashing) Data."""
+
+        counts = np.asarray(self.counts)[idx]
+        starts = self.offsets[:-1][idx]
+
+        # position of each atom in the new linear array -> position in ours
+        offsets = get_offsets(counts)
+        rows = np.arange(offsets[-1]) + np.repeat(starts - offsets[:-1], counts)
+
+        return self.linear[rows]
+
+
+class ShardedRepresentation:
+    """Representation of a `ShardedDataset`, computed shard by shard when accessed.
+
+    The result for each shard is obtained by calling the representation on it,
+    so it is cached (per shard) like any other result. Kernels access every shard
+    many times (once per pair of shards, and again for every prediction), so if the
+    representation isn't cached, the results are instead kept here once computed.
+    In that case, the representations of all shards end up in memory, so sharded
+    datasets should be used with a (disk or tiered) cache for the representation.
+
+    Kernels accept this in place of global or atomic representations, and
+    compute the kernel matrix block by block, see `Kernel`.
+    """
+
+    def __init__(self, representation, dataset):
+        self.representation = representation
+        self.dataset = dataset
+
+        # same as Data.result
+        self.history = dataset.history + [representation.get_hid()]
+
+        # shard index -> result, only used without a cache
+        cache = getattr(representation, "cache", None)
+        if cache is None or isinstance(cache, NoCache):
+            self.results = {}
+        else:
+            self.results = None
+
+    @property
+    def id(self):
+        return compute_hash(self.history)
+
+    @property
+    def n(self):
+        return self.dataset.n
+
+    @property
+    def starts(self):
+        return self.dataset.starts
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, i):
+        if self.results is None:
+            return self.representation(self.dataset.shard(i))
+
+        if i not in self.results:
+            self.results[i] = self.representation(self.dataset.shard(i))
+
+        return self.results[i]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
 
 def atomic_data_dict(counts, linear):
     offsets = get_offsets(counts)
@@ -1,11 +1,15 @@
 """Define representation base class."""
 
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import cpu_count, current_process
 
 from cmlkit.engine import Component
+from cmlkit.dataset import ShardedDataset
 from cmlkit import caches
 
-from .data import AtomicRepresentation, GlobalRepresentation
+from .data import AtomicRepresentation, GlobalRepresentation, ShardedRepresentation
+from .data import get_offsets
 
 
 class Representation(Component):
@@ -43,36 +47,202 @@ class Representation(Component):
     - In the constructor for the representation, transform the args into canonical form.
       (Avoid setting too many attributes -- that just encourages mistakes.)
 
+    Large datasets can be computed in chunks of `chunk_size` structures (set in the
+    context), which bounds the memory used by the underlying code. If the `parallel`
+    context option is set (`True` for all cores, or a number of processes), chunks are
+    computed in a process pool. (Daemonic processes, like the workers of an
+    `EvaluationPool`, can't start processes of their own, so they compute chunks one
+    after the other instead.) In both cases, the results of chunks are written
+    directly into the final output array, and the result is identical to computing
+    everything at once. With `cache_chunks`, chunks are cached individually instead
+    of the whole result, so that growing a dataset only requires computing the new
+    chunks. (This is only sensible for representations that treat each structure
+    independently, which is anyway required for chunking to make sense.)
+
+    For a `ShardedDataset`, a `ShardedRepresentation` is returned, which computes
+    the representation of each shard when it's accessed, so that the representations
+    of all shards never need to be held in memory at the same time.
+
     """
 
+    # results are deduplicated between workers of an `EvaluationPool`
+    # if the `Run` enables single flight, see `engine/cache/caches.py`
+    single_flight = True
+
     def __init__(self, context={}):
         # can't use default_context because subclasses overwrite it
-        context = {"chunk_size": None, **context}
+        context = {
+            "chunk_size": None,
+            "parallel": False,
+            "cache_chunks": False,
+            **context,
+        }
         super().__init__(context=context)
 
     def __call__(self, data):
         """Compute this representation."""
 
+        if isinstance(data, ShardedDataset):
+            return ShardedRepresentation(self, data)
+
+        if self.caches_chunks:
+            # chunks are cached individually, no need to store everything again
+            return self.__compute(data)
+
         key = data.id
 
         result = self.cache.get_if_cached(key)
         if result is None:
-            result = self.__compute(data)
+            try:
+                result = self.from_parent(data)
+                if result is None:
+                    result = self.__compute(data)
+                else:
+                    # slicing is cheap, no need to store it
+                    self.cache.abandon(key)
+                    return result
+            except BaseException:
+                self.cache.abandon(key)
+                raise
             self.cache.submit(key, result)
 
         return result
 
+    def from_parent(self, data):
+        """Obtain result for a Subset from the cached result for its parent.
+
+        Representations treat each structure independently, so the representation
+        of a subset is simply a selection of the parent's. Requires the result for
+        the parent to be in the cache.
+
+        Returns:
+            Representation of data if the parent's result is cached, otherwise None.
+        """
+
+        parent = getattr(data, "parent_info", {}).get("id", None)
+        if parent is None or data.idx is None:
+            return None
+
+        parent_result = self.cache.peek(parent)
+        if parent_result is None:
+            return None
+
+        # the history of data identifies the result, no need to hash the arrays
+        atomic = isinstance(parent_result, AtomicRepresentation)
+        return self.from_array(data, parent_result.take_array(data.idx), atomic)
+
+    @property
+    def caches_chunks(self):
+        return self.context["cache_chunks"] and self.context["chunk_size"] is not None
+
     def __compute(self, data):
-        if self.context["chunk_size"] is None:
-            computed_representation = self.compute(data)
+        chunk_size = self.context["chunk_size"]
+        parallel = self.context["parallel"]
+
+        if parallel and current_process().daemon:
+            # daemonic processes are not allowed to have children
+            parallel = False
+
+        if data.n == 0 or (chunk_size is None and not parallel):
+            return self.to_data(data, self.compute(data))
+
+        if parallel:
+            if parallel is True:
+                max_workers = cpu_count()
+            else:
+                max_workers = int(parallel)
+
+            if chunk_size is None:
+                chunk_size = max(1, -(-data.n // max_workers))  # ceil
         else:
-            chunks = [
-                self.compute(chunk)
-                for chunk in data.in_chunks(size=self.context["chunk_size"])
-            ]
-            computed_representation = np.concatenate(chunks, axis=0)
+            max_workers = None
+
+        chunks = enumerate_chunks(data, chunk_size)
+
+        if self.caches_chunks:
+            chunks = self.compute_chunks_cached(chunks, max_workers)
+        elif max_workers is not None:
+            chunks = compute_chunks_parallel(self, chunks, max_workers)
+        else:
+            chunks = ((start, self.compute(chunk)) for start, chunk in chunks)
+
+        return self.assemble(data, chunks)
+
+    def compute_chunks_cached(self, chunks, max_workers=None):
+        """Look up chunks in the cache, compute and store the missing ones.
+
+        Chunks are subsets of the dataset, so the cache key of each chunk is its
+        geometry hash, i.e. it depends only on the structures it contains. Chunks
+        can therefore only be reused if the chunk boundaries line up, which in
+        practice means that structures were appended at the end of a dataset: All
+        chunks before the new structures are found in the cache and only the rest
+        needs to be computed. Inserting or removing structures shifts all following
+        chunks, which then all have to be computed again.
+
+        With a locking cache, looking up a missing chunk claims it until it is
+        stored. Chunks are looked up in the order of their ids, so that processes
+        claiming overlapping sets of chunks can't end up waiting for each other.
+
+        Yields (start, result) like the other ways of computing chunks.
+        """
+
+        missing = {}
+        try:
+            for start, chunk in sorted(chunks, key=lambda c: c[1].id):
+                result = self.cache.get_if_cached(chunk.id)
+                if result is None:
+                    missing[start] = chunk
+                else:
+                    yield start, result
+
+            if len(missing) == 0:
+                return
+
+            todo = list(missing.items())
+            if max_workers is None:
+                computed = ((start, self.compute(chunk)) for start, chunk in todo)
+            else:
+                computed = compute_chunks_parallel(self, todo, max_workers)
 
-        return self.to_data(data, computed_representation)
+            for start, result in computed:
+                chunk = missing.pop(start)
+                result = self.to_data(chunk, result)
+                self.cache.submit(chunk.id, result)
+
+                yield start, result
+        except BaseException:
+            # release claims on chunks we won't compute
+            for chunk in missing.values():
+                self.cache.abandon(chunk.id)
+            raise
+
+    def assemble(self, data, chunks):
+        """Assemble results of chunks, given as (start, result), in any order."""
+
+        out = None
+        for start, result in chunks:
+            array, atomic = as_array(result)
+
+            if out is None:
+                if atomic:
+                    offsets = get_offsets(data.info["atoms_by_system"])
+                    n = offsets[-1]
+                else:
+                    n = data.n
+                out = np.empty((n, *array.shape[1:]), dtype=array.dtype)
+
+            if atomic:
+                start = offsets[start]
+
+            out[start : start + len(array)] = array
+
+        return self.from_array(data, out, atomic)
+
+    def from_array(self, data, array, atomic):
+        if atomic:
+            return AtomicRepresentation.from_linear(self, data, array)
+        else:
+            return GlobalRepresentation.from_array(self, data, array)
 
     def to_data(self, data, computed_representation):
         if isinstance(
@@ -92,3 +262,68 @@ class Representation(Component):
         raise NotImplementedError(
             "Representations must implement a compute method."
         )
+
+
+def as_array(result):
+    """Array of a computed representation, and whether it is atomic."""
+
+    if isinstance(result, GlobalRepresentation):
+        return result.array, False
+    elif isinstance(result, AtomicRepresentation):
+        return result.linear, True
+    elif result.dtype == object:
+        return np.concatenate(result, axis=0), True
+    else:
+        return result, False
+
+
+def enumerate_chunks(data, chunk_size):
+    """Iterate over (start, chunk), see `Dataset.in_chunks`."""
+    return zip(range(0, data.n, chunk_size), data.in_chunks(chunk_size))
+
+
+def compute_chunks_parallel(representation, chunks, max_workers):
+    """Compute (start, chunk) in a process pool, yielding (start, result) as they finish.
+
+    At most 2*max_workers chunks are in flight at any time,
+    so not all chunks are held in memory at once.
+    """
+
+    # workers compute chunks directly, so they need neither caches nor chunking
+    context = {
+        **representation.context,
+        "chunk_size": None,
+        "parallel": False,
+        "cache": "no",
+    }
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=initializer,
+        initargs=(representation.get_config(), context),
+    ) as executor:
+        running = set()
+        for start, chunk in chunks:
+            if len(running) >= 2 * max_workers:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.start, future.result()
+
+            future = executor.submit(compute_chunk, chunk)
+            future.start = start
+            running.add(future)
+
+        for future in running:
+            yield future.start, future.result()
+
+
+def initializer(config, context):
+    """Instantiate the representation once per worker."""
+    from cmlkit import from_config
+
+    global representation
+    representation = from_config(config, context=context)
+
+
+def compute_chunk(chunk):
+    return representation.compute(chunk)
@@ -2,6 +2,6 @@
 
 from .search import Hyperopt
 from .run import Run
-from .evaluators import TuneEvaluatorHoldout
+from .evaluators import TuneEvaluatorHoldout, TuneEvaluatorLOOCV
 
-components = [Hyperopt, Run, TuneEvaluatorHoldout]
+components = [Hyperopt, Run, TuneEvaluatorHoldout, TuneEvaluatorLOOCV]
@@ -7,3 +7,4 @@ losses, and they need to be optimised for speed above all else.
 """
 
 from .evaluator_holdout import TuneEvaluatorHoldout
+from .evaluator_loocv import TuneEvaluatorLOOCV
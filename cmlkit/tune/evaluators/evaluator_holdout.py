@@ -1,5 +1,7 @@
 """Evaluate model on a holdout dataset."""
 
+import numpy as np
+
 from cmlkit import load_dataset
 
 from cmlkit.evaluation.evaluator import Evaluator
@@ -12,18 +14,27 @@ class TuneEvaluatorHoldout(Evaluator):
     Trains the model on a training set, then computes the
     loss for an unseen test set.
 
+    If `nls` is given, the regression method must support training for
+    many regularisation strengths at once (like `KRR.train_path`). The model
+    is then evaluated for all `nls` at the cost of training once, the lowest loss
+    is returned, and the model with the best `nl` is returned as `refined_suggestion`.
+    (The `nl` of the model that is being evaluated is ignored.)
+
     Parameters:
         train: training dataset
         test: test dataset
         target: name of target quantity (must be present in train and test)
         per: unit of quantity (per atom? per molecule?)
         lossf: name of a loss function
+        nls: optional, list of regularisation strengths to try
 
     """
 
     kind = "tune_eval_holdout"
 
-    def __init__(self, train, test, target, per=None, lossf="rmse", context={}):
+    def __init__(
+        self, train, test, target, per=None, lossf="rmse", nls=None, context={}
+    ):
         super().__init__(context=context)
 
         self.train = load_dataset(train)
@@ -31,6 +42,7 @@ class TuneEvaluatorHoldout(Evaluator):
         self.lossf = get_lossf(lossf)
         self.target = target
         self.per = per
+        self.nls = nls
 
     def _get_config(self):
         return {
@@ -39,9 +51,31 @@ class TuneEvaluatorHoldout(Evaluator):
             "lossf": self.lossf.__name__,
             "per": self.per,
             "target": self.target,
+            "nls": self.nls,
         }
 
     def evaluate(self, model):
+        if self.nls is not None:
+            return self.evaluate_path(model)
+
         model.train(self.train, target=self.target)
         pred = model.predict(self.test, per=self.per)
         return {"loss": self.lossf(self.test.pp(self.target, per=self.per), pred)}
+
+    def evaluate_path(self, model):
+        regression = model.regression
+        assert hasattr(
+            regression, "train_path"
+        ), f"Regression method {regression.get_kind()} doesn't support nls."
+
+        model.train_path(self.train, target=self.target)
+        preds = model.predict_path(self.test, self.nls, per=self.per)
+
+        true = self.test.pp(self.target, per=self.per)
+        losses = [self.lossf(true, pred) for pred in preds]
+        best = int(np.nanargmin(losses))
+
+        refined = model.get_config()
+        refined["model"]["regression"][regression.get_kind()]["nl"] = self.nls[best]
+
+        return {"loss": losses[best], "refined_suggestion": refined}
@@ -0,0 +1,104 @@
+"""Evaluate KRR models by closed-form cross-validation."""
+
+import numpy as np
+
+from cmlkit import load_dataset
+
+from cmlkit.evaluation.evaluator import Evaluator
+from cmlkit.evaluation.loss import get_lossf
+from cmlkit.regression.qmml import native
+
+
+class TuneEvaluatorLOOCV(Evaluator):
+    """Evaluate KRR model by leave-one-out or k-fold cross-validation.
+
+    For KRR, cross-validation residuals can be computed in closed form from
+    the inverse of the regularised kernel matrix of the whole dataset (see
+    `native.py`), so all folds are evaluated at about the cost of training once,
+    and no data needs to be held out. The kernel matrix is obtained from the
+    kernel of the model, so it's cached like any other kernel matrix. The
+    regression is always performed with the numpy backend.
+
+    The loss is computed for all (out-of-fold) predictions together. For k-fold
+    cross-validation, the variance of the per-fold losses, divided by the number
+    of folds, is returned as `var`, which is passed on to the search. (With
+    leave-one-out, per-fold losses aren't meaningful for most loss functions,
+    so no `var` is returned.)
+
+    Parameters:
+        data: dataset
+        target: name of target quantity
+        per: unit of quantity (per atom? per molecule?)
+        lossf: name of a loss function
+        k: optional, number of folds (at least 2, at most the number of structures).
+            If None, leave-one-out is performed.
+        seed: seed for assigning structures to folds at random
+
+    """
+
+    kind = "tune_eval_loocv"
+
+    def __init__(
+        self, data, target, per=None, lossf="rmse", k=None, seed=123, context={}
+    ):
+        super().__init__(context=context)
+
+        self.data = load_dataset(data)
+        self.lossf = get_lossf(lossf)
+        self.target = target
+        self.per = per
+        self.k = k
+        self.seed = seed
+
+        assert k is None or 2 <= k <= self.data.n, (
+            "Number of folds k must be between 2 and the number of structures "
+            f"({self.data.n}), not {k}."
+        )
+
+        if k is None:
+            self.folds = None
+        else:
+            idx = np.random.RandomState(seed).permutation(self.data.n)
+            self.folds = [np.sort(fold) for fold in np.array_split(idx, k)]
+
+    def _get_config(self):
+        return {
+            "data": self.data.name,
+            "lossf": self.lossf.__name__,
+            "per": self.per,
+            "target": self.target,
+            "k": self.k,
+            "seed": self.seed,
+        }
+
+    def evaluate(self, model):
+        regression = model.regression
+        assert (
+            regression.get_kind() == "krr"
+        ), f"Closed-form cross-validation requires KRR, not {regression.get_kind()}."
+
+        x = model.representation(self.data)
+        kernel = regression.kernel(x).array
+        y = self.data.pp(self.target, model.per)
+
+        krr = native.KernelRidgeRegression(
+            kernel,
+            y,
+            regression.nl,
+            centering=regression.centering,
+            overwrite=regression.context["overwrite"],
+            keep_factor=True,
+            dtype=regression.dtype,
+        )
+        pred = y - krr.cv_residuals(self.folds)
+
+        pred = model.convert_prediction(self.data, pred, self.per)
+        true = self.data.pp(self.target, per=self.per)
+
+        loss = self.lossf(true, pred)
+        if self.folds is None:
+            return {"loss": loss}
+
+        losses = [self.lossf(true[fold], pred[fold]) for fold in self.folds]
+
+        return {"loss": loss, "var": float(np.var(losses, ddof=1) / len(losses))}
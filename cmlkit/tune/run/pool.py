@@ -2,6 +2,8 @@
 
 from pebble import ProcessPool
 import traceback
+import shutil
+from pathlib import Path
 from concurrent.futures import TimeoutError
 import platform
 
@@ -23,6 +25,7 @@ class EvaluationPool:
         - Provide common format for results, with support for "ok" and "error" status
         - Catches specified, but not all, exceptions
         - Provides timeouts backed by a sufficiently brutal approach to killing processes*
+        - Optionally, deduplicates computations between workers ("single flight")
 
     We therefore sacrifice a little bit of generality for convenience
     in our particular domain, which is just how we like it.
@@ -42,6 +45,27 @@ class EvaluationPool:
 
     ***
 
+    If `single_flight` is given, it must be a dict with a `location` and (optionally)
+    further arguments to `DiskCache`. The workers then store the results of components
+    that opt in (`single_flight = True`, for instance `Representations`) and which aren't
+    otherwise cached in a shared disk cache at `location`. This cache claims keys with
+    lock files, so if multiple workers need the same result at the same time, one computes
+    it and the others wait for it. This is helpful in searches where many suggestions share
+    the same representation, but differ in the regression parameters. The `location` is
+    removed when the pool shuts down.
+
+    With more than one worker, disk caches in the workers claim keys with lock files
+    (see `DiskCache`), so workers don't compute the same result at the same time. This
+    can be turned off with `{"disk": {"locking": False}}` in the cache config.
+
+    If `share_datasets` is given, it must be a dict with a `location`, and optionally
+    `persistent` (default False). Workers then convert datasets that they load and that
+    aren't in the columnar format into it (once) at `location`, and memory-map them from
+    there, so all workers share one copy in memory (see `dataset/registry.py`). Unless
+    `persistent` is True, the `location` is removed when the pool shuts down.
+
+    ***
+
     WARNING: macOS has some issues with multiprocessing and fork safety. This
     should not be a problem with this implementation, but if the models evaluated do
     something fancy, this might be the problem. So if you encounter something like
@@ -64,12 +88,22 @@ class EvaluationPool:
         evals=None,
         trial_timeout=None,
         caught_exceptions=(TimeoutError,),
+        single_flight=None,
+        share_datasets=None,
     ):
 
         self.trial_timeout = trial_timeout
+        self.single_flight = single_flight
+        self.share_datasets = share_datasets
         self.pool = ProcessPool(
             initializer=initializer,
-            initargs=(evaluator_config, evaluator_context),
+            initargs=(
+                evaluator_config,
+                evaluator_context,
+                single_flight,
+                share_datasets,
+                max_workers > 1,
+            ),
             max_workers=max_workers,
         )
 
@@ -151,10 +185,40 @@ class EvaluationPool:
         except TimeoutError:
             logger.info("Failed to peacefully shut down pool... but no worries.")
 
+        if self.single_flight is not None:
+            shutil.rmtree(Path(self.single_flight["location"]), ignore_errors=True)
 
-def initializer(evaluator_config, evaluator_context):
+        if self.share_datasets is not None and not self.share_datasets.get(
+            "persistent", False
+        ):
+            shutil.rmtree(Path(self.share_datasets["location"]), ignore_errors=True)
+
+
+def initializer(
+    evaluator_config,
+    evaluator_context,
+    single_flight=None,
+    share_datasets=None,
+    locking=False,
+):
     """Instantiate the evaluator once."""
     global evaluator
+
+    if locking:
+        from cmlkit import caches
+
+        caches.locking = True
+
+    if single_flight is not None:
+        from cmlkit import caches
+
+        caches.flight = single_flight
+
+    if share_datasets is not None:
+        from cmlkit.dataset.registry import registry
+
+        registry.location = Path(share_datasets["location"])
+
     evaluator = from_config(evaluator_config, evaluator_context)
 
 
@@ -46,6 +46,8 @@ class Run(Component):
         "max_workers": cpu_count(),
         "shutdown_duration": 30.0,
         "wait_per_loop": 5.0,
+        "single_flight": False,
+        "share_datasets": False,
     }
 
     def __init__(
@@ -104,6 +106,23 @@ class Run(Component):
     def _prepare(self, work_directory, evals, state, msg="Prepared"):
         self.work_directory = work_directory
 
+        single_flight = self.context["single_flight"]
+        if single_flight:
+            if single_flight is True:
+                single_flight = {}
+            single_flight = {"location": work_directory / "flight", **single_flight}
+        else:
+            single_flight = None
+
+        share_datasets = self.context["share_datasets"]
+        if share_datasets is True:
+            share_datasets = {"location": work_directory / "datasets"}
+        elif share_datasets:
+            # explicitly given locations are kept, so they can be reused
+            share_datasets = {"location": Path(share_datasets), "persistent": True}
+        else:
+            share_datasets = None
+
         self.pool = EvaluationPool(
             evals=evals,
             max_workers=self.context["max_workers"],
@@ -111,6 +130,8 @@ class Run(Component):
             evaluator_context=self.context,
             trial_timeout=self.trial_timeout,
             caught_exceptions=self.caught_exceptions,
+            single_flight=single_flight,
+            share_datasets=share_datasets,
         )
         self.state = state
 
@@ -6,7 +6,9 @@ import shutil
 import pathlib
 from copy import copy
 
-from cmlkit.dataset import Dataset, Subset, load_dataset
+import pickle
+
+from cmlkit.dataset import Dataset, Subset, SubsetView, load_dataset
 
 
 class TestDataset(TestCase):
@@ -95,6 +97,37 @@ class TestDataset(TestCase):
         # smoke test
         self.data.report
 
+    def test_info(self):
+        data = Dataset(z=self.z, r=self.r, b=self.b)
+
+        # nothing is computed up front
+        self.assertEqual(len(data.info), 0)
+        np.testing.assert_array_equal(data.info["atoms_by_system"], self.n_atoms)
+        self.assertFalse("min_distance" in data.info)
+
+        distances = [
+            np.linalg.norm(r[:, None, :] - r[None, :, :], axis=-1)[np.triu_indices(len(r), 1)]
+            for r in self.r
+        ]
+        distances = np.concatenate(distances)
+        self.assertAlmostEqual(data.info["min_distance"], distances.min())
+        self.assertAlmostEqual(data.info["max_distance"], distances.max())
+
+        # with a small budget, structures are computed in blocks of rows
+        with unittest.mock.patch("cmlkit.dataset.info.max_pairs", 3):
+            blocked = Dataset(z=self.z, r=self.r, b=self.b)
+            self.assertAlmostEqual(blocked.info["min_distance"], distances.min())
+            self.assertAlmostEqual(blocked.info["max_distance"], distances.max())
+
+        self.assertEqual(data.info["elements"].tolist(), sorted(set(np.concatenate(self.z))))
+        self.assertEqual(
+            data.info["max_same_element_per_system"],
+            max([np.bincount(z).max() for z in self.z]),
+        )
+        self.assertEqual(
+            data.info["systems_per_element"][3], sum([3 in z for z in self.z])
+        )
+
     def test_creation(self):
         self.assertEqual(self.data.name, "test")
         self.assertEqual(self.data.desc, "test")
@@ -114,7 +147,7 @@ class TestDataset(TestCase):
 
     def test_hash_stable(self):
         # is the dataset hash stable across restarts?
-        self.assertEqual(self.data.hash, "fd404c7fe4c285112cb7719c6913dc3b")
+        self.assertEqual(self.data.hash, "103ffec4bd44f2560c14eef60444de3a")
 
     def test_hash_equal(self):
         self.assertEqual(self.data.hash, self.data2.hash)
@@ -134,6 +167,59 @@ class TestDataset(TestCase):
         self.assertEqual(self.data.desc, data3.desc)
         np.testing.assert_array_equal(data3.splits, self.splits)
 
+    def test_flat_layout(self):
+        flat = Dataset(
+            z=self.data.z_flat,
+            r=self.data.r_flat,
+            offsets=self.data.offsets,
+            b=self.b,
+            p={"p1": self.p1, "p2": self.p2},
+        )
+
+        self.assertEqual(flat.n, self.n)
+        self.assertEqual(flat.hash, self.data.hash)
+        np.testing.assert_array_equal(flat.offsets[1:] - flat.offsets[:-1], self.n_atoms)
+        for i in range(self.n):
+            np.testing.assert_array_equal(flat.z[i], self.z[i])
+            np.testing.assert_array_equal(flat.r[i], self.r[i])
+
+        for key in ["n_atoms", "n_non_O", "n_non_H"]:
+            np.testing.assert_array_equal(flat.aux[key], self.data.aux[key])
+        np.testing.assert_array_equal(
+            self.data.aux["n_non_H"], [np.sum(z != 1) for z in self.z]
+        )
+
+        with self.assertRaises(AssertionError):
+            Dataset(z=self.data.z_flat, r=self.data.r_flat[:-1], offsets=self.data.offsets)
+
+    def test_columnar_roundtrip(self):
+        self.data.save(directory=self.tmpdir, columnar=True)
+        data3 = load_dataset("test", other_paths=[self.tmpdir])
+
+        self.assertEqual(self.data.hash, data3.hash)
+        self.assertEqual(self.data.geom_hash, data3.geom_hash)
+        self.assertEqual(self.data.name, data3.name)
+        self.assertEqual(self.data.desc, data3.desc)
+        np.testing.assert_array_equal(data3.splits, self.splits)
+        np.testing.assert_array_equal(data3.b, self.b)
+        np.testing.assert_array_equal(data3.p["p1"], self.p1)
+        np.testing.assert_array_equal(data3.info["atoms_by_system"], self.n_atoms)
+
+        for i in range(self.n):
+            np.testing.assert_array_equal(data3.z[i], self.z[i])
+            np.testing.assert_array_equal(data3.r[i], self.r[i])
+
+        # geometries are memory-mapped, also in subsets
+        self.assertTrue(isinstance(data3.r[0], np.memmap))
+        subset = Subset.from_dataset(data3, idx=np.array([3, 1, 5]))
+        self.assertTrue(isinstance(subset.r[0], np.memmap))
+
+        # subsets also roundtrip
+        subset.save(directory=self.tmpdir, filename="subset", columnar=True)
+        subset2 = load_dataset(self.tmpdir / "subset.npd")
+        self.assertEqual(subset.hash, subset2.hash)
+        np.testing.assert_array_equal(subset.idx, subset2.idx)
+
     def test_subset(self):
         idx = np.array([3, 1, 5, 6, 28, 32, 11], dtype=int)
         subset = Subset.from_dataset(self.data, idx=idx, name="subset")
@@ -150,7 +236,48 @@ class TestDataset(TestCase):
         self.assertEqual(subset.hash, subset2.hash)
 
         # hash stability test
-        self.assertEqual(subset.hash, "17049f531ac6f4aa091c79b06e352254")
+        self.assertEqual(subset.hash, "284130ee248011d07c8cd8d8d9fcbc32")
+
+        # hashes obtained from the parent match hashing from scratch
+        fresh = Dataset(
+            z=self.data.z[idx], r=self.data.r[idx], b=self.data.b[idx], p=subset.p
+        )
+        np.testing.assert_array_equal(subset.structure_hashes, fresh.structure_hashes)
+        self.assertEqual(subset.geom_hash, fresh.geom_hash)
+        self.assertEqual(subset.hash, fresh.hash)
+
+    def test_subset_view(self):
+        idx = np.array([3, 1, 5, 6, 28, 32, 11], dtype=int)
+        subset = Subset.from_dataset(self.data, idx=idx, name="subset")
+        view = SubsetView(self.data, idx=idx, name="subset")
+
+        self.assertEqual(view.n, len(idx))
+        self.assertEqual(view.id, subset.id)
+        self.assertEqual(view.hash, subset.hash)
+        self.assertEqual(view.parent_info, subset.parent_info)
+        for i in range(len(idx)):
+            np.testing.assert_array_equal(view.z[i], subset.z[i])
+            np.testing.assert_array_equal(view.r[i], subset.r[i])
+        np.testing.assert_array_equal(view.z_flat, subset.z_flat)
+        np.testing.assert_array_equal(view.r_flat, subset.r_flat)
+        np.testing.assert_array_equal(view.b, subset.b)
+        np.testing.assert_array_equal(view.p["p1"], subset.p["p1"])
+        np.testing.assert_array_equal(view.aux["n_non_O"], subset.aux["n_non_O"])
+        self.assertEqual(view.info["max_distance"], subset.info["max_distance"])
+
+        # views of views
+        view2 = SubsetView(view, idx=[2, 0])
+        self.assertEqual(view2.id, Subset.from_dataset(self.data, idx=[5, 3]).id)
+
+        # saving and pickling yield real subsets
+        view.save(directory=self.tmpdir)
+        subset2 = load_dataset("subset", other_paths=[self.tmpdir])
+        self.assertEqual(type(subset2), Subset)
+        self.assertEqual(subset2.hash, subset.hash)
+
+        subset3 = pickle.loads(pickle.dumps(view))
+        self.assertEqual(type(subset3), Subset)
+        self.assertEqual(subset3.hash, subset.hash)
 
     def test_chunking(self):
         for i, s in enumerate(self.data.in_chunks(size=30)):
@@ -198,3 +325,128 @@ class TestDataset(TestCase):
 
         dataset = Dataset.from_Atoms(atoms)
         self.assertEqual(dataset.geom_hash, self.data_nocell.geom_hash)
+
+    def test_builder(self):
+        from cmlkit.dataset.builder import DatasetBuilder
+
+        atoms = self.data.as_Atoms()
+        for i, a in enumerate(atoms):
+            a.info["p1"] = self.p1[i]
+            a.info["p2"] = self.p2[i]
+
+        path = self.tmpdir / "built.npd"
+        builder = DatasetBuilder(
+            path, name="test", desc="test", properties=["p1", "p2"], batch_size=7
+        )
+        builder.extend(a for a in atoms[:50])  # generators are fine
+        builder.extend(atoms[50:])
+        built = builder.finish()
+
+        self.assertIsInstance(built.z_flat, np.memmap)
+        self.assertEqual(built.geom_hash, self.data.geom_hash)
+        np.testing.assert_array_equal(built.offsets, self.data.offsets)
+        np.testing.assert_array_equal(built.b, self.data.b)
+        np.testing.assert_array_equal(built.p["p1"], self.p1)
+        self.assertEqual(built.info["total_atoms"], self.data.info["total_atoms"])
+        self.assertNotIn("min_distance", dict(built.info))
+        self.assertEqual(built.info["min_distance"], self.data.info["min_distance"])
+
+        reloaded = load_dataset(path)
+        self.assertEqual(reloaded.hash, built.hash)
+
+        # appending to an existing dataset
+        with DatasetBuilder(path, name="test", properties=["p1", "p2"], append=True) as b:
+            b.extend(atoms[:10])
+
+        appended = load_dataset(path)
+        self.assertEqual(appended.n, self.n + 10)
+        np.testing.assert_array_equal(appended.r[self.n + 3], self.data.r[3])
+        np.testing.assert_array_equal(appended.p["p2"][self.n :], self.p2[:10])
+
+        # failures leave the existing dataset untouched
+        with self.assertRaises(KeyError):
+            with DatasetBuilder(path, properties=["missing"]) as b:
+                b.extend(atoms)
+
+        self.assertEqual(load_dataset(path).hash, appended.hash)
+        self.assertEqual([p.name for p in self.tmpdir.iterdir()], ["built.npd"])
+
+        with self.assertRaises(AssertionError):
+            DatasetBuilder(self.tmpdir / "empty").finish()
+
+        # builders that never wrote anything leave no temporary files
+        self.assertEqual([p.name for p in self.tmpdir.iterdir()], ["built.npd"])
+
+        # datasets without per-structure hashes (hash scheme 1) get them recomputed
+        existing = load_dataset(path)
+        existing.structure_hashes = None
+        builder = DatasetBuilder(self.tmpdir / "rehashed.npd", properties=["p1", "p2"])
+        builder.append_existing(existing)
+        self.assertEqual(builder.finish().geom_hash, appended.geom_hash)
+
+    def test_sharded(self):
+        from cmlkit.dataset import ShardedDataset
+
+        shards = [
+            Subset.from_dataset(self.data, idx=np.arange(start, stop))
+            for start, stop in [(0, 30), (30, 31), (31, 100)]
+        ]
+        sharded = ShardedDataset.from_datasets(shards, name="sharded", desc="test")
+        sharded.save(directory=self.tmpdir)
+
+        loaded = load_dataset("sharded", other_paths=[self.tmpdir])
+        self.assertIsInstance(loaded, ShardedDataset)
+        self.assertEqual(loaded.n, self.n)
+        self.assertEqual(len(loaded), 3)
+        np.testing.assert_array_equal(loaded.starts, [0, 30, 31, 100])
+
+        # same hashes as the unsharded dataset
+        self.assertEqual(loaded.geom_hash, self.data.geom_hash)
+        self.assertEqual(loaded.hash, self.data.hash)
+        self.assertEqual(sharded.hash, loaded.hash)
+
+        np.testing.assert_array_equal(
+            loaded.pp("p1", per="mol"), self.data.pp("p1", per="mol")
+        )
+        np.testing.assert_array_equal(loaded.shard(2).r[0], self.data.r[31])
+        self.assertIsInstance(loaded.shard(0).z_flat, np.memmap)
+
+        # saving the manifest elsewhere keeps referring to the same shards
+        loaded.save(directory=self.tmpdir / "elsewhere", filename="moved")
+        moved = load_dataset("moved", other_paths=[self.tmpdir / "elsewhere"])
+        self.assertEqual(moved.shards[0], "../sharded/shard_00000.npd")
+        np.testing.assert_array_equal(moved.shard(2).r[0], self.data.r[31])
+        self.assertEqual(moved.hash, loaded.hash)
+
+        # manifests are small, so passing them around is cheap
+        self.assertEqual(pickle.loads(pickle.dumps(loaded)).hash, loaded.hash)
+
+        # hashes saved with a different hash scheme are recomputed
+        from cmlkit.engine import hashing
+
+        config = loaded.get_config()["sharded_dataset"]
+        self.assertEqual(config["_hash_scheme"], hashing.hash_scheme)
+        config.update(_hash="outdated", _geom_hash="outdated", _hash_scheme=0)
+        outdated = ShardedDataset(**config)
+        outdated.root = loaded.root
+        self.assertEqual(outdated.hash, loaded.hash)
+
+    def test_registry(self):
+        from cmlkit.dataset.registry import registry
+
+        self.data.save(directory=self.tmpdir)
+        data = load_dataset("test", other_paths=[self.tmpdir])
+        self.assertIs(load_dataset("test", other_paths=[self.tmpdir]), data)
+        self.assertIs(registry.get(data.hash), data)
+
+        # changed files are loaded again
+        self.different.save(directory=self.tmpdir, filename="test")
+        different = load_dataset("test", other_paths=[self.tmpdir])
+        self.assertEqual(different.hash, self.different.hash)
+
+        # only the most recently loaded datasets are kept
+        with unittest.mock.patch.object(registry, "max_datasets", 1):
+            self.data2.save(directory=self.tmpdir)
+            load_dataset("test2", other_paths=[self.tmpdir])
+            self.assertIsNone(registry.get(different.hash))
+            self.assertIsNot(load_dataset("test", other_paths=[self.tmpdir]), different)
@@ -6,9 +6,13 @@ import numpy as np
 import shutil
 import pathlib
 import time
+from concurrent.futures import ProcessPoolExecutor
 
 from cmlkit.engine import Component
 from cmlkit.engine.data import Data
+from cmlkit.engine.cache import Janitor, MemoryCache
+from cmlkit.engine.cache.janitor import parse_bytes
+from cmlkit.engine.cache.lock import Lock, heartbeat
 
 tmpdir = pathlib.Path(__file__).parent / "tmp_test_engine_cache"
 tmpdir.mkdir(exist_ok=True)
@@ -95,3 +99,245 @@ class TestEngineCache(TestCase):
         self.assertEqual(
             result.get_config_hash(), self.output.get_config_hash()
         )
+
+    def test_disk_protocols(self):
+        # by default, results are read into memory
+        component = DummyComponent1(
+            a=2.0, context={"cache": {"disk": {"location": self.tmpdir}}}
+        )
+        component(self.input)
+        result = component(self.input)
+        self.assertNotIsInstance(result.data["y"], np.memmap)
+        self.assertTrue(result.data["y"].flags.writeable)
+
+        # memory-mapping is opt-in
+        component = DummyComponent1(
+            a=3.0,
+            context={
+                "cache": {
+                    "disk": {"location": self.tmpdir, "protocol": 3, "mmap_mode": "r"}
+                }
+            },
+        )
+        component(self.input)
+        result = component(self.input)
+        self.assertIsInstance(result.data["y"], np.memmap)
+        np.testing.assert_array_equal(result.data["y"], np.ones(3) * 3)
+
+
+class TestEngineCacheEviction(TestCase):
+    def setUp(self):
+        self.tmpdir = tmpdir
+        self.tmpdir.mkdir(exist_ok=True)
+
+        self.inputs = [Data.create(data={"x": np.ones(1000) * i}) for i in range(5)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_budget_is_respected(self):
+        component = DummyComponent1(
+            a=2.0,
+            context={"cache": {"disk": {"location": self.tmpdir, "max_entries": 3}}},
+        )
+        for x in self.inputs:
+            component(x)
+
+        janitor = Janitor(self.tmpdir)
+        self.assertEqual(janitor.usage()["dummy123"]["entries"], 3)
+
+        # the most recently used ones survive
+        self.assertFalse(self.inputs[0].id in component.cache)
+        self.assertTrue(self.inputs[4].id in component.cache)
+
+    def test_janitor(self):
+        component = DummyComponent1(
+            a=2.0, context={"cache": {"disk": {"location": self.tmpdir}}}
+        )
+        for x in self.inputs:
+            component(x)
+
+        # touch the first one, so it's the most recently used
+        component(self.inputs[0])
+
+        janitor = Janitor(self.tmpdir, max_entries=2, policy="lru")
+        self.assertEqual(janitor.usage()["dummy123"]["entries"], 5)
+
+        evicted = janitor.collect(dry_run=True)
+        self.assertEqual(len(evicted), 3)
+        self.assertEqual(janitor.usage()["dummy123"]["entries"], 5)
+
+        janitor.collect()
+        self.assertEqual(janitor.usage()["dummy123"]["entries"], 2)
+        self.assertTrue(self.inputs[0].id in component.cache)
+        self.assertTrue(self.inputs[4].id in component.cache)
+
+        # a second run changes nothing, and leaves the index alone
+        index = next(self.tmpdir.glob("dummy123/*/index.jsonl"))
+        mtime = index.stat().st_mtime_ns
+        self.assertEqual(janitor.collect(), [])
+        self.assertEqual(index.stat().st_mtime_ns, mtime)
+
+        # evicted entries are simply recomputed
+        start = time.monotonic()
+        component(self.inputs[1])
+        self.assertGreater(time.monotonic() - start, 0.1)
+
+    def test_parse_bytes(self):
+        self.assertEqual(parse_bytes("1K"), 1024)
+        self.assertEqual(parse_bytes("1.5GB"), int(1.5 * 1024 ** 3))
+        self.assertEqual(parse_bytes(123), 123)
+
+
+class TestEngineCacheTiered(TestCase):
+    def setUp(self):
+        self.tmpdir = tmpdir
+        self.tmpdir.mkdir(exist_ok=True)
+
+        self.input = Data.create(data={"x": np.ones(3)})
+        self.context = {"cache": {"tiered": {"location": self.tmpdir, "memory_bytes": "1M"}}}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_tiers(self):
+        component = DummyComponent1(a=2.0, context=self.context)
+
+        result = component(self.input)
+        component.cache.flush()
+        self.assertEqual(component.cache.stats["memory"]["misses"], 1)
+        self.assertEqual(component.cache.stats["disk"]["misses"], 1)
+
+        # instances with the same config share the memory tier
+        component2 = DummyComponent1(a=2.0, context=self.context)
+        self.assertIs(component.cache, component2.cache)
+
+        start = time.monotonic()
+        result2 = component2(self.input)
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(component.cache.stats["memory"]["hits"], 1)
+        self.assertEqual(result.get_config_hash(), result2.get_config_hash())
+
+        # cached arrays can't be modified by accident
+        with self.assertRaises(ValueError):
+            result2.data["y"][0] = 1.0
+
+        # promotion from disk
+        component.cache.memory.clear()
+        result3 = component(self.input)
+        self.assertEqual(component.cache.stats["disk"]["hits"], 1)
+        self.assertTrue(component.cache.memory.check(self.input.id))
+        self.assertEqual(result.get_config_hash(), result3.get_config_hash())
+
+        # only the disk tier keeps track of misses (until the result is stored)
+        self.assertEqual(component.cache.memory.missed_at, {})
+        self.assertEqual(component.cache.disk.missed_at, {})
+
+    def test_memory_is_bounded(self):
+        cache = MemoryCache(max_bytes=800 * 3)
+        for i in range(5):
+            cache.submit(str(i), Data.create(data={"x": np.ones(100) * i}))
+
+        self.assertEqual(len(cache.entries), 3)
+        self.assertEqual(cache.bytes, 800 * 3)
+        self.assertFalse(cache.check("0"))
+        self.assertTrue(cache.check("4"))
+
+        # misses don't accumulate anything
+        for i in range(5, 10):
+            self.assertIsNone(cache.get_if_cached(str(i)))
+        self.assertEqual(cache.missed_at, {})
+
+
+class SlowCountingComponent(Component):
+    kind = "dummy_counting"
+
+    def __init__(self, counter, context={}):
+        super().__init__(context=context)
+
+        self.counter = counter
+
+    def _get_config(self):
+        return {"counter": self.counter}
+
+    def __call__(self, x):
+        result = self.cache.get_if_cached(x.id)
+
+        if result is None:
+            with open(self.counter, "a") as f:
+                f.write("computed\n")
+            time.sleep(1.0)
+            result = Data.result(self, x, data={"y": x.data["x"]})
+            self.cache.submit(x.id, result)
+
+        return result
+
+
+def compute_counting(counter, location, x):
+    component = SlowCountingComponent(
+        counter,
+        context={
+            "cache": {
+                "disk": {"location": location, "poll_interval": 0.1, "locking": True}
+            }
+        },
+    )
+    return component(x).data["y"].sum()
+
+
+class TestEngineCacheLocking(TestCase):
+    def setUp(self):
+        self.tmpdir = tmpdir
+        self.tmpdir.mkdir(exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_concurrent_workers_compute_once(self):
+        counter = str(self.tmpdir / "counter.txt")
+        x = Data.create(data={"x": np.ones(3)})
+
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            futures = [
+                executor.submit(compute_counting, counter, self.tmpdir, x)
+                for i in range(4)
+            ]
+            results = [f.result() for f in futures]
+
+        self.assertEqual(results, [3.0] * 4)
+        with open(counter, "r") as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+    def test_stale_lock(self):
+        lock = Lock(self.tmpdir / "test.lock", stale_after=0.5)
+        self.assertTrue(lock.acquire())
+
+        # held, and live
+        lock2 = Lock(self.tmpdir / "test.lock", stale_after=0.5)
+        self.assertFalse(lock2.acquire())
+
+        # simulate a crashed process: no more heartbeats
+        heartbeat.remove(lock)
+        time.sleep(0.6)
+        self.assertTrue(lock2.is_stale())
+        self.assertTrue(lock2.acquire())
+
+        # the original owner can no longer release it
+        lock.release()
+        self.assertTrue(lock2.exists())
+        lock2.release()
+        self.assertFalse(lock2.exists())
+
+    def test_abandon(self):
+        component = DummyComponent1(
+            a=2.0, context={"cache": {"disk": {"location": self.tmpdir, "locking": True}}}
+        )
+        x = Data.create(data={"x": np.ones(3)})
+
+        self.assertIsNone(component.cache.get_if_cached(x.id))
+        lockname = component.cache.lockname(x.id)
+        self.assertTrue(lockname.exists())
+
+        component.cache.abandon(x.id)
+        self.assertFalse(lockname.exists())
+        self.assertNotIn(x.id, component.cache.missed_at)
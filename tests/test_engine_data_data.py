@@ -77,6 +77,35 @@ class TestDataBasic(TestCase):
         self.assertEqual(data.history, data2.history)
         self.assertEqual(data.id, data2.id)
 
+    def test_roundtrip_protocol_3(self):
+        data = {"asdf": np.random.random((10, 3)), "jkl": np.random.random(10)}
+        info = {"property": 123}
+
+        data = DataExample.create(data=data, info=info)
+
+        data.dump(self.tmpdir / "test_3", protocol=3)
+
+        for mmap_mode in [None, "r"]:
+            data2 = load_data(self.tmpdir / "test_3.npd", mmap_mode=mmap_mode)
+
+            np.testing.assert_array_equal(data.data["asdf"], data2.data["asdf"])
+            np.testing.assert_array_equal(data.data["jkl"], data2.data["jkl"])
+            self.assertEqual(data.info["property"], data2.info["property"])
+            self.assertEqual(data.history, data2.history)
+            self.assertEqual(data.id, data2.id)
+
+        self.assertIsInstance(data2.data["asdf"], np.memmap)
+        self.assertFalse(data2.data["asdf"].flags.writeable)
+
+    def test_protocol_3_object_arrays(self):
+        ragged = np.array([np.ones(2), np.ones(3)], dtype=object)
+        data = DataExample.create(data={"ragged": ragged})
+
+        data.dump(self.tmpdir / "test_3_object", protocol=3)
+        data2 = load_data(self.tmpdir / "test_3_object.npd", mmap_mode="r")
+
+        np.testing.assert_array_equal(data2.data["ragged"][1], ragged[1])
+
 
 class TestDataTracking(TestCase):
     def setUp(self):
@@ -107,7 +136,7 @@ class TestDataTracking(TestCase):
 
         # another little smoke test to see if the hashes are
         # really consistent. if this fails, file an issue please!
-        self.assertEqual(new_data.id, "5f97bec5fc0d84be6faf50a2a0d6d025")
+        self.assertEqual(new_data.id, "8548e271c476dff04556b00c6233ef94")
 
     def test_different_id_if_combined_in_different_order(self):
         new_data = self.component(self.startdata, y=self.other_data)
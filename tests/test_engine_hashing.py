@@ -0,0 +1,90 @@
+from unittest import TestCase
+import numpy as np
+from copy import deepcopy
+
+from cmlkit.engine.hashing import compute_hash, compute_hash_with_scheme, fast_hash
+from cmlkit.engine.hashing import structure_hashes, combine_hashes
+
+
+class TestFastHash(TestCase):
+    def setUp(self):
+        np.random.seed(123)
+        n_atoms = np.random.randint(1, high=10, size=20)
+
+        self.z = np.array(
+            [np.random.randint(1, high=10, size=na) for na in n_atoms], dtype=object
+        )
+        self.r = np.array([np.random.random((na, 3)) for na in n_atoms], dtype=object)
+        self.config = {
+            "model": {
+                "per": "cell",
+                "regression": {"krr": {"nl": 1.0e-7, "kernel": [1, 2.0, "a"]}},
+                "representation": {"mbtr_1": {"start": 0.0, "stop": np.float64(1.0)}},
+            }
+        }
+
+    def test_stable_across_deepcopy(self):
+        self.assertEqual(compute_hash(self.config), compute_hash(deepcopy(self.config)))
+        self.assertEqual(
+            compute_hash(self.z, self.r), compute_hash(deepcopy(self.z), deepcopy(self.r))
+        )
+
+    def test_stable_across_restarts(self):
+        # if this fails, the hash scheme has changed and must be bumped!
+        self.assertEqual(fast_hash(self.config), "66ab41c5397508cc06d2e6d75b918586")
+        self.assertEqual(fast_hash([self.z, self.r]), "f4ab71d09425b0f8eec812e19b77b6f2")
+
+    def test_canonicalisation(self):
+        # dict order doesn't matter
+        self.assertEqual(fast_hash({"a": 1, "b": 2}), fast_hash({"b": 2, "a": 1}))
+
+        # lists and tuples are the same (yaml can't tell them apart either)
+        self.assertEqual(fast_hash([1, 2.0]), fast_hash((1, 2.0)))
+
+        # numpy scalars are the same as python scalars
+        self.assertEqual(fast_hash(np.float64(0.1)), fast_hash(0.1))
+        self.assertEqual(fast_hash(np.int64(3)), fast_hash(3))
+
+        # but types are not conflated
+        self.assertNotEqual(fast_hash(1), fast_hash(1.0))
+        self.assertNotEqual(fast_hash(1), fast_hash("1"))
+        self.assertNotEqual(fast_hash(True), fast_hash(1))
+
+    def test_arrays(self):
+        a = np.random.random((10, 5))
+
+        self.assertEqual(fast_hash(a), fast_hash(a.copy()))
+        self.assertEqual(fast_hash(a[:, ::2]), fast_hash(np.ascontiguousarray(a[:, ::2])))
+        self.assertEqual(fast_hash(a), fast_hash(a.astype(">f8")))
+
+        # shape and dtype matter
+        self.assertNotEqual(fast_hash(a), fast_hash(a.reshape(5, 10)))
+        self.assertNotEqual(fast_hash(a), fast_hash(a.astype(np.float32)))
+
+        # partitioning of ragged arrays matters
+        ragged1 = np.array([np.arange(2), np.arange(2, 5)], dtype=object)
+        ragged2 = np.array([np.arange(3), np.arange(3, 5)], dtype=object)
+        self.assertNotEqual(fast_hash(ragged1), fast_hash(ragged2))
+
+    def test_schemes(self):
+        self.assertEqual(
+            compute_hash_with_scheme(2, self.config), compute_hash(self.config)
+        )
+        self.assertNotEqual(
+            compute_hash_with_scheme(1, self.config),
+            compute_hash_with_scheme(2, self.config),
+        )
+
+    def test_structure_hashes(self):
+        digests = structure_hashes(self.z, self.r)
+        self.assertEqual(digests.shape, (len(self.z), 16))
+
+        # hashes of a selection only depend on the selected structures
+        idx = np.array([4, 2, 7])
+        np.testing.assert_array_equal(
+            structure_hashes(self.z[idx], self.r[idx]), digests[idx]
+        )
+
+        # order and partitioning matter
+        self.assertNotEqual(combine_hashes(digests), combine_hashes(digests[::-1]))
+        self.assertNotEqual(combine_hashes(digests), combine_hashes(digests[:-1]))
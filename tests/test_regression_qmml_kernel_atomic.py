@@ -1,11 +1,14 @@
 from unittest import TestCase
 import numpy as np
+import shutil
+import pathlib
 
 from cmlkit.regression.data import KernelMatrix
 from cmlkit.representation.data import AtomicRepresentation
 
 from cmlkit.regression.qmml import kernel_atomic, KernelAtomic
 from cmlkit.regression.qmml import KernelfGaussian
+from cmlkit.regression.qmml import native
 
 kernelf = KernelfGaussian(ls=3.0)
 
@@ -86,3 +89,102 @@ class TestKernelAtomicFunction(TestCase):
         )
 
         np.testing.assert_allclose(result, reference_result)
+
+
+class TestKernelAtomicNative(TestCase):
+    def setUp(self):
+        self.counts_x = [5, 3, 1, 4, 2, 3, 2, 40]
+        self.counts_z = [1, 2, 3, 3, 1]
+        self.x = AtomicRepresentation.mock(
+            self.counts_x, np.random.random((np.sum(self.counts_x), 10))
+        )
+        self.z = AtomicRepresentation.mock(
+            self.counts_z, np.random.random((np.sum(self.counts_z), 10))
+        )
+        self.kernelf = KernelfGaussian(ls=3.0, context={"backend": "numpy"})
+
+    def reference(self, x, z, norm):
+        return np.array(
+            [
+                [
+                    np.sum(self.kernelf(x=sys, z=sys2))
+                    / (len(sys) * len(sys2) if norm else 1.0)
+                    for sys2 in z.ragged
+                ]
+                for sys in x.ragged
+            ]
+        )
+
+    def test_blocks(self):
+        offsets = np.array([0, 5, 8, 9, 13, 53])
+        self.assertEqual(native.get_blocks(offsets, 8), [(0, 2), (2, 4), (4, 5)])
+        self.assertEqual(native.get_blocks(offsets, 100), [(0, 5)])
+
+    def test_native(self):
+        # small budgets force many blocks, including oversized structures
+        for max_bytes in [8, 8 * 36, native.max_bytes]:
+            for norm in [False, True]:
+                result = native.kernel_atomic(
+                    self.kernelf,
+                    self.x.linear,
+                    self.x.offsets,
+                    norm=norm,
+                    max_bytes=max_bytes,
+                )
+                np.testing.assert_allclose(result, self.reference(self.x, self.x, norm))
+
+                result = native.kernel_atomic(
+                    self.kernelf,
+                    self.x.linear,
+                    self.x.offsets,
+                    self.z.linear,
+                    self.z.offsets,
+                    norm=norm,
+                    max_bytes=max_bytes,
+                )
+                np.testing.assert_allclose(result, self.reference(self.x, self.z, norm))
+
+    def test_kernel(self):
+        kernel = KernelAtomic(
+            kernelf={"gaussian": {"ls": 3.0}},
+            norm=True,
+            context={"backend": "numpy", "max_bytes": 8 * 64},
+        )
+
+        np.testing.assert_allclose(
+            kernel(self.x).array, self.reference(self.x, self.x, True)
+        )
+        np.testing.assert_allclose(
+            kernel(self.x, self.z).array, self.reference(self.x, self.z, True)
+        )
+
+    def test_cache_distances(self):
+        tmpdir = pathlib.Path(__file__).parent / "tmp_test_kernel_atomic"
+        context = {
+            "max_bytes": 8 * 64,
+            "cache_distances": True,
+            "distance": {"cache": {"disk": {"location": tmpdir}}},
+        }
+
+        try:
+            hits = []
+            for ls in [1.0, 3.0]:
+                self.kernelf = KernelfGaussian(ls=ls, context={"backend": "numpy"})
+                kernel = KernelAtomic(
+                    kernelf={"gaussian": {"ls": ls}}, norm=True, context=context
+                )
+
+                np.testing.assert_allclose(
+                    kernel(self.x).array, self.reference(self.x, self.x, True)
+                )
+                np.testing.assert_allclose(
+                    kernel(self.x, self.z).array, self.reference(self.x, self.z, True)
+                )
+                hits.append(kernel.distance.cache.hits)
+
+            # all blocks are computed for the first length scale, then reused
+            self.assertEqual(hits[0], 0)
+            self.assertGreater(hits[1], 2)
+            self.assertEqual(kernel.distance.cache.misses, 0)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
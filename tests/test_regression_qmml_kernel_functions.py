@@ -79,3 +79,64 @@ class TestKernelfs(TestCase):
             {"laplacian": {"ls": 1.0}},
         )
         self.assertEqual(get_kernelf({"linear": {}}).get_config(), {"linear": {}})
+
+
+class TestKernelfsNumpy(TestCase):
+    def setUp(self):
+        self.x = np.random.random((30, 20))
+        self.z = np.random.random((17, 20))
+        self.context = {"backend": "numpy"}
+
+    def reference(self, f, x, z):
+        return np.array([[f(xi[None, :], z=zj[None, :]) for zj in z] for xi in x])
+
+    def test_against_reference(self):
+        for kernel, f in [
+            (
+                KernelfGaussian(ls=2.0, context=self.context),
+                partial(kernel_gaussian, ls=2.0),
+            ),
+            (
+                KernelfLaplacian(ls=2.0, context=self.context),
+                partial(kernel_laplacian, ls=2.0),
+            ),
+            (KernelfLinear(context=self.context), kernel_linear),
+        ]:
+            reference = self.reference(f, self.x, self.x)
+            np.testing.assert_allclose(kernel(self.x), reference)
+            np.testing.assert_allclose(kernel(self.x, diagonal=True), np.diag(reference))
+
+            reference = self.reference(f, self.x, self.z)
+            np.testing.assert_allclose(kernel(self.x, z=self.z), reference)
+            np.testing.assert_allclose(
+                kernel(self.x[:17], z=self.z, diagonal=True), np.diag(reference[:17])
+            )
+
+    def test_float32(self):
+        kernel = KernelfGaussian(ls=2.0, context={**self.context, "dtype": "float32"})
+        result = kernel(self.x, z=self.z)
+
+        self.assertEqual(result.dtype, np.float32)
+        reference = self.reference(partial(kernel_gaussian, ls=2.0), self.x, self.z)
+        np.testing.assert_allclose(result, reference, rtol=1e-4)
+
+        # the dtype is part of the config, so it's part of every (cache) key
+        self.assertEqual(kernel.get_config()["gaussian"]["dtype"], "float32")
+        self.assertEqual(get_kernelf(kernel.get_config()).dtype, "float32")
+        self.assertNotIn("dtype", KernelfLinear().get_config()["linear"])
+
+    def test_distance(self):
+        kernel = KernelfLaplacian(ls=2.0, context=self.context)
+        distances = np.abs(self.x[:, None, :] - self.z[None, :, :]).sum(axis=2)
+
+        np.testing.assert_allclose(
+            kernel(distances, distance=True), kernel(self.x, z=self.z)
+        )
+
+    def test_against_qmmlpack(self):
+        for kernelf in [KernelfGaussian, KernelfLaplacian]:
+            native = kernelf(ls=2.0, context=self.context)
+            qmml = kernelf(ls=2.0, context={"backend": "qmmlpack"})
+
+            np.testing.assert_allclose(native(self.x), qmml(self.x))
+            np.testing.assert_allclose(native(self.x, z=self.z), qmml(self.x, z=self.z))
@@ -1,17 +1,104 @@
 from unittest import TestCase
 import numpy as np
+import shutil
+import pathlib
 
 from cmlkit.representation.data import GlobalRepresentation
 
 from cmlkit.regression.qmml import KernelGlobal
 from cmlkit.regression.qmml import KernelfGaussian
+from cmlkit.regression.qmml.kernel_global import kernel_global
 
 kernelf = KernelfGaussian(ls=3.0)
 
 
+def linear(x, z=None):
+    if z is None:
+        z = x
+    return x @ z.T
+
+
 class TestKernelGlobal(TestCase):
+    def setUp(self):
+        self.tmpdir = pathlib.Path(__file__).parent / "tmp_test_kernel_global"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
     def test_does_it_work(self):
         x = GlobalRepresentation.mock(np.random.random((25, 10)))
         kernel = KernelGlobal(kernelf=kernelf)
 
         np.testing.assert_allclose(kernel(x).array, kernelf(x.array))
+
+    def test_blocked(self):
+        x = GlobalRepresentation.mock(np.random.random((25, 10)))
+        z = GlobalRepresentation.mock(np.random.random((12, 10)))
+        kernel = KernelGlobal(
+            kernelf=kernelf, context={"max_size": 7, "out_of_core": self.tmpdir}
+        )
+
+        np.testing.assert_allclose(kernel(x).array, kernelf(x.array))
+        np.testing.assert_allclose(kernel(x, z).array, kernelf(x.array, z=z.array))
+
+    def test_kernel_global(self):
+        x = np.random.random((25, 10))
+        z = np.random.random((12, 10))
+
+        for max_size in [None, 1, 7, 25, 100]:
+            np.testing.assert_allclose(
+                kernel_global(linear, x, max_size=max_size), linear(x)
+            )
+            np.testing.assert_allclose(
+                kernel_global(linear, x, z, max_size=max_size), linear(x, z)
+            )
+
+        out = kernel_global(linear, x, max_size=7, out_of_core=self.tmpdir)
+        self.assertIsInstance(out, np.memmap)
+        np.testing.assert_allclose(out, linear(x))
+        self.assertEqual(list(self.tmpdir.iterdir()), [])
+
+    def test_cache_distances(self):
+        x = GlobalRepresentation.mock(np.random.random((25, 10)))
+        z = GlobalRepresentation.mock(np.random.random((12, 10)))
+        context = {
+            "cache_distances": True,
+            "distance": {"cache": {"disk": {"location": self.tmpdir}}},
+        }
+
+        for kind in ["gaussian", "laplacian"]:
+            for i, ls in enumerate([1.0, 3.0]):
+                kernel = KernelGlobal(kernelf={kind: {"ls": ls}}, context=context)
+                reference = KernelGlobal(kernelf={kind: {"ls": ls}})
+
+                np.testing.assert_allclose(kernel(x).array, reference(x).array)
+                np.testing.assert_allclose(kernel(x, z).array, reference(x, z).array)
+
+                # distances are only computed for the first length scale
+                self.assertEqual(kernel.distance.cache.hits, 2 * i)
+
+        # ... and separately for each dtype
+        kernel = KernelGlobal(
+            kernelf={"gaussian": {"ls": 1.0, "dtype": "float32"}}, context=context
+        )
+        self.assertEqual(kernel(x).array.dtype, np.float32)
+        self.assertEqual(kernel.distance.cache.hits, 0)
+
+    def test_dtype_cache(self):
+        x = GlobalRepresentation.mock(np.random.random((25, 10)))
+        context = {
+            "backend": "numpy",
+            "kernel_global": {"cache": {"disk": {"location": self.tmpdir}}},
+        }
+
+        single = KernelGlobal(
+            kernelf={"gaussian": {"ls": 1.0}}, context={**context, "dtype": "float32"}
+        )
+        double = KernelGlobal(kernelf={"gaussian": {"ls": 1.0}}, context=context)
+
+        # kernels with different dtypes don't share cache entries
+        self.assertEqual(single(x).array.dtype, np.float32)
+        self.assertEqual(double(x).array.dtype, np.float64)
+        self.assertEqual(double.cache.hits, 0)
+        self.assertEqual(double(x).array.dtype, np.float64)
+        self.assertEqual(double.cache.hits, 1)
@@ -5,7 +5,8 @@ import shutil
 
 from cmlkit.representation.data import GlobalRepresentation
 
-from cmlkit.regression.qmml import KRR
+from cmlkit.regression.qmml import KRR, KernelfGaussian
+from cmlkit.regression.qmml import native
 
 
 def f(x):
@@ -55,3 +56,115 @@ class TestKRR(TestCase):
         # plt.savefig(self.tmpdir / "lol.pdf")
 
         self.assertLess(loss, 0.001)
+
+    def test_native(self):
+        kernel = {"kernel_global": {"kernelf": {"gaussian": {"ls": 0.5}}}}
+
+        # float32 needs stronger regularisation to remain positive definite
+        for context, nl, tolerance in [
+            ({}, 1.0e-7, 0.001),
+            ({"keep_factor": True}, 1.0e-7, 0.001),
+            ({"dtype": "float32"}, 1.0e-4, 0.05),
+        ]:
+            krr = KRR(kernel=kernel, nl=nl, context={"backend": "numpy", **context})
+            krr.train(x=self.x_train, y=self.y_train)
+
+            self.assertLess(rmse(self.y_test, krr.predict(self.x_test)), tolerance)
+            self.assertEqual(krr.krr.factor is not None, "keep_factor" in context)
+
+        # the dtype is part of the config, and therefore of the hash
+        single = KRR(kernel=kernel, nl=1.0e-4, dtype="float32")
+        self.assertEqual(single.get_config()["krr"]["dtype"], "float32")
+        self.assertNotEqual(single.get_hash(), KRR(kernel=kernel, nl=1.0e-4).get_hash())
+        self.assertEqual(
+            KRR(kernel=kernel, nl=1.0e-4, context={"dtype": "float32"}).dtype, "float32"
+        )
+
+        # with centering, a constant offset is learned exactly
+        krr = KRR(
+            kernel=kernel, nl=1.0e-7, centering=True, context={"backend": "numpy"}
+        )
+        krr.train(x=self.x_train, y=self.y_train + 100.0)
+
+        self.assertLess(rmse(self.y_test + 100.0, krr.predict(self.x_test)), 0.001)
+
+    def test_native_overwrite(self):
+        kernel = {"kernel_global": {"kernelf": {"gaussian": {"ls": 0.5}}}}
+
+        for overwrite in [False, True]:
+            krr = KRR(
+                kernel=kernel,
+                nl=1.0e-7,
+                context={"backend": "numpy", "overwrite": overwrite},
+            )
+            # writeable kernel matrix that is shared, as with an in-memory cache
+            shared = krr.kernel(self.x_train)
+            reference = shared.array.copy()
+            krr.kernel = lambda x: shared
+
+            krr.train(x=self.x_train, y=self.y_train)
+
+            if overwrite:
+                self.assertFalse(np.array_equal(shared.array, reference))
+            else:
+                np.testing.assert_array_equal(shared.array, reference)
+
+    def test_native_read_only(self):
+        kernel = KernelfGaussian(ls=0.5)(self.x_train.array)
+        kernel.flags.writeable = False
+
+        krr = native.KernelRidgeRegression(kernel, self.y_train, 1.0e-7, overwrite=True)
+        reference = np.linalg.solve(kernel + 1.0e-7 * np.eye(len(kernel)), self.y_train)
+
+        np.testing.assert_allclose(krr.weights, reference, rtol=1e-4)
+        np.testing.assert_array_equal(kernel, KernelfGaussian(ls=0.5)(self.x_train.array))
+
+    def test_path(self):
+        kernel = {"kernel_global": {"kernelf": {"gaussian": {"ls": 0.5}}}}
+        nls = [1.0e-7, 1.0e-3, 1.0]
+
+        for centering in [False, True]:
+            krr = KRR(kernel=kernel, nl=1.0, centering=centering)
+            krr.train_path(x=self.x_train, y=self.y_train)
+            preds = krr.predict_path(self.x_test, nls)
+
+            self.assertEqual(preds.shape, (len(nls), len(self.y_test)))
+
+            # afterwards, predict uses the nl of the instance
+            self.assertTrue(krr.trained)
+            np.testing.assert_allclose(krr.predict(self.x_test), preds[2])
+
+            for nl, pred in zip(nls, preds):
+                reference = KRR(
+                    kernel=kernel,
+                    nl=nl,
+                    centering=centering,
+                    context={"backend": "numpy"},
+                )
+                reference.train(x=self.x_train, y=self.y_train)
+
+                np.testing.assert_allclose(
+                    pred, reference.predict(self.x_test), rtol=1e-5, atol=1e-5
+                )
+
+    def test_cv_residuals(self):
+        kernel = KernelfGaussian(ls=0.5)(self.x_train.array)
+        y = self.y_train
+        n = len(y)
+
+        loo = [[i] for i in range(n)]
+        kfold = [np.arange(i, n, 4) for i in range(4)]
+
+        for folds in [None, kfold]:
+            krr = native.KernelRidgeRegression(kernel, y, 1.0e-3, keep_factor=True)
+            residuals = krr.cv_residuals(folds)
+
+            reference = np.empty(n)
+            for fold in loo if folds is None else folds:
+                rest = np.setdiff1d(np.arange(n), fold)
+                krr = native.KernelRidgeRegression(
+                    kernel[np.ix_(rest, rest)], y[rest], 1.0e-3
+                )
+                reference[fold] = y[fold] - krr(kernel[np.ix_(rest, fold)])
+
+            np.testing.assert_allclose(residuals, reference, rtol=1e-5, atol=1e-8)
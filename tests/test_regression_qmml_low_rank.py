@@ -0,0 +1,118 @@
+from unittest import TestCase
+import numpy as np
+
+from cmlkit.representation.data import GlobalRepresentation, AtomicRepresentation
+
+from cmlkit.regression.qmml import KRR, NystroemKRR, RandomFeaturesKRR, KernelAtomic
+from cmlkit.regression.qmml import low_rank
+
+
+def f(x):
+    return x.flatten() ** 3
+
+
+def rmse(true, pred):
+    return np.sqrt(np.mean((true - pred) ** 2))
+
+
+kernel = {"kernel_global": {"kernelf": {"gaussian": {"ls": 0.5}}}}
+
+
+class TestNystroemKRR(TestCase):
+    def setUp(self):
+        np.random.seed(123)
+        self.x_train = GlobalRepresentation.mock(4 * np.random.random((160, 1)) - 2)
+        self.x_test = GlobalRepresentation.mock(4 * np.random.random((40, 1)) - 2)
+
+        self.y_train = f(self.x_train.array)
+        self.y_test = f(self.x_test.array)
+
+    def test_does_it_work(self):
+        for landmarks in ["random", "kmeans++", "farthest"]:
+            krr = NystroemKRR(kernel=kernel, nl=1.0e-7, m=40, landmarks=landmarks)
+            krr.train(x=self.x_train, y=self.y_train)
+
+            self.assertLess(rmse(self.y_test, krr.predict(self.x_test)), 0.01)
+
+    def test_all_landmarks(self):
+        # with all training points as landmarks, this is exact KRR
+        for centering in [False, True]:
+            nystroem = NystroemKRR(kernel=kernel, nl=1.0e-3, m=160, centering=centering)
+            nystroem.train(x=self.x_train, y=self.y_train)
+
+            krr = KRR(kernel=kernel, nl=1.0e-3, centering=centering)
+            krr.train(x=self.x_train, y=self.y_train)
+
+            np.testing.assert_allclose(
+                nystroem.predict(self.x_test), krr.predict(self.x_test), atol=1e-4
+            )
+
+    def test_landmarks(self):
+        points = np.concatenate([np.random.random((50, 3)), np.zeros((50, 3))])
+
+        for strategy in low_rank.strategies.values():
+            idx = strategy(points, 20, 123)
+            self.assertEqual(len(np.unique(idx)), 20)
+            np.testing.assert_array_equal(idx, strategy(points, 20, 123))
+
+        # farthest point sampling picks at most one of the duplicates
+        idx = low_rank.landmarks_farthest(points, 20, 123)
+        self.assertLessEqual(np.sum(idx >= 50), 1)
+
+        idx = low_rank.landmarks_farthest(points, 100, 123)
+        np.testing.assert_array_equal(idx, np.arange(100))
+
+    def test_atomic(self):
+        counts = [2, 3, 1, 4, 2] * 4
+        x = AtomicRepresentation.mock(counts, np.random.random((sum(counts), 3)))
+        kernel = {"kernel_atomic": {"kernelf": {"gaussian": {"ls": 1.0}}}}
+
+        krr = NystroemKRR(kernel=kernel, nl=1.0e-8, m=20, landmarks="farthest")
+        krr.train(x=x, y=np.arange(20.0))
+
+        np.testing.assert_allclose(krr.predict(x), np.arange(20.0), atol=1e-3)
+
+
+class TestRandomFeaturesKRR(TestCase):
+    def setUp(self):
+        np.random.seed(123)
+        self.x = np.random.random((30, 3))
+
+    def test_features(self):
+        for kind in ["gaussian", "laplacian"]:
+            config = {"kernel_global": {"kernelf": {kind: {"ls": 2.0}}}}
+            krr = RandomFeaturesKRR(kernel=config, nl=1.0, m=20000)
+            krr.frequencies, krr.phases = low_rank.spectra[kind](3, 20000, 2.0, 123)
+
+            features = krr.features(GlobalRepresentation.mock(self.x))
+            reference = krr.kernel(GlobalRepresentation.mock(self.x)).array
+
+            np.testing.assert_allclose(features @ features.T, reference, atol=0.05)
+
+    def test_atomic_features(self):
+        counts = [2, 3, 1, 4, 2]
+        x = AtomicRepresentation.mock(counts, np.random.random((sum(counts), 3)))
+
+        for norm in [False, True]:
+            config = {
+                "kernel_atomic": {"kernelf": {"gaussian": {"ls": 2.0}}, "norm": norm}
+            }
+            # small max_bytes forces blocks
+            krr = RandomFeaturesKRR(
+                kernel=config, nl=1.0, m=20000, context={"max_bytes": 8 * 20000 * 3}
+            )
+            krr.frequencies, krr.phases = low_rank.spectrum_gaussian(3, 20000, 2.0, 123)
+
+            features = krr.features(x)
+            reference = KernelAtomic(**config["kernel_atomic"])(x).array
+
+            np.testing.assert_allclose(features @ features.T, reference, rtol=0.05)
+
+    def test_does_it_work(self):
+        x_train = GlobalRepresentation.mock(4 * np.random.random((400, 1)) - 2)
+        x_test = GlobalRepresentation.mock(4 * np.random.random((40, 1)) - 2)
+
+        krr = RandomFeaturesKRR(kernel=kernel, nl=1.0e-6, m=500, centering=True)
+        krr.train(x=x_train, y=f(x_train.array))
+
+        self.assertLess(rmse(f(x_test.array), krr.predict(x_test)), 0.05)
@@ -0,0 +1,305 @@
+from unittest import TestCase
+import numpy as np
+import shutil
+import pathlib
+from unittest.mock import patch
+from types import SimpleNamespace
+
+import cmlkit
+from cmlkit import Dataset
+from cmlkit.dataset import Subset, ShardedDataset
+from cmlkit.engine import Component
+from cmlkit.model import Model
+from cmlkit.regression import Kernel
+from cmlkit.representation import Representation, ShardedRepresentation
+from cmlkit.representation.data import GlobalRepresentation, AtomicRepresentation
+
+
+class MockGlobal(Representation):
+    kind = "mock_global_rep"
+
+    def _get_config(self):
+        return {}
+
+    def compute(self, data):
+        return np.array([[len(z), np.sum(r)] for z, r in zip(data.z, data.r)])
+
+
+class MockAtomic(Representation):
+    kind = "mock_atomic_rep"
+
+    def _get_config(self):
+        return {}
+
+    def compute(self, data):
+        return np.array(
+            [np.concatenate([z[:, None], r], axis=1) for z, r in zip(data.z, data.r)],
+            dtype=object,
+        )
+
+
+class MockKernel(Kernel):
+    kind = "mock_kernel"
+
+    def _get_config(self):
+        return {}
+
+    def compute_symmetric(self, x):
+        return self.compute_asymmetric(x, x)
+
+    def compute_asymmetric(self, x, z):
+        return x.array @ z.array.T
+
+
+class MockKRR(Component):
+    kind = "mock_krr"
+
+    def __init__(self, context={}):
+        super().__init__(context=context)
+        self.kernel = MockKernel(context=context)
+
+    def _get_config(self):
+        return {}
+
+    def train(self, x, y):
+        self.x_train = x
+        kernel = self.kernel(x).array
+        self.alpha = np.linalg.solve(kernel + np.eye(len(kernel)), y)
+
+    def predict(self, z):
+        return self.kernel(x=self.x_train, z=z).array.T @ self.alpha
+
+
+cmlkit.register(MockGlobal, MockAtomic, MockKernel, MockKRR)
+
+
+class TestRepresentationChunks(TestCase):
+    def setUp(self):
+        n = 50
+        n_atoms = np.random.randint(1, high=10, size=n)
+
+        r = np.array([5 * np.random.random((na, 3)) for na in n_atoms], dtype=object)
+        z = np.array(
+            [np.random.randint(1, high=3, size=na) for na in n_atoms], dtype=object
+        )
+
+        self.data = Dataset(z=z, r=r)
+
+    def test_global(self):
+        reference = MockGlobal()(self.data)
+
+        for context in [
+            {"chunk_size": 7},
+            {"parallel": 2},
+            {"parallel": 3, "chunk_size": 4},
+        ]:
+            result = MockGlobal(context=context)(self.data)
+
+            np.testing.assert_array_equal(result.array, reference.array)
+            self.assertEqual(result.id, reference.id)
+
+    def test_atomic(self):
+        reference = MockAtomic()(self.data)
+
+        for context in [
+            {"chunk_size": 7},
+            {"parallel": 2},
+            {"parallel": 3, "chunk_size": 4},
+        ]:
+            result = MockAtomic(context=context)(self.data)
+
+            np.testing.assert_array_equal(result.linear, reference.linear)
+            np.testing.assert_array_equal(result.offsets, reference.offsets)
+            self.assertEqual(result.id, reference.id)
+
+    def test_empty(self):
+        empty = SimpleNamespace(n=0, z=[], r=[], id="empty", history=["empty"])
+        result = MockGlobal(context={"parallel": 2})(empty)
+
+        self.assertEqual(len(result.array), 0)
+
+    def test_daemonic(self):
+        # processes in an EvaluationPool can't have children, so chunks are serial
+        reference = MockGlobal()(self.data)
+        module = "cmlkit.representation.representation"
+
+        with patch(f"{module}.current_process", return_value=SimpleNamespace(daemon=True)):
+            with patch(f"{module}.compute_chunks_parallel", side_effect=RuntimeError):
+                for context in [{"parallel": 2}, {"parallel": 2, "chunk_size": 7}]:
+                    result = MockGlobal(context=context)(self.data)
+                    np.testing.assert_array_equal(result.array, reference.array)
+
+
+class TestRepresentationChunkCache(TestCase):
+    def setUp(self):
+        n = 30
+        n_atoms = np.random.randint(1, high=10, size=n)
+
+        self.r = np.array(
+            [5 * np.random.random((na, 3)) for na in n_atoms], dtype=object
+        )
+        self.z = np.array(
+            [np.random.randint(1, high=3, size=na) for na in n_atoms], dtype=object
+        )
+
+        self.tmpdir = (pathlib.Path(__file__) / "..").resolve() / "tmp_test_representation"
+        self.tmpdir.mkdir(exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_growing_dataset(self):
+        context = {
+            "chunk_size": 10,
+            "cache_chunks": True,
+            "cache": {"disk": {"location": self.tmpdir}},
+        }
+
+        small = Dataset(z=self.z[:20], r=self.r[:20])
+        full = Dataset(z=self.z, r=self.r)
+
+        rep = MockAtomic(context=context)
+        rep(small)
+        self.assertEqual(rep.cache.misses, 2)
+
+        result = rep(full)
+        self.assertEqual(rep.cache.misses, 3)
+        self.assertEqual(rep.cache.hits, 2)
+
+        reference = MockAtomic()(full)
+        np.testing.assert_array_equal(result.linear, reference.linear)
+        self.assertEqual(result.id, reference.id)
+
+        # in parallel, everything is cached
+        rep = MockAtomic(context={**context, "parallel": 2})
+        result = rep(full)
+        self.assertEqual(rep.cache.misses, 0)
+        np.testing.assert_array_equal(result.linear, reference.linear)
+
+    def test_chunks_claimed_in_order(self):
+        context = {
+            "chunk_size": 5,
+            "cache_chunks": True,
+            "cache": {"disk": {"location": self.tmpdir, "locking": True}},
+        }
+        rep = MockAtomic(context=context)
+
+        claimed = []
+        get_if_cached = rep.cache.get_if_cached
+        rep.cache.get_if_cached = lambda key: claimed.append(key) or get_if_cached(key)
+
+        result = rep(Dataset(z=self.z, r=self.r))
+
+        self.assertEqual(len(claimed), 6)
+        self.assertEqual(claimed, sorted(claimed))
+        self.assertEqual(list(self.tmpdir.glob("**/.*.lock")), [])
+        reference = MockAtomic()(Dataset(z=self.z, r=self.r))
+        np.testing.assert_array_equal(result.linear, reference.linear)
+
+
+class TestRepresentationSubsets(TestCase):
+    def setUp(self):
+        n = 30
+        n_atoms = np.random.randint(1, high=10, size=n)
+
+        r = np.array([5 * np.random.random((na, 3)) for na in n_atoms], dtype=object)
+        z = np.array(
+            [np.random.randint(1, high=3, size=na) for na in n_atoms], dtype=object
+        )
+
+        self.data = Dataset(z=z, r=r)
+
+        self.tmpdir = (pathlib.Path(__file__) / "..").resolve() / "tmp_test_representation"
+        self.tmpdir.mkdir(exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_subset_from_parent(self):
+        context = {"cache": {"disk": {"location": self.tmpdir}}}
+        idx = np.array([5, 2, 17, 29, 0])
+        subset = Subset.from_dataset(self.data, idx=idx)
+
+        for cls in [MockGlobal, MockAtomic]:
+            reference = cls()(subset)
+
+            rep = cls(context=context)
+            rep(self.data)
+
+            def fail(data):
+                raise RuntimeError("Should have been obtained from parent!")
+
+            rep.compute = fail
+
+            # the result isn't created from (and hashed by) its content
+            with patch.object(GlobalRepresentation, "mock", side_effect=fail):
+                with patch.object(AtomicRepresentation, "mock", side_effect=fail):
+                    result = rep(subset)
+
+            self.assertEqual(result.id, reference.id)
+            for key, value in reference.data.items():
+                np.testing.assert_array_equal(result.data[key], value)
+
+
+class TestRepresentationShards(TestCase):
+    def setUp(self):
+        n = 30
+        n_atoms = np.random.randint(1, high=10, size=n)
+
+        r = np.array([5 * np.random.random((na, 3)) for na in n_atoms], dtype=object)
+        z = np.array(
+            [np.random.randint(1, high=3, size=na) for na in n_atoms], dtype=object
+        )
+        p = {"e": np.random.random(n)}
+
+        self.data = Dataset(z=z, r=r, p=p)
+        self.sharded = ShardedDataset.from_datasets(
+            [
+                Subset.from_dataset(self.data, idx=np.arange(start, stop))
+                for start, stop in [(0, 10), (10, 12), (12, 30)]
+            ]
+        )
+
+    def test_representation(self):
+        rep = MockGlobal()
+        reference = rep(self.data)
+        result = rep(self.sharded)
+
+        self.assertIsInstance(result, ShardedRepresentation)
+        self.assertEqual(result.id, reference.id)
+        np.testing.assert_array_equal(
+            np.concatenate([shard.array for shard in result]), reference.array
+        )
+
+    def test_kernel(self):
+        kernel = MockKernel()
+        x = MockGlobal()(self.sharded)
+        reference = MockGlobal()(self.data)
+
+        np.testing.assert_allclose(kernel(x).array, kernel(reference).array)
+
+        z = MockGlobal()(self.sharded.shard(2))
+        np.testing.assert_allclose(kernel(x, z).array, kernel(reference, z).array)
+        np.testing.assert_allclose(kernel(z, x).array, kernel(z, reference).array)
+
+    def test_model(self):
+        model = Model(MockGlobal(), MockKRR())
+        reference = model.train(self.data, "e").predict(self.data)
+
+        model = Model(MockGlobal(), MockKRR())
+        model.train(self.sharded, "e")
+        np.testing.assert_allclose(model.predict(self.sharded), reference)
+
+    def test_computed_once(self):
+        # without a cache, each shard is computed once, not once per pair of shards
+        rep = MockGlobal()
+        computed = []
+        compute = rep.compute
+        rep.compute = lambda data: computed.append(data.n) or compute(data)
+
+        model = Model(rep, MockKRR())
+        model.train(self.sharded, "e")
+        self.assertEqual(computed, [10, 2, 18])
+
+        model.predict(self.sharded)
+        self.assertEqual(computed, [10, 2, 18] * 2)
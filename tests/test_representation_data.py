@@ -52,6 +52,15 @@ class TestAtomicRepresentation(TestCase):
         np.testing.assert_array_equal(rep.range((1, 3)).ragged[-1], rep.ragged[2])
         np.testing.assert_array_equal(rep.range((1, 3)).ragged[1], rep.ragged[2])
 
+    def test_take(self):
+        rep = AtomicRepresentation.mock(self.counts, self.linear)
+        taken = rep.take(np.array([2, 0]))
+
+        np.testing.assert_array_equal(taken.counts, [1, 3])
+        np.testing.assert_array_equal(taken.ragged[0], rep.ragged[2])
+        np.testing.assert_array_equal(taken.ragged[1], rep.ragged[0])
+        np.testing.assert_array_equal(rep.take_array(np.array([2, 0])), taken.linear)
+
 
 class TestGlobalRepresentation(TestCase):
     def setUp(self):
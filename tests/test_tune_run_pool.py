@@ -7,7 +7,7 @@ import numpy as np
 from concurrent.futures import TimeoutError, wait
 
 import cmlkit
-from cmlkit.engine import Component, parse_config
+from cmlkit.engine import Component, Data, parse_config
 from cmlkit.utility import timed
 
 from cmlkit.tune.run.pool import EvaluationPool
@@ -53,7 +53,68 @@ class MockEvaluator2(Component):
         return {}
 
 
-cmlkit.register(MockEvaluator, MockEvaluator2)
+class MockFlight(Component):
+    kind = "mock_flight"
+    single_flight = True
+
+    def __init__(self, counter, context={}):
+        super().__init__(context=context)
+        self.counter = counter
+
+    def _get_config(self):
+        return {"counter": self.counter}
+
+    def __call__(self, x):
+        result = self.cache.get_if_cached(x.id)
+
+        if result is None:
+            with open(self.counter, "a") as f:
+                f.write("computed\n")
+            time.sleep(1.0)
+            result = Data.result(self, x, data={"y": x.data["x"]})
+            self.cache.submit(x.id, result)
+
+        return result
+
+
+class MockFlightEvaluator(Component):
+    kind = "mock_flight_eval"
+
+    def __init__(self, counter, context={}):
+        super().__init__(context=context)
+        self.counter = counter
+        self.x = Data.create(data={"x": np.ones(3)})
+
+    def _get_config(self):
+        return {"counter": self.counter}
+
+    def __call__(self, model):
+        y = MockFlight(self.counter, context=self.context)(self.x).data["y"]
+        return {"loss": model["scale"] * y.sum()}
+
+
+class MockDatasetEvaluator(Component):
+    kind = "mock_dataset_eval"
+
+    def __init__(self, data, context={}):
+        super().__init__(context=context)
+        self.data = cmlkit.load_dataset(data)
+
+    def _get_config(self):
+        return {"data": self.data.name}
+
+    def __call__(self, model):
+        mapped = isinstance(self.data.z_flat, np.memmap)
+        return {"loss": float(self.data.n), "mapped": mapped}
+
+
+cmlkit.register(
+    MockEvaluator,
+    MockEvaluator2,
+    MockFlight,
+    MockFlightEvaluator,
+    MockDatasetEvaluator,
+)
 
 
 class TestEvaluationPoolWithCache(TestCase):
@@ -180,6 +241,69 @@ class TestEvaluationPoolWithCache(TestCase):
         self.assertEqual(res1, res2)
         pool.shutdown()
 
+    def test_single_flight(self):
+        counter = str(self.tmpdir / "counter.txt")
+        flight = self.tmpdir / "flight"
+
+        pool = EvaluationPool(
+            max_workers=4,
+            evaluator_config={"mock_flight_eval": {"counter": counter}},
+            single_flight={"location": flight, "poll_interval": 0.1},
+        )
+
+        futures = [pool.schedule({"scale": float(i)}) for i in range(4)]
+        results = [pool.finish(f) for f in futures]
+
+        self.assertEqual([r["ok"]["loss"] for r in results], [0.0, 3.0, 6.0, 9.0])
+        with open(counter, "r") as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+        pool.shutdown()
+        self.assertFalse(flight.exists())
+
+    def test_locking(self):
+        # disk caches of workers coordinate by default
+        counter = str(self.tmpdir / "counter.txt")
+        context = {"cache": {"disk": {"location": self.tmpdir, "poll_interval": 0.1}}}
+
+        pool = EvaluationPool(
+            max_workers=4,
+            evaluator_config={"mock_flight_eval": {"counter": counter}},
+            evaluator_context=context,
+        )
+
+        futures = [pool.schedule({"scale": float(i)}) for i in range(4)]
+        results = [pool.finish(f) for f in futures]
+
+        self.assertEqual([r["ok"]["loss"] for r in results], [0.0, 3.0, 6.0, 9.0])
+        with open(counter, "r") as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+        pool.shutdown()
+
+    def test_share_datasets(self):
+        z = np.array([np.ones(i + 1, dtype=int) for i in range(5)], dtype=object)
+        r = np.array([np.zeros((i + 1, 3)) for i in range(5)], dtype=object)
+        cmlkit.Dataset(z=z, r=r, name="shared").save(directory=self.tmpdir)
+
+        location = self.tmpdir / "datasets"
+        pool = EvaluationPool(
+            max_workers=4,
+            evaluator_config={
+                "mock_dataset_eval": {"data": str(self.tmpdir / "shared.npy")}
+            },
+            share_datasets={"location": location},
+        )
+
+        futures = [pool.schedule({"i": i}) for i in range(8)]
+        results = [pool.finish(f)["ok"] for f in futures]
+
+        self.assertTrue(all(r["loss"] == 5.0 and r["mapped"] for r in results))
+        self.assertEqual(len(list(location.glob("*.npd"))), 1)
+
+        pool.shutdown()
+        self.assertFalse(location.exists())
+
     def test_parallel_basic(self):
         # verify that something can happen in parallel
         pool = EvaluationPool(